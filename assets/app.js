@@ -0,0 +1,1202 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const contextMenu = document.getElementById('contextMenu');
+    let selectedItem = null;
+
+    // Context menu for desktop
+    document.addEventListener('contextmenu', handleContextMenu);
+    
+    // Long press for mobile
+    let pressTimer;
+    document.addEventListener('touchstart', e => {
+        if (e.target.closest('.file-card')) {
+            pressTimer = setTimeout(() => handleLongPress(e), 600);
+        }
+    });
+    
+    document.addEventListener('touchend', () => {
+        clearTimeout(pressTimer);
+    });
+
+    function handleContextMenu(e) {
+        if (e.target.closest('.file-card')) {
+            e.preventDefault();
+            showContextMenu(e.target.closest('.file-card'), e.pageX, e.pageY);
+        }
+    }
+
+    function handleLongPress(e) {
+        const card = e.target.closest('.file-card');
+        const touch = e.touches[0];
+        showContextMenu(card, touch.pageX, touch.pageY);
+    }
+
+    function showContextMenu(card, x, y) {
+        selectedItem = card;
+        contextMenu.style.display = 'block';
+        contextMenu.style.left = `${x}px`;
+        contextMenu.style.top = `${y}px`;
+    }
+
+    // Handle menu actions
+    contextMenu.addEventListener('click', async (e) => {
+        const action = e.target.closest('.context-menu-item')?.dataset.action;
+        if (!action) return;
+
+        const path = selectedItem.dataset.path;
+        
+        if (action === 'details') {
+            const response = await fetchWithBackoff(ROOT_PREFIX + '/details', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/x-www-form-urlencoded'},
+                body: `path=${path}`
+            });
+            const details = await response.json();
+            
+            document.getElementById('details-name').textContent = details.name;
+            document.getElementById('details-type').textContent = details.type;
+            document.getElementById('details-size').textContent = details.size;
+            document.getElementById('details-created').textContent = details.created;
+            document.getElementById('details-modified').textContent = details.modified;
+            document.getElementById('details-path').textContent = details.path;
+            showMediaDetails(details.media || {});
+            
+            document.getElementById('overlay').style.display = 'block';
+            document.getElementById('detailsModal').style.display = 'block';
+        } else if (action === 'rename') {
+            const newName = prompt('Enter new name:');
+            if (newName) {
+                await fetch(ROOT_PREFIX + '/rename', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/x-www-form-urlencoded'},
+                    body: `old_path=${path}&new_name=${newName}`
+                });
+                refreshListing();
+            }
+        } else if (action === 'delete' && selectedItem.classList.contains('selected') && getSelectedPaths().length > 1) {
+            deleteSelected();
+        } else if (action === 'delete') {
+            if (confirm('Are you sure you want to delete this item?')) {
+                const response = await fetch(ROOT_PREFIX + '/delete', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/x-www-form-urlencoded'},
+                    body: `path=${path}`
+                });
+                if (response.status === 202) {
+                    // Folders are deleted by a background job
+                    const result = await response.json();
+                    watchJob(result.job_id, () => refreshListing());
+                } else {
+                    refreshListing();
+                }
+            }
+        } else if (action === 'preview') {
+            const fileType = path.split('.').pop().toLowerCase();
+            const videoFormats = ['mp4', 'mkv', 'webm', 'avi', 'mov', 'wmv'];
+            
+            if (videoFormats.includes(fileType)) {
+                const videoUrl = `${ROOT_PREFIX}/stream/${path}`;  // Use stream endpoint instead of download
+                const previewContent = document.getElementById('previewContent');
+                previewContent.innerHTML = `
+                    <div class="video-player">
+                        <div class="video-container">
+                            <video id="videoPlayer">
+                                <source src="${videoUrl}" type="video/${fileType === 'mkv' ? 'webm' : fileType}">
+                            </video>
+                            <div class="video-tap-area tap-area-left"></div>
+                            <div class="video-tap-area tap-area-center"></div>
+                            <div class="video-tap-area tap-area-right"></div>
+                            <div class="video-gesture-overlay" id="gestureOverlay"></div>
+                            <div class="brightness-volume-bar brightness-bar">
+                                <div class="bar-fill" id="brightnessLevel"></div>
+                            </div>
+                            <div class="brightness-volume-bar volume-bar">
+                                <div class="bar-fill" id="volumeLevel"></div>
+                            </div>
+                        </div>
+                        <div class="video-controls">
+                            <button onclick="togglePlay()">
+                                <i class="fas fa-play" id="playIcon"></i>
+                            </button>
+                            <div class="progress-container" onclick="seek(event)">
+                                <div class="progress-bar-video" id="videoProgress"></div>
+                            </div>
+                            <span class="time-display" id="timeDisplay">0:00 / 0:00</span>
+                            <button onclick="rotateVideo()">
+                                <i class="fas fa-sync-alt"></i>
+                            </button>
+                            <button onclick="toggleFullscreen()">
+                                <i class="fas fa-expand"></i>
+                            </button>
+                            <select class="quality-selector" onchange="changeQuality(this.value)">
+                                <option value="auto">Auto</option>
+                                <option value="1080p">1080p</option>
+                                <option value="720p">720p</option>
+                                <option value="480p">480p</option>
+                            </select>
+                        </div>
+                    </div>
+                `;
+
+                const video = document.getElementById('videoPlayer');
+                const overlay = document.getElementById('gestureOverlay');
+                // A busy server turns the stream away with 503, so reload it a few times before giving up
+                let streamRetries = 0;
+                video.querySelector('source').addEventListener('error', () => {
+                    if (streamRetries < 5) setTimeout(() => video.load(), retryDelay(1, streamRetries++));
+                });
+                let lastTapTime = 0;
+                let tapCount = 0;
+                let brightness = 100;
+                let volume = 1;
+                let touchStartY = 0;
+                let touchStartX = 0;
+
+                // Mobile touch controls
+                document.querySelectorAll('.video-tap-area').forEach(area => {
+                    area.addEventListener('touchstart', e => {
+                        touchStartY = e.touches[0].clientY;
+                        touchStartX = e.touches[0].clientX;
+                    });
+
+                    area.addEventListener('touchmove', e => {
+                        e.preventDefault();
+                        const deltaY = touchStartY - e.touches[0].clientY;
+                        const deltaX = touchStartX - e.touches[0].clientX;
+
+                        if (area.classList.contains('tap-area-left')) {
+                            // Brightness control
+                            brightness = Math.max(0, Math.min(100, brightness + (deltaY * 0.5)));
+                            document.getElementById('brightnessLevel').style.height = `${brightness}%`;
+                            video.style.filter = `brightness(${brightness}%)`;
+                            showOverlay(`Brightness: ${Math.round(brightness)}%`);
+                        } else if (area.classList.contains('tap-area-right')) {
+                            // Volume control
+                            volume = Math.max(0, Math.min(1, volume - (deltaY * 0.002)));
+                            video.volume = volume;
+                            document.getElementById('volumeLevel').style.height = `${volume * 100}%`;
+                            showOverlay(`Volume: ${Math.round(volume * 100)}%`);
+                        }
+                    });
+
+                    area.addEventListener('click', e => {
+                        const now = Date.now();
+                        if (now - lastTapTime < 300) {
+                            tapCount++;
+                            if (tapCount === 2) {
+                                // Double tap
+                                if (area.classList.contains('tap-area-center')) {
+                                    togglePlay();
+                                } else if (area.classList.contains('tap-area-right')) {
+                                    video.currentTime += 10;
+                                    showOverlay('+10s');
+                                } else if (area.classList.contains('tap-area-left')) {
+                                    video.currentTime -= 10;
+                                    showOverlay('-10s');
+                                }
+                            }
+                        } else {
+                            tapCount = 1;
+                        }
+                        lastTapTime = now;
+                    });
+                });
+
+                // Keyboard controls
+                document.addEventListener('keydown', e => {
+                    if (document.getElementById('previewModal').style.display === 'block') {
+                        switch(e.key) {
+                            case ' ':
+                                e.preventDefault();
+                                togglePlay();
+                                break;
+                            case 'ArrowRight':
+                                e.preventDefault();
+                                video.currentTime += 10;
+                                showOverlay('+10s');
+                                break;
+                            case 'ArrowLeft':
+                                e.preventDefault();
+                                video.currentTime -= 10;
+                                showOverlay('-10s');
+                                break;
+                            case 'ArrowUp':
+                                e.preventDefault();
+                                volume = Math.min(1, volume + 0.05);
+                                video.volume = volume;
+                                showOverlay(`Volume: ${Math.round(volume * 100)}%`);
+                                document.getElementById('volumeLevel').style.height = `${volume * 100}%`;
+                                break;
+                            case 'ArrowDown':
+                                e.preventDefault();
+                                volume = Math.max(0, volume - 0.05);
+                                video.volume = volume;
+                                showOverlay(`Volume: ${Math.round(volume * 100)}%`);
+                                document.getElementById('volumeLevel').style.height = `${volume * 100}%`;
+                                break;
+                            case 'f':
+                                e.preventDefault();
+                                toggleFullscreen();
+                                break;
+                            case 'm':
+                                e.preventDefault();
+                                video.muted = !video.muted;
+                                showOverlay(video.muted ? 'Muted' : 'Unmuted');
+                                break;
+                        }
+                    }
+                });
+
+                function showOverlay(text) {
+                    overlay.textContent = text;
+                    overlay.style.display = 'block';
+                    clearTimeout(overlay.timeout);
+                    overlay.timeout = setTimeout(() => {
+                        overlay.style.display = 'none';
+                    }, 1000);
+                }
+
+                video.addEventListener('timeupdate', () => {
+                    const progress = (video.currentTime / video.duration) * 100;
+                    document.getElementById('videoProgress').style.width = progress + '%';
+                    document.getElementById('timeDisplay').textContent = `${formatTime(video.currentTime)} / ${formatTime(video.duration)}`;
+                });
+
+                video.addEventListener('play', () => {
+                    document.getElementById('playIcon').className = 'fas fa-pause';
+                });
+
+                video.addEventListener('pause', () => {
+                    document.getElementById('playIcon').className = 'fas fa-play';
+                });
+
+                // Hide controls when mouse is inactive
+                let hideControlsTimeout;
+                const videoPlayer = document.querySelector('.video-player');
+                const videoControls = document.querySelector('.video-controls');
+
+                videoPlayer.addEventListener('mousemove', () => {
+                    videoControls.style.opacity = '1';
+                    clearTimeout(hideControlsTimeout);
+                    hideControlsTimeout = setTimeout(() => {
+                        if (!video.paused) {
+                            videoControls.style.opacity = '0';
+                        }
+                    }, 2000);
+                });
+
+                videoPlayer.addEventListener('mouseenter', () => {
+                    videoControls.style.opacity = '1';
+                });
+
+                videoPlayer.addEventListener('mouseleave', () => {
+                    if (!video.paused) {
+                        videoControls.style.opacity = '0';
+                    }
+                });
+
+                // Add volume control by mouse wheel
+                videoPlayer.addEventListener('wheel', (e) => {
+                    e.preventDefault();
+                    const direction = e.deltaY < 0 ? 1 : -1;
+                    volume = Math.max(0, Math.min(1, volume + direction * 0.05));
+                    video.volume = volume;
+                    showOverlay(`Volume: ${Math.round(volume * 100)}%`);
+                    document.getElementById('volumeLevel').style.height = `${volume * 100}%`;
+                });
+
+                // Add rotate video function
+                let currentRotation = 0;
+                window.rotateVideo = function() {
+                    const container = document.querySelector('.video-container');
+                    currentRotation = (currentRotation + 90) % 360;
+                    container.className = 'video-container' + (currentRotation ? ` rotated-${currentRotation}` : '');
+                    showOverlay(`Rotated ${currentRotation}°`);
+                };
+
+                document.getElementById('overlay').style.display = 'block';
+                document.getElementById('previewModal').style.display = 'block';
+                video.play();
+            } else if (textFormats.includes(fileType)) {
+                openTextPreview(path);
+            } else if (archiveFormats.includes(fileType)) {
+                openArchivePreview(path);
+            } else {
+                alert('Preview is only available for video, text and archive files.');
+            }
+        }
+        
+        contextMenu.style.display = 'none';
+    });
+
+    // Close context menu when clicking outside
+    document.addEventListener('click', () => {
+        contextMenu.style.display = 'none';
+    });
+});
+
+// Live change feed: the server pushes changes in this folder and the
+// grid is patched in place instead of reloading the page
+const ROOT_PREFIX = LD_CONFIG.rootPrefix;
+const currentDir = new URLSearchParams(window.location.search).get('path') || '';
+let changeFeed = null;
+
+function createFileCard(item) {
+    const card = document.createElement('div');
+    card.className = 'file-card';
+    card.dataset.path = item.path;
+    card.dataset.type = item.type;
+
+    const box = document.createElement('input');
+    box.type = 'checkbox';
+    box.className = 'select-box';
+    box.title = 'Select';
+
+    const link = document.createElement('a');
+    link.href = item.type === 'folder'
+        ? `?path=${item.path}`
+        : `${ROOT_PREFIX}/download/${item.path}`;
+
+    const content = document.createElement('div');
+    content.className = 'file-content';
+    const icon = document.createElement('i');
+    icon.className = `fas fa-${item.type === 'folder' ? 'folder' : 'file'} file-icon`;
+    const name = document.createElement('span');
+    name.textContent = item.name;
+    const caption = item.meta ? mediaCaption(item.meta) : '';
+    if (caption) {
+        const small = document.createElement('small');
+        small.className = 'file-meta';
+        small.textContent = caption;
+        name.appendChild(small);
+    }
+
+    content.append(icon, name);
+    link.appendChild(content);
+    card.append(box, link);
+    return card;
+}
+
+// Media metadata, read from file headers by the server's MediaIndex
+function formatDuration(seconds) {
+    seconds = Math.round(seconds);
+    const hours = Math.floor(seconds / 3600);
+    const minutes = Math.floor(seconds % 3600 / 60);
+    const secs = String(seconds % 60).padStart(2, '0');
+    return hours ? `${hours}:${String(minutes).padStart(2, '0')}:${secs}` : `${minutes}:${secs}`;
+}
+
+// Same line as media_caption() in launcher_win.py
+function mediaCaption(meta) {
+    const parts = [];
+    if (meta.duration) parts.push(formatDuration(meta.duration));
+    if (meta.width) parts.push(`${meta.width}×${meta.height}`);
+    if (meta.pages) parts.push(`${meta.pages} page${meta.pages !== 1 ? 's' : ''}`);
+    if (meta.kind === 'audio' && meta.artist) parts.push(meta.artist);
+    return parts.join(' · ');
+}
+
+const MEDIA_DETAILS = [
+    ['Duration', meta => meta.duration && formatDuration(meta.duration)],
+    ['Resolution', meta => meta.width && `${meta.width} × ${meta.height}`],
+    ['Camera', meta => meta.camera],
+    ['Taken', meta => meta.taken && meta.taken.replace('T', ' ')],
+    ['Pages', meta => meta.pages],
+    ['Title', meta => meta.title],
+    ['Artist', meta => meta.artist],
+    ['Album', meta => meta.album],
+    ['Author', meta => meta.author],
+];
+
+function showMediaDetails(meta) {
+    const grid = document.getElementById('details-media');
+    grid.replaceChildren();
+    for (const [label, read] of MEDIA_DETAILS) {
+        const value = read(meta);
+        if (!value) continue;
+        const name = document.createElement('div');
+        name.className = 'details-label';
+        name.textContent = `${label}:`;
+        const text = document.createElement('div');
+        text.textContent = value;
+        grid.append(name, text);
+    }
+}
+
+function findCard(path) {
+    return document.querySelector(`.file-card[data-path="${CSS.escape(path)}"]`);
+}
+
+async function resyncListing() {
+    const response = await fetch(`${ROOT_PREFIX}/api/list?path=${encodeURIComponent(currentDir)}`);
+    if (!response.ok) return;
+    const data = await response.json();
+    const grid = document.querySelector('.files-grid');
+    const selected = new Set(getSelectedPaths());
+    grid.replaceChildren(...data.items.map(item => {
+        const card = createFileCard(item);
+        if (selected.has(item.path)) setCardSelected(card, true);
+        return card;
+    }));
+    updateSelectionBar();
+}
+
+function applyChanges(batch) {
+    if (batch.path !== currentDir.replace(/^\/+|\/+$/g, '')) return;
+    if (batch.resync) {
+        resyncListing();
+        return;
+    }
+    const grid = document.querySelector('.files-grid');
+    batch.changes.forEach(change => {
+        const existing = findCard(change.path);
+        if (change.type === 'deleted') {
+            if (existing) existing.remove();
+        } else if (existing) {
+            existing.replaceWith(createFileCard(change.item));
+        } else {
+            grid.appendChild(createFileCard(change.item));
+        }
+    });
+    updateSelectionBar();
+}
+
+function refreshListing() {
+    // With a live feed the changes arrive on their own
+    if (changeFeed && changeFeed.readyState === EventSource.OPEN) return;
+    location.reload();
+}
+
+// A busy server answers 503 with Retry-After; wait that long (plus jitter, growing each time) and retry
+function retryDelay(retryAfter, attempt) {
+    const seconds = Number(retryAfter) || 1;
+    return (seconds * 1000 * Math.pow(1.5, attempt)) + Math.random() * 500;
+}
+
+async function fetchWithBackoff(url, options, attempts = 6) {
+    for (let attempt = 0; ; attempt++) {
+        const response = await fetch(url, options);
+        if (response.status !== 503 || attempt >= attempts - 1) return response;
+        await new Promise(resolve => setTimeout(resolve, retryDelay(response.headers.get('Retry-After'), attempt)));
+    }
+}
+
+// Folders on peer nodes are read-only and have no live feed here
+const READ_ONLY = LD_CONFIG.readOnly;
+
+if (window.EventSource && !READ_ONLY) {
+    changeFeed = new EventSource(`${ROOT_PREFIX}/api/events?path=${encodeURIComponent(currentDir)}`);
+    changeFeed.addEventListener('changes', e => applyChanges(JSON.parse(e.data)));
+    // Anything missed while disconnected is caught up with a full resync
+    let feedWasLost = false;
+    changeFeed.onerror = () => { feedWasLost = true; };
+    changeFeed.onopen = () => {
+        if (feedWasLost) resyncListing();
+        feedWasLost = false;
+    };
+}
+
+// Background jobs: progress is streamed from /api/jobs/<id>/events
+function formatBytes(bytes) {
+    if (bytes > 1e9) return `${(bytes/1e9).toFixed(2)} GB`;
+    if (bytes > 1e6) return `${(bytes/1e6).toFixed(2)} MB`;
+    if (bytes > 1e3) return `${(bytes/1e3).toFixed(2)} KB`;
+    return `${bytes} B`;
+}
+
+function renderJob(job) {
+    let el = document.getElementById(`job-${job.id}`);
+    if (!el) {
+        el = document.createElement('div');
+        el.className = 'job-item';
+        el.id = `job-${job.id}`;
+        el.innerHTML = `
+            <div class="job-header">
+                <span class="job-title"></span>
+                <i class="fas fa-times job-cancel" title="Cancel"></i>
+            </div>
+            <div class="progress-bar"><div class="progress-fill"></div></div>
+            <div class="job-status"></div>`;
+        el.querySelector('.job-cancel').addEventListener('click', () => {
+            fetch(`/api/jobs/${job.id}/cancel`, {method: 'POST'});
+        });
+        document.getElementById('jobsPanel').appendChild(el);
+    }
+    el.querySelector('.job-title').textContent = job.description;
+
+    let percentage = 0;
+    let status = job.status;
+    if (job.bytes_total) {
+        percentage = job.bytes_done / job.bytes_total * 100;
+        status = `${formatBytes(job.bytes_done)} of ${formatBytes(job.bytes_total)}`;
+    } else if (job.items_total) {
+        percentage = job.items_done / job.items_total * 100;
+        status = `${job.items_done} of ${job.items_total} items`;
+    }
+    if (job.status === 'running' && job.eta !== null) {
+        status += ` • ${formatTimeLeft(job.eta)} left`;
+    } else if (job.status !== 'running') {
+        status = job.error ? `${job.status}: ${job.error}` : job.status;
+    }
+    el.querySelector('.progress-fill').style.width = `${Math.min(100, percentage)}%`;
+    el.querySelector('.job-status').textContent = status;
+    return el;
+}
+
+function watchJob(jobId, onDone) {
+    const source = new EventSource(`/api/jobs/${jobId}/events`);
+    source.onmessage = (e) => {
+        const job = JSON.parse(e.data);
+        const el = renderJob(job);
+        if (!['queued', 'running'].includes(job.status)) {
+            source.close();
+            setTimeout(() => el.remove(), 3000);
+            if (onDone) onDone(job);
+        }
+    };
+    source.onerror = () => source.close();
+}
+
+// Pick up jobs that were started earlier or from another device
+fetch('/api/jobs?active=1').then(r => r.json()).then(data => {
+    data.jobs.forEach(job => watchJob(job.id));
+});
+
+// Multi-select and batch operations
+function getSelectedPaths() {
+    return Array.from(document.querySelectorAll('.file-card.selected')).map(card => card.dataset.path);
+}
+
+function updateSelectionBar() {
+    const count = getSelectedPaths().length;
+    document.getElementById('selectionCount').textContent = `${count} selected`;
+    document.getElementById('selectionBar').classList.toggle('active', count > 0);
+    document.querySelector('.files-grid').classList.toggle('selecting', count > 0);
+}
+
+function setCardSelected(card, selected) {
+    card.classList.toggle('selected', selected);
+    card.querySelector('.select-box').checked = selected;
+}
+
+function selectAllItems() {
+    document.querySelectorAll('.file-card').forEach(card => setCardSelected(card, true));
+    updateSelectionBar();
+}
+
+function clearSelection() {
+    document.querySelectorAll('.file-card.selected').forEach(card => setCardSelected(card, false));
+    updateSelectionBar();
+}
+
+function reportBatch(result) {
+    clearSelection();
+    if (result.failed) {
+        const errors = result.results.filter(r => r.status !== 'success')
+            .slice(0, 10).map(r => `${r.path}: ${r.error}`).join('\n');
+        alert(`${result.failed} of ${result.results.length} operations failed:\n${errors}`);
+    }
+    refreshListing();
+}
+
+async function runBatch(operations) {
+    // Large selections run as a background job so the request can't time out
+    const background = operations.length > 50;
+    const response = await fetch(ROOT_PREFIX + '/api/batch', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({operations, background})
+    });
+    const result = await response.json();
+    if (response.status === 202) {
+        watchJob(result.job_id, job => {
+            if (job.result) reportBatch(job.result); else refreshListing();
+        });
+    } else {
+        reportBatch(result);
+    }
+}
+
+function deleteSelected() {
+    const paths = getSelectedPaths();
+    if (paths.length && confirm(`Are you sure you want to delete ${paths.length} items?`)) {
+        runBatch(paths.map(path => ({op: 'delete', path})));
+    }
+}
+
+async function startTransfer(kind, paths, dest) {
+    // Copies and moves run on the server as background jobs
+    const response = await fetch(`${ROOT_PREFIX}/api/${kind}`, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({paths, dest})
+    });
+    const result = await response.json();
+    if (response.status !== 202) {
+        alert(`Could not ${kind}: ${result.error}`);
+        return;
+    }
+    clearSelection();
+    watchJob(result.job_id, job => {
+        if (job.status === 'failed') alert(`${job.description} failed: ${job.error}`);
+        refreshListing();
+    });
+}
+
+function moveSelected() {
+    const paths = getSelectedPaths();
+    if (!paths.length) return;
+    const dest = prompt('Move selected items to folder (path from the shared root):', currentDir);
+    if (dest !== null) {
+        startTransfer('move', paths, dest);
+    }
+}
+
+function copySelected() {
+    const paths = getSelectedPaths();
+    if (!paths.length) return;
+    const dest = prompt('Copy selected items to folder (path from the shared root):', currentDir);
+    if (dest !== null) {
+        startTransfer('copy', paths, dest);
+    }
+}
+
+document.addEventListener('click', (e) => {
+    const box = e.target.closest('.select-box');
+    const card = e.target.closest('.file-card');
+    if (!card) return;
+    // Ctrl/Cmd-click anywhere on a card toggles it, like a file manager
+    if (box) {
+        e.stopImmediatePropagation();
+        setCardSelected(card, box.checked);
+        updateSelectionBar();
+    } else if (e.ctrlKey || e.metaKey) {
+        e.preventDefault();
+        e.stopImmediatePropagation();
+        setCardSelected(card, !card.classList.contains('selected'));
+        updateSelectionBar();
+    }
+}, true);
+
+// Add new folder functionality
+function createNewFolder() {
+    const folderName = prompt('Enter folder name:');
+    if (folderName) {
+        const currentPath = new URLSearchParams(window.location.search).get('path') || '';
+        fetch(ROOT_PREFIX + '/create_folder', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/x-www-form-urlencoded'},
+            body: `path=${currentPath}&name=${folderName}`
+        }).then(() => refreshListing());
+    }
+}
+
+// Speed calculation utilities
+function formatSpeed(bytesPerSecond) {
+    if (bytesPerSecond > 1000000) return `${(bytesPerSecond/1000000).toFixed(2)} MB/s`;
+    if (bytesPerSecond > 1000) return `${(bytesPerSecond/1000).toFixed(2)} KB/s`;
+    return `${Math.round(bytesPerSecond)} B/s`;
+}
+
+function formatTimeLeft(seconds) {
+    if (seconds === Infinity) return 'Calculating...';
+    if (seconds > 3600) return `${Math.round(seconds/3600)}h ${Math.round((seconds%3600)/60)}m`;
+    if (seconds > 60) return `${Math.round(seconds/60)}m ${Math.round(seconds%60)}s`;
+    return `${Math.round(seconds)}s`;
+}
+
+// Upload queue: files go up a few at a time and the modal shows the whole batch
+const UPLOAD_CONCURRENCY = LD_CONFIG.uploadConcurrency;
+
+async function uploadFiles(entries, folders = []) {
+    // entries: [{file, dir}] where dir is the file's folder inside the upload;
+    // folders: every folder of a dropped tree, so the empty ones are created as well
+    if ((!entries.length && !folders.length) || READ_ONLY) return;
+    const currentPath = new URLSearchParams(window.location.search).get('path') || '';
+
+    // Folders are created in one request up front instead of once per file
+    const dirs = [...new Set(entries.map(entry => entry.dir).filter(Boolean).concat(folders))];
+    if (dirs.length) {
+        await fetch(ROOT_PREFIX + '/api/upload/prepare', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({path: currentPath, dirs})
+        });
+    }
+    if (!entries.length) {
+        refreshListing();
+        return;
+    }
+
+    const totalBytes = entries.reduce((sum, entry) => sum + entry.file.size, 0);
+    const loaded = new Array(entries.length).fill(0);
+    let finished = 0;
+    let failed = 0;
+    let next = 0;
+
+    document.getElementById('overlay').style.display = 'block';
+    document.getElementById('progressModal').style.display = 'block';
+    const title = document.getElementById('transferTitle');
+    title.textContent = entries.length === 1 ? `Uploading ${entries[0].file.name}...` : `Uploading ${entries.length} files...`;
+
+    const startTime = Date.now();
+    let lastUpdate = startTime;
+    let lastBytes = 0;
+    let speeds = [];
+
+    function updateProgress() {
+        const now = Date.now();
+        const done = loaded.reduce((a, b) => a + b, 0);
+        if (now - lastUpdate >= 250 || done === totalBytes) {
+            const currentSpeed = (done - lastBytes) / Math.max((now - lastUpdate) / 1000, 0.001);
+            speeds.push(currentSpeed);
+            if (speeds.length > 5) speeds.shift();
+            lastUpdate = now;
+            lastBytes = done;
+        }
+        const avgSpeed = done / Math.max((now - startTime) / 1000, 0.001);
+        const percentage = totalBytes ? Math.round((done / totalBytes) * 100) : Math.round((finished / entries.length) * 100);
+        document.getElementById('progressFill').style.width = `${percentage}%`;
+        document.getElementById('currentSpeed').textContent = formatSpeed(speeds.length ? speeds.reduce((a, b) => a + b) / speeds.length : 0);
+        document.getElementById('avgSpeed').textContent = formatSpeed(avgSpeed);
+        document.getElementById('timeLeft').textContent = formatTimeLeft(avgSpeed ? (totalBytes - done) / avgSpeed : Infinity);
+        document.getElementById('completed').textContent =
+            entries.length === 1 ? `${percentage}%` : `${percentage}% (${finished}/${entries.length} files)`;
+    }
+
+    function uploadOne(index, attempt = 0) {
+        const entry = entries[index];
+        return new Promise(resolve => {
+            const formData = new FormData();
+            formData.append('file', entry.file);
+            formData.append('path', currentPath);
+            formData.append('relative_path', entry.dir || '');
+            const xhr = new XMLHttpRequest();
+            // The name lets the desktop app show what is arriving before the form is parsed
+            const name = entry.dir ? `${entry.dir}/${entry.file.name}` : entry.file.name;
+            xhr.open('POST', `${ROOT_PREFIX}/upload?name=${encodeURIComponent(name)}`, true);
+            xhr.upload.onprogress = (e) => {
+                loaded[index] = e.loaded * (entry.file.size / Math.max(e.total, 1));
+                updateProgress();
+            };
+            xhr.onload = () => {
+                if (xhr.status === 503 && attempt < 5) {
+                    loaded[index] = 0;
+                    updateProgress();
+                    setTimeout(() => uploadOne(index, attempt + 1).then(resolve),
+                               retryDelay(xhr.getResponseHeader('Retry-After'), attempt));
+                    return;
+                }
+                if (xhr.status >= 400) failed++;
+                loaded[index] = entry.file.size;
+                finished++;
+                updateProgress();
+                resolve();
+            };
+            xhr.onerror = () => {
+                failed++;
+                finished++;
+                resolve();
+            };
+            xhr.send(formData);
+        });
+    }
+
+    async function worker() {
+        while (next < entries.length) {
+            await uploadOne(next++);
+        }
+    }
+
+    await Promise.all(Array.from({length: Math.min(UPLOAD_CONCURRENCY, entries.length)}, worker));
+    document.getElementById('overlay').style.display = 'none';
+    document.getElementById('progressModal').style.display = 'none';
+    if (failed) alert(`${failed} of ${entries.length} uploads failed.`);
+    refreshListing();
+}
+
+function folderOf(relativePath) {
+    const parts = relativePath.split('/');
+    parts.pop();
+    return parts.join('/');
+}
+
+document.getElementById('uploadInput').addEventListener('change', (e) => {
+    uploadFiles([...e.target.files].map(file => ({file, dir: ''})));
+    e.target.value = '';
+});
+
+document.getElementById('folderInput').addEventListener('change', (e) => {
+    uploadFiles([...e.target.files].map(file => ({file, dir: folderOf(file.webkitRelativePath || file.name)})));
+    e.target.value = '';
+});
+
+// Drag and drop, including whole folders
+async function collectDropped(entry, dir, out, folders) {
+    if (entry.isFile) {
+        const file = await new Promise((resolve, reject) => entry.file(resolve, reject));
+        out.push({file, dir});
+    } else if (entry.isDirectory) {
+        const reader = entry.createReader();
+        const childDir = dir ? `${dir}/${entry.name}` : entry.name;
+        folders.push(childDir);
+        // readEntries returns results in chunks until it comes back empty
+        while (true) {
+            const children = await new Promise((resolve, reject) => reader.readEntries(resolve, reject));
+            if (!children.length) break;
+            for (const child of children) await collectDropped(child, childDir, out, folders);
+        }
+    }
+}
+
+let dragDepth = 0;
+document.addEventListener('dragenter', (e) => {
+    if (READ_ONLY || !e.dataTransfer.types.includes('Files')) return;
+    dragDepth++;
+    document.body.classList.add('drop-target');
+});
+document.addEventListener('dragleave', () => {
+    dragDepth = Math.max(0, dragDepth - 1);
+    if (!dragDepth) document.body.classList.remove('drop-target');
+});
+document.addEventListener('dragover', (e) => {
+    if (!READ_ONLY && e.dataTransfer.types.includes('Files')) e.preventDefault();
+});
+document.addEventListener('drop', async (e) => {
+    if (READ_ONLY || !e.dataTransfer.types.includes('Files')) return;
+    e.preventDefault();
+    dragDepth = 0;
+    document.body.classList.remove('drop-target');
+    const items = [...e.dataTransfer.items].map(item => item.webkitGetAsEntry && item.webkitGetAsEntry());
+    const entries = [];
+    const folders = [];
+    if (items.every(Boolean)) {
+        for (const entry of items) await collectDropped(entry, '', entries, folders);
+    } else {
+        [...e.dataTransfer.files].forEach(file => entries.push({file, dir: ''}));
+    }
+    uploadFiles(entries, folders);
+});
+
+// Add download speed monitoring
+document.addEventListener('click', async (e) => {
+    const fileCard = e.target.closest('.file-card[data-type="file"]');
+    if (fileCard && !e.target.closest('.context-menu')) {
+        e.preventDefault();
+        const link = fileCard.querySelector('a').href;
+        const fileName = fileCard.querySelector('span').textContent;
+        
+        // Show progress modal
+        document.getElementById('overlay').style.display = 'block';
+        document.getElementById('progressModal').style.display = 'block';
+        document.getElementById('transferTitle').textContent = `Downloading ${fileName}...`;
+
+        try {
+            const response = await fetchWithBackoff(link);
+            if (!response.ok) throw new Error('Download failed');
+            
+            const contentLength = +response.headers.get('Content-Length');
+            const chunks = [];
+            let receivedLength = 0;
+            let startTime = Date.now();
+            let lastUpdate = startTime;
+            let lastBytes = 0;
+            let speeds = [];
+
+            const reader = response.body.getReader();
+
+            while (true) {
+                const {done, value} = await reader.read();
+                
+                if (done) break;
+                
+                chunks.push(value);
+                receivedLength += value.length;
+                const now = Date.now();
+                const timeDiff = (now - lastUpdate) / 1000;
+                const bytesDiff = receivedLength - lastBytes;
+                const currentSpeed = bytesDiff / timeDiff;
+                
+                speeds.push(currentSpeed);
+                if (speeds.length > 5) speeds.shift();
+                
+                const avgSpeed = speeds.reduce((a,b) => a+b) / speeds.length;
+                const percentage = Math.round((receivedLength / contentLength) * 100);
+                const timeLeft = (contentLength - receivedLength) / avgSpeed;
+
+                document.getElementById('progressFill').style.width = `${percentage}%`;
+                document.getElementById('currentSpeed').textContent = formatSpeed(currentSpeed);
+                document.getElementById('avgSpeed').textContent = formatSpeed(avgSpeed);
+                document.getElementById('timeLeft').textContent = formatTimeLeft(timeLeft);
+                document.getElementById('completed').textContent = `${percentage}%`;
+
+                lastBytes = receivedLength;
+                lastUpdate = now;
+            }
+
+            // Combine chunks and create blob
+            const blob = new Blob(chunks);
+            const downloadUrl = window.URL.createObjectURL(blob);
+            const a = document.createElement('a');
+            a.href = downloadUrl;
+            a.download = fileName;
+            document.body.appendChild(a);
+            a.click();
+            window.URL.revokeObjectURL(downloadUrl);
+            a.remove();
+        } catch (error) {
+            alert('Download failed: ' + error.message);
+        } finally {
+            document.getElementById('overlay').style.display = 'none';
+            document.getElementById('progressModal').style.display = 'none';
+        }
+    }
+});
+
+// Text preview pages through /api/text so huge logs never download whole
+const textFormats = ['txt', 'log', 'csv', 'tsv', 'md', 'json', 'jsonl', 'xml', 'yaml', 'yml', 'ini', 'cfg', 'conf', 'sql', 'html', 'css', 'js'];
+const TEXT_PAGE_SIZE = 200;
+let textPreview = null;
+
+function openTextPreview(path) {
+    textPreview = {path, start: 0, total: 0, nextLine: 0, followOffset: null, followTimer: null};
+    document.getElementById('previewContent').innerHTML = `
+        <div class="text-preview">
+            <div class="text-toolbar">
+                <button class="nav-button" onclick="loadTextPage(0)"><i class="fas fa-angle-double-up"></i> Head</button>
+                <button class="nav-button" onclick="loadTextPage(textPreview.start - TEXT_PAGE_SIZE)"><i class="fas fa-angle-up"></i> Prev</button>
+                <button class="nav-button" onclick="loadTextPage(textPreview.start + TEXT_PAGE_SIZE)"><i class="fas fa-angle-down"></i> Next</button>
+                <button class="nav-button" onclick="loadTextTail()"><i class="fas fa-angle-double-down"></i> Tail</button>
+                <input type="number" min="1" id="textGoto" placeholder="Line" onkeydown="if (event.key === 'Enter') loadTextPage(this.value - 1)">
+                <label><input type="checkbox" id="textFollow" onchange="toggleTextFollow(this.checked)"> Follow</label>
+                <span class="text-status" id="textStatus">Loading...</span>
+            </div>
+            <pre class="text-lines" id="textLines"></pre>
+        </div>`;
+    document.getElementById('previewModal').classList.add('text-mode');
+    document.getElementById('overlay').style.display = 'block';
+    document.getElementById('previewModal').style.display = 'block';
+    loadTextPage(0);
+}
+
+function renderTextLines(start, lines, append) {
+    const pre = document.getElementById('textLines');
+    if (!append) pre.textContent = '';
+    lines.forEach((text, i) => {
+        const row = document.createElement('div');
+        const number = document.createElement('span');
+        number.className = 'line-no';
+        number.textContent = start + i + 1;
+        row.appendChild(number);
+        row.appendChild(document.createTextNode(text));
+        pre.appendChild(row);
+    });
+}
+
+function updateTextStatus(data) {
+    textPreview.total = data.total_lines;
+    const end = Math.min(textPreview.start + TEXT_PAGE_SIZE, data.total_lines);
+    document.getElementById('textStatus').textContent =
+        `Lines ${data.total_lines ? textPreview.start + 1 : 0}-${end} of ${data.total_lines} (${formatBytes(data.size)})`;
+}
+
+async function fetchText(query) {
+    const path = textPreview.path;
+    while (true) {
+        const response = await fetch(`${ROOT_PREFIX}/api/text/${path}?${query}`);
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || 'Preview failed');
+        if (response.status !== 202) return data;
+        // A big file is indexed in the background the first time; wait for it
+        if (!textPreview || textPreview.path !== path) throw new Error('Preview closed');
+        const percent = data.size ? Math.floor(100 * data.indexed / data.size) : 0;
+        document.getElementById('textStatus').textContent = `Indexing ${formatBytes(data.size)} file... ${percent}%`;
+        await new Promise(resolve => setTimeout(resolve, 1000 * (Number(response.headers.get('Retry-After')) || 1)));
+    }
+}
+
+async function loadTextPage(start) {
+    if (!textPreview) return;
+    start = Math.max(0, Math.min(Number(start) || 0, Math.max(0, textPreview.total - 1)));
+    try {
+        const data = await fetchText(`start=${start}&count=${TEXT_PAGE_SIZE}`);
+        textPreview.start = data.start;
+        renderTextLines(data.start, data.lines, false);
+        updateTextStatus(data);
+        document.getElementById('textLines').scrollTop = 0;
+    } catch (error) {
+        document.getElementById('textStatus').textContent = error.message;
+    }
+}
+
+async function loadTextTail() {
+    if (!textPreview) return;
+    try {
+        const data = await fetchText(`tail=${TEXT_PAGE_SIZE}`);
+        textPreview.start = data.start;
+        textPreview.followOffset = data.next_offset;
+        // A last line still being written comes back whole through follow mode
+        textPreview.tailPartial = data.lines.length > 0 && data.next_offset < data.size;
+        textPreview.nextLine = data.start + data.lines.length - (textPreview.tailPartial ? 1 : 0);
+        renderTextLines(data.start, data.lines, false);
+        updateTextStatus(data);
+        const pre = document.getElementById('textLines');
+        pre.scrollTop = pre.scrollHeight;
+    } catch (error) {
+        document.getElementById('textStatus').textContent = error.message;
+    }
+}
+
+async function pollTextFollow() {
+    if (!textPreview || textPreview.followOffset === null) return;
+    try {
+        const data = await fetchText(`follow=${textPreview.followOffset}`);
+        const pre = document.getElementById('textLines');
+        if (data.reset) {
+            pre.textContent = '';
+            textPreview.tailPartial = false;
+            textPreview.nextLine = 0;
+        }
+        if (data.lines.length) {
+            if (textPreview.tailPartial && pre.lastChild) pre.removeChild(pre.lastChild);
+            textPreview.tailPartial = false;
+            const first = data.first_line ?? textPreview.nextLine;
+            renderTextLines(first, data.lines, true);
+            textPreview.nextLine = first + data.lines.length;
+            pre.scrollTop = pre.scrollHeight;
+        }
+        textPreview.followOffset = data.next_offset;
+        document.getElementById('textStatus').textContent =
+            `Following: ${data.total_lines} lines (${formatBytes(data.size)})`;
+    } catch (error) {
+        document.getElementById('textStatus').textContent = error.message;
+    }
+}
+
+async function toggleTextFollow(enabled) {
+    clearInterval(textPreview.followTimer);
+    textPreview.followTimer = null;
+    if (!enabled) return;
+    await loadTextTail();
+    textPreview.followTimer = setInterval(pollTextFollow, 2000);
+}
+
+// Archive preview lists members and fetches single entries via /api/archive
+const archiveFormats = ['zip', 'jar', 'tar', 'tgz', 'gz', 'tbz2', 'bz2', 'txz', 'xz'];
+
+function openArchivePreview(path) {
+    document.getElementById('previewContent').innerHTML = `
+        <div class="text-preview">
+            <div class="text-toolbar">
+                <span id="archiveCrumbs"></span>
+                <span class="text-status" id="archiveStatus">Loading...</span>
+            </div>
+            <ul class="archive-entries" id="archiveEntries"></ul>
+        </div>`;
+    document.getElementById('previewModal').classList.add('text-mode');
+    document.getElementById('overlay').style.display = 'block';
+    document.getElementById('previewModal').style.display = 'block';
+    loadArchiveFolder(path, '');
+}
+
+async function loadArchiveFolder(path, prefix) {
+    const query = `path=${encodeURIComponent(path)}&prefix=${encodeURIComponent(prefix)}`;
+    const response = await fetchWithBackoff(`${ROOT_PREFIX}/api/archive/list?${query}`);
+    const data = await response.json();
+    const status = document.getElementById('archiveStatus');
+    if (!response.ok) {
+        status.textContent = data.error || 'Could not read archive';
+        return;
+    }
+    status.textContent = `${data.members} entries (${data.type.toUpperCase()})`;
+
+    const crumbs = document.getElementById('archiveCrumbs');
+    crumbs.textContent = '';
+    const parts = prefix ? prefix.split('/') : [];
+    [path.split('/').pop(), ...parts].forEach((part, i) => {
+        const link = document.createElement('a');
+        link.href = '#';
+        link.textContent = part;
+        link.onclick = e => { e.preventDefault(); loadArchiveFolder(path, parts.slice(0, i).join('/')); };
+        if (i) crumbs.appendChild(document.createTextNode(' / '));
+        crumbs.appendChild(link);
+    });
+
+    const list = document.getElementById('archiveEntries');
+    list.textContent = '';
+    data.entries.forEach(entry => {
+        const row = document.createElement('li');
+        const link = document.createElement('a');
+        const icon = entry.type === 'folder' ? 'folder' : 'file';
+        link.innerHTML = `<i class="fas fa-${icon}"></i> `;
+        link.appendChild(document.createTextNode(entry.name));
+        if (entry.type === 'folder') {
+            link.onclick = () => loadArchiveFolder(path, entry.path);
+        } else {
+            link.href = `${ROOT_PREFIX}/api/archive/get?path=${encodeURIComponent(path)}&member=${encodeURIComponent(entry.path)}&download=1`;
+        }
+        const size = document.createElement('span');
+        size.className = 'entry-size';
+        size.textContent = entry.type === 'folder' ? '' : formatBytes(entry.size);
+        row.appendChild(link);
+        row.appendChild(size);
+        list.appendChild(row);
+    });
+}
+
+function closePreviewModal() {
+    if (textPreview) {
+        clearInterval(textPreview.followTimer);
+        textPreview = null;
+    }
+    document.getElementById('previewModal').classList.remove('text-mode');
+    const previewContent = document.getElementById('previewContent');
+    previewContent.innerHTML = ''; // Stop video playback
+    document.getElementById('overlay').style.display = 'none';
+    document.getElementById('previewModal').style.display = 'none';
+}
+
+function closeDetailsModal() {
+    document.getElementById('overlay').style.display = 'none';
+    document.getElementById('detailsModal').style.display = 'none';
+}
+
+// Close details modal when clicking overlay
+document.getElementById('overlay').addEventListener('click', () => {
+    closePreviewModal();
+    closeDetailsModal();
+});
+
+function formatTime(seconds) {
+    const mins = Math.floor(seconds / 60);
+    const secs = Math.floor(seconds % 60);
+    return `${mins}:${secs.toString().padStart(2, '0')}`;
+}
+
+function togglePlay() {
+    const video = document.getElementById('videoPlayer');
+    if (video.paused) {
+        video.play();
+    } else {
+        video.pause();
+    }
+}
+
+function seek(event) {
+    const video = document.getElementById('videoPlayer');
+    const progress = event.offsetX / event.target.offsetWidth;
+    video.currentTime = progress * video.duration;
+}
+
+function toggleFullscreen() {
+    const videoContainer = document.querySelector('.video-player');
+    if (!document.fullscreenElement) {
+        videoContainer.requestFullscreen();
+    } else {
+        document.exitFullscreen();
+    }
+}
+
+function changeQuality(quality) {
+    // Could be implemented with multiple video sources
+    console.log('Quality changed to:', quality);
+}
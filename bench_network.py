@@ -0,0 +1,128 @@
+"""
+Compare LocalDrive's network profiles on this machine.
+
+For each profile a server is started on a scratch folder and measured for:
+  - download throughput with several clients pulling a large file at once
+  - round trip time of small JSON replies on a kept-alive connection
+  - worker threads still held by clients that connected and then stalled
+
+Usage: python bench_network.py [--size-mb 256] [--clients 4] [--stalled 20]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import tempfile
+import time
+from threading import Thread
+
+from launcher_win import FlaskServerThread, network_profile, NETWORK_PROFILES
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def download(port, path, results):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('GET', path)
+    response = conn.getresponse()
+    received = 0
+    while True:
+        chunk = response.read(1024 * 1024)
+        if not chunk:
+            break
+        received += len(chunk)
+    conn.close()
+    results.append(received)
+
+
+def measure_throughput(port, clients):
+    results = []
+    threads = [Thread(target=download, args=(port, '/download/bench.bin', results)) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return sum(results) / elapsed / (1024 * 1024)
+
+
+def measure_small_replies(port, count=200):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        conn.request('GET', '/api/list')
+        conn.getresponse().read()
+        timings.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    return statistics.median(timings), max(timings)
+
+
+def measure_stalled(server, port, stalled, settle):
+    # Half a request line, then nothing: a phone that dropped off the Wi-Fi mid-request
+    sockets = []
+    for _ in range(stalled):
+        s = socket.create_connection(('127.0.0.1', port))
+        s.sendall(b'GET /api/list HTTP/1.1\r\nHost: bench\r\n')
+        sockets.append(s)
+    time.sleep(1)
+    held_before = server.server.active_connections
+    time.sleep(settle)
+    held_after = server.server.active_connections
+    for s in sockets:
+        s.close()
+    return held_before, held_after
+
+
+def run_profile(name, folder, args):
+    profile = network_profile(name)
+    server = FlaskServerThread(upload_folder=folder, access_log_path=None)
+    server.network_profile = profile
+    port = free_port()
+    if not server.start('127.0.0.1', port):
+        raise RuntimeError(f"Server did not start: {server.start_error}")
+    try:
+        measure_throughput(port, 1)  # Warm the page cache and the block cache
+        throughput = measure_throughput(port, args.clients)
+        median_ms, worst_ms = measure_small_replies(port)
+        settle = args.settle if args.settle is not None else (profile['read_timeout'] or 10) + 2
+        held_before, held_after = measure_stalled(server, port, args.stalled, settle)
+    finally:
+        server.stop()
+    return {'throughput': throughput, 'median_ms': median_ms, 'worst_ms': worst_ms,
+            'held_before': held_before, 'held_after': held_after, 'settle': settle}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark LocalDrive network profiles')
+    parser.add_argument('--size-mb', type=int, default=256, help='Size of the file downloaded (default: 256)')
+    parser.add_argument('--clients', type=int, default=4, help='Parallel downloads (default: 4)')
+    parser.add_argument('--stalled', type=int, default=20, help='Clients that connect and stall (default: 20)')
+    parser.add_argument('--settle', type=float, default=None,
+                        help="Seconds to wait before counting held workers (default: the profile's read timeout + 2)")
+    parser.add_argument('--profiles', nargs='+', default=sorted(NETWORK_PROFILES), choices=sorted(NETWORK_PROFILES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, 'bench.bin'), 'wb') as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        print(f"{args.clients} x {args.size_mb} MB downloads, 200 small replies, {args.stalled} stalled clients")
+        print(f"{'profile':<8} {'MB/s':>8} {'median ms':>10} {'worst ms':>9} {'held after 1s':>14} {'held later':>11}")
+        for name in args.profiles:
+            result = run_profile(name, folder, args)
+            print(f"{name:<8} {result['throughput']:>8.0f} {result['median_ms']:>10.2f} {result['worst_ms']:>9.2f} "
+                  f"{result['held_before']:>14} {result['held_after']:>8} @{result['settle']:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -54,7 +54,8 @@ def install_missing_dependencies():
     """Check and install missing dependencies"""
     required_packages = [
         'flask', 'humanize', 'pillow', 'pystray', 
-        'pywin32', 'qrcode', 'requests'
+        'pywin32', 'qrcode', 'requests',
+        'fonttools', 'brotli', 'rjsmin', 'rcssmin'
     ]
     
     for package in required_packages:
@@ -180,6 +181,10 @@ def build_executable():
         if not os.path.exists(resource):
             os.makedirs(resource, exist_ok=True)
             print(f"Created {resource} directory")
+
+    # Rebuild static/dist from assets/ so the bundle never ships stale front-end files
+    print("Building front-end assets...")
+    subprocess.run([sys.executable, 'build_assets.py', '--check'], check=True)
     
     # 6. Check for icon
     icon_path = 'icon.ico'
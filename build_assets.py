@@ -0,0 +1,249 @@
+# LocalDrive - A file sharing application
+# Copyright (C) 2023-2024 Ranjan Developer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Build the web UI's front-end files into static/dist.
+
+Sources live in assets/: critical.css is inlined into the page head, app.css
+and app.js load after first paint, and vendor/ holds third-party files. Every
+output gets a content hash in its name so browsers can cache it for good;
+static/dist/manifest.json maps the plain names to the hashed ones for
+launcher_win.py.
+
+  - CSS and JS are minified
+  - the Font Awesome solid font is cut down to the icons the page uses
+  - the logo and favicon are resized to what the page actually shows
+
+Usage: python build_assets.py [--check]
+
+Needs fonttools, brotli, rjsmin, rcssmin and Pillow (see requirements.txt).
+--check also renders the listing page and fails if it is over budget.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ASSETS = os.path.join(ROOT, 'assets')
+DIST = os.path.join(ROOT, 'static', 'dist')
+TEMPLATE = os.path.join(ROOT, 'templates', 'index.html')
+FONT_AWESOME = os.path.join(ASSETS, 'vendor', 'fontawesome')
+
+# Icons whose names are put together at runtime, so a scan can't see them
+DYNAMIC_ICONS = ['folder', 'file']
+
+# Limits for the main listing page, checked with --check
+BUDGETS = {
+    'first_paint_bytes': 16 * 1024,  # HTML up to </head> with the inlined CSS, about one round trip
+    'blocking_requests': 0,          # Stylesheets and scripts the first paint has to wait for
+    'external_requests': 0,          # Anything fetched from outside this server
+    'page_bytes': 200 * 1024,        # HTML for a 200-file folder plus everything it loads
+}
+
+
+def minify_css(text):
+    try:
+        import rcssmin
+        return rcssmin.cssmin(text)
+    except ImportError:
+        # Comments and indentation only, safe without a real parser
+        text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+        return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def minify_js(text):
+    try:
+        import rjsmin
+        return rjsmin.jsmin(text)
+    except ImportError:
+        return '\n'.join(line.strip() for line in text.splitlines()
+                         if line.strip() and not line.strip().startswith('//'))
+
+
+def find_icons():
+    """Icon names used by the page and its script"""
+    names = set(DYNAMIC_ICONS)
+    for path in (TEMPLATE, os.path.join(ASSETS, 'app.js')):
+        with open(path, encoding='utf-8') as f:
+            names.update(re.findall(r'\bfa-([a-z0-9]+(?:-[a-z0-9]+)*)\b(?![$`{])', f.read()))
+    return sorted(names)
+
+
+def icon_codepoints():
+    """Font Awesome class name -> codepoint, aliases included"""
+    with open(os.path.join(FONT_AWESOME, 'fontawesome.min.css'), encoding='utf-8') as f:
+        css = f.read()
+    codepoints = {}
+    for selectors, codepoint in re.findall(r'((?:\.fa-[a-z0-9-]+:before,?)+)\{content:"\\([0-9a-f]+)"\}', css):
+        for name in re.findall(r'\.fa-([a-z0-9-]+):before', selectors):
+            codepoints[name] = int(codepoint, 16)
+    return codepoints
+
+
+def build_icon_font(codepoints):
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = []
+    options.name_IDs = []
+    options.hinting = False
+    options.notdef_outline = False
+    font = TTFont(os.path.join(FONT_AWESOME, 'fa-solid-900.ttf'), recalcTimestamp=False)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    out = BytesIO()
+    subset.save_font(font, out, options)
+    return out.getvalue()
+
+
+def icon_css(icons, codepoints, font_url):
+    rules = [
+        "@font-face{font-family:'LocalDrive Icons';font-style:normal;font-weight:900;"
+        f"font-display:block;src:url({font_url}) format('woff2')}}",
+        ".fas{font-family:'LocalDrive Icons';font-weight:900;font-style:normal;font-variant:normal;"
+        "display:inline-block;line-height:1;text-rendering:auto;-webkit-font-smoothing:antialiased}",
+    ]
+    for name in icons:
+        rules.append(f'.fa-{name}:before{{content:"\\{codepoints[name]:x}"}}')
+    return '\n'.join(rules)
+
+
+def resize_image(path, size, fmt, **save_options):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        out = BytesIO()
+        if fmt == 'ICO':
+            image.save(out, 'ICO', sizes=save_options['sizes'])
+        else:
+            image = image.convert('RGBA')
+            image.thumbnail(size, Image.LANCZOS)
+            image.save(out, fmt, optimize=True)
+        return out.getvalue()
+
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def build():
+    outputs = {}
+
+    def emit(name, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        outputs[name] = (hashed_name(name, data), data)
+        return '/static/dist/' + outputs[name][0]
+
+    icons = find_icons()
+    codepoints = icon_codepoints()
+    missing = [name for name in icons if name not in codepoints]
+    if missing:
+        sys.exit(f"Unknown Font Awesome icons: {', '.join(missing)}")
+    font_url = emit('icons.woff2', build_icon_font([codepoints[name] for name in icons]))
+
+    with open(os.path.join(ASSETS, 'critical.css'), encoding='utf-8') as f:
+        # Icons appear above the fold, so their few rules travel with the critical CSS
+        emit('critical.css', minify_css(f.read()) + '\n' + icon_css(icons, codepoints, font_url))
+    with open(os.path.join(ASSETS, 'app.css'), encoding='utf-8') as f:
+        emit('app.css', minify_css(f.read()))
+    with open(os.path.join(ASSETS, 'app.js'), encoding='utf-8') as f:
+        emit('app.js', minify_js(f.read()))
+
+    # The page shows the logo at 40px, 80px covers high-DPI screens
+    emit('logo.png', resize_image(os.path.join(ROOT, 'static', 'logo.png'), (80, 80), 'PNG'))
+    emit('favicon.ico', resize_image(os.path.join(ROOT, 'static', 'favicon.ico'), None, 'ICO',
+                                     sizes=[(16, 16), (32, 32), (48, 48)]))
+
+    os.makedirs(DIST, exist_ok=True)
+    for name in os.listdir(DIST):
+        os.remove(os.path.join(DIST, name))
+    for file_name, data in outputs.values():
+        with open(os.path.join(DIST, file_name), 'wb') as f:
+            f.write(data)
+    manifest = {name: file_name for name, (file_name, _) in sorted(outputs.items())}
+    with open(os.path.join(DIST, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"{len(icons)} icons: {', '.join(icons)}")
+    for name, (file_name, data) in sorted(outputs.items()):
+        print(f"  {file_name:<32} {len(data):>8,} bytes")
+
+
+def check_budget():
+    """Render the listing page and compare it with BUDGETS, False if it is over"""
+    from launcher_win import FlaskServerThread
+
+    with tempfile.TemporaryDirectory() as folder:
+        for i in range(200):
+            open(os.path.join(folder, f"file {i:03d}.txt"), 'w').close()
+        server = FlaskServerThread(upload_folder=folder, access_log_path=None)
+        client = server.app.test_client()
+        html = client.get('/').get_data(as_text=True)
+
+        head = html[:html.index('</head>')]
+        page = re.sub(r'<noscript>.*?</noscript>', '', html, flags=re.S)
+        links = re.findall(r'<link\b[^>]*>', page)
+        scripts = re.findall(r'<script\b[^>]*\bsrc=[^>]*>', page)
+        blocking = [tag for tag in links if re.search(r'rel="stylesheet"', tag)]
+        blocking += [tag for tag in scripts if not re.search(r'\b(defer|async)\b', tag)]
+
+        local = re.findall(r'(?:src|href)="(/static/[^"]+)"', page)
+        css_texts = [head]
+        page_bytes = len(html.encode('utf-8'))
+        for url in sorted(set(local)):
+            response = client.get(url)
+            if response.status_code != 200:
+                print(f"  {url} answered {response.status_code}")
+                return False
+            page_bytes += len(response.data)
+            if url.endswith('.css'):
+                css_texts.append(response.get_data(as_text=True))
+        external = [url for url in re.findall(r'(?:src|href)="([^"]+)"', page)
+                    if re.match(r'(https?:)?//', url)]
+        for css in css_texts:
+            external += [url for url in re.findall(r'url\(["\']?([^"\')]+)', css)
+                         if re.match(r'(https?:)?//', url)]
+
+    measured = {
+        'first_paint_bytes': len(head.encode('utf-8')),
+        'blocking_requests': len(blocking),
+        'external_requests': len(external),
+        'page_bytes': page_bytes,
+    }
+    ok = True
+    for key, limit in BUDGETS.items():
+        over = measured[key] > limit
+        ok = ok and not over
+        print(f"  {key:<18} {measured[key]:>9,} / {limit:>9,}  {'OVER' if over else 'ok'}")
+    for url in external:
+        print(f"  external: {url}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build LocalDrive's front-end files into static/dist")
+    parser.add_argument('--check', action='store_true', help='Also check the listing page against its budget')
+    args = parser.parse_args()
+    build()
+    if args.check and not check_budget():
+        sys.exit("The listing page is over budget")
+
+
+if __name__ == '__main__':
+    main()
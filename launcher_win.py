@@ -14,9 +14,42 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import time
+PROCESS_STARTED = time.perf_counter()  # Cold-start clock, read before the heavy imports below
+
 import sys
 import os
 import socket
+import json
+
+# Only one LocalDrive runs at a time. Another launch, such as the Explorer
+# "Share with LocalDrive" entry, hands its arguments to the running one over
+# a local socket and exits before paying for the imports below.
+INSTANCE_PORT = 47321
+# Files the program keeps for itself live next to it, whatever folder it was started from
+APP_DIR = os.path.dirname(os.path.abspath(sys.argv[0]))
+INSTANCE_TOKEN_FILE = os.path.join(APP_DIR, 'instance.token')
+
+def forward_to_running_instance(argv, timeout=5.0):
+    """Pass argv to the LocalDrive already running; True if it took them"""
+    try:
+        with open(INSTANCE_TOKEN_FILE, 'r') as f:
+            token = f.read().strip()
+    except OSError:
+        return False  # Nothing running, or it never got as far as listening
+    message = json.dumps({'token': token, 'argv': argv, 'cwd': os.getcwd()}).encode('utf-8') + b'\n'
+    try:
+        with socket.create_connection(('127.0.0.1', INSTANCE_PORT), timeout=timeout) as conn:
+            conn.sendall(message)
+            reply = conn.makefile('rb').readline()
+        return json.loads(reply).get('ok', False)
+    except (OSError, ValueError):
+        return False
+
+if (__name__ == '__main__' and not {'--server-only', '-h', '--help'} & set(sys.argv[1:])
+        and forward_to_running_instance(sys.argv[1:])):
+    sys.exit(0)
+
 import qrcode
 import webbrowser
 from PIL import Image, ImageTk
@@ -24,56 +57,3804 @@ from threading import Thread, Event
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
+from tkinter import filedialog
 import subprocess
 from datetime import datetime
 import signal
 import platform
 import ctypes
-import json
 import winreg as reg
 import requests  # For GitHub API requests
 import threading  # For background update check
 import re  # For version comparison
 
-# For system tray functionality
-import pystray
-from pystray import MenuItem as item
-from io import BytesIO
-from datetime import datetime, timedelta
+# For system tray functionality
+import pystray
+from pystray import MenuItem as item
+from io import BytesIO
+from datetime import datetime, timedelta
+
+# Flask imports
+from flask import Flask, request, render_template, render_template_string, stream_template, send_from_directory, jsonify, Response, g, abort, redirect
+import shutil
+import humanize
+import mimetypes
+import re
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+from werkzeug.http import http_date, parse_date
+from markupsafe import Markup
+import uuid
+import queue
+import random
+import traceback
+import copy
+import errno
+import atexit
+import argparse
+import hmac
+import tempfile
+import hashlib
+import sqlite3
+import struct
+import tarfile
+import zipfile
+import zlib
+from collections import OrderedDict
+from itertools import accumulate
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait as wait_futures
+from urllib.parse import urlparse, quote
+from requests.adapters import HTTPAdapter
+
+# Register signal handlers for clean shutdown globally
+def setup_signal_handlers():
+    def signal_handler(sig, frame):
+        print("\nShutting down server...")
+        sys.exit(0)
+        
+    # Register signal handler for clean shutdown
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+# Set up signal handlers when imported
+setup_signal_handlers()
+
+def normalize_rel_path(rel_path):
+    """Canonical form of a share-relative path: forward slashes, no outer slashes"""
+    return rel_path.replace('\\', '/').strip('/')
+
+# Skip Python files and system files unless a share says otherwise
+DEFAULT_IGNORE_PATTERNS = ['.*', '*.py', '__pycache__', 'static']
+# Mirror part files stay hidden whatever the share's own rules are
+ALWAYS_IGNORE_PATTERNS = ['.*.ldpart', '.*.ldpart.json']
+
+class IgnoreRules:
+    """Gitignore-style patterns compiled into a few regular expressions
+
+    Supports `*`, `?`, `[...]`, `**`, a trailing `/` for folders only, a
+    leading or inner `/` to anchor at the share root, and `!` to re-include.
+    Without negations every rule folds into at most four combined regexes,
+    so checking an entry costs a handful of regex calls however many
+    patterns there are. Scanners check folders before descending, so an
+    ignored folder's subtree is never walked.
+    """
+    def __init__(self, patterns=()):
+        self.patterns = list(patterns)
+        self.rules = []  # (regex, negate, dir_only, anchored), in file order
+        for line in self.patterns:
+            rule = self._compile(line)
+            if rule:
+                self.rules.append(rule)
+        self.simple = not any(rule[1] for rule in self.rules)
+        if self.simple:
+            # Last match wins only matters with negations; otherwise any match ignores
+            self.combined = {}
+            for dir_only in (False, True):
+                for anchored in (False, True):
+                    sources = [rule[0].pattern for rule in self.rules if rule[2] == dir_only and rule[3] == anchored]
+                    if sources:
+                        self.combined[(dir_only, anchored)] = re.compile('|'.join(f'(?:{src})' for src in sources))
+
+    @classmethod
+    def from_file(cls, path, base_patterns=()):
+        patterns = list(base_patterns)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                patterns.extend(f.read().splitlines())
+        except OSError:
+            pass
+        return cls(patterns + ALWAYS_IGNORE_PATTERNS)
+
+    @staticmethod
+    def _translate(pattern):
+        out = []
+        i, n = 0, len(pattern)
+        while i < n:
+            c = pattern[i]
+            if c == '*':
+                if pattern.startswith('**/', i):
+                    out.append('(?:.*/)?')
+                    i += 3
+                    continue
+                if pattern.startswith('**', i):
+                    out.append('.*')
+                    i += 2
+                    continue
+                out.append('[^/]*')
+            elif c == '?':
+                out.append('[^/]')
+            elif c == '[':
+                close = pattern.find(']', i + 2)
+                if close < 0:
+                    out.append(re.escape(c))
+                else:
+                    body = pattern[i + 1:close]
+                    if body.startswith('!'):
+                        body = '^' + body[1:]
+                    out.append('[' + body.replace('\\', '\\\\') + ']')
+                    i = close + 1
+                    continue
+            elif c == '\\' and i + 1 < n:
+                out.append(re.escape(pattern[i + 1]))
+                i += 2
+                continue
+            else:
+                out.append(re.escape(c))
+            i += 1
+        return ''.join(out)
+
+    def _compile(self, line):
+        line = line.rstrip('\n').rstrip()
+        if not line or line.startswith('#'):
+            return None
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        elif line.startswith('\\'):
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        anchored = '/' in line
+        line = line.lstrip('/')
+        if not line:
+            return None
+        return re.compile(f'^{self._translate(line)}$'), negate, dir_only, anchored
+
+    def is_ignored(self, rel_path, is_dir=False):
+        """Whether the entry at share-relative rel_path is ignored"""
+        rel_path = normalize_rel_path(rel_path)
+        name = rel_path.rpartition('/')[2]
+        if self.simple:
+            for (dir_only, anchored), regex in self.combined.items():
+                if dir_only and not is_dir:
+                    continue
+                if regex.match(rel_path if anchored else name):
+                    return True
+            return False
+        ignored = False
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path if anchored else name):
+                ignored = not negate
+        return ignored
+
+class AccessLog:
+    """Structured JSON-lines log of requests and server events
+
+    Request threads only put a dict on a bounded queue; a background thread
+    serialises records in batches, writes them with one call per batch and
+    rotates the file by size. If the queue is ever full the record is
+    dropped and counted rather than making a response wait. High-volume
+    routes can be sampled; errors are always kept.
+    """
+    active = None  # The log server events go to, if any
+
+    def __init__(self, path=os.path.join(APP_DIR, 'logs', 'access.log'), max_bytes=10 * 1024 * 1024, backups=5,
+                 sample_rates=None, batch_size=256, flush_interval=1.0, queue_size=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_rates = dict(sample_rates or {})  # Route rule -> fraction of successful requests kept
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.lock = threading.Lock()  # Request threads update the counters concurrently
+        self.stopped = Event()
+        self.thread = Thread(target=self._run, name='access-log', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def sample_rate(self, rule, status):
+        """Fraction this request is kept at, or 0 when it is sampled out"""
+        rate = self.sample_rates.get(rule, 1.0)
+        if rate >= 1 or status >= 400:
+            return 1.0
+        if random.random() < rate:
+            return rate
+        with self.lock:
+            self.sampled_out += 1
+        return 0
+
+    def log(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def _run(self):
+        while not (self.stopped.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except OSError as e:
+                with self.lock:
+                    self.dropped += len(batch)
+                print(f"Access log write failed: {e}")
+
+    def _write(self, batch):
+        for record in batch:
+            if record.get('type') == 'event':
+                print(record['message'])  # Events are echoed here so the thread reporting them never waits on the console
+        lines = ''.join(json.dumps(record, default=str, separators=(',', ':')) + '\n' for record in batch)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            size = f.tell()
+        self.written += len(batch)
+        if size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        # access.log -> access.log.1 -> ... -> access.log.<backups>, the oldest is dropped
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def stats(self):
+        with self.lock:
+            return {'path': self.path, 'written': self.written, 'dropped': self.dropped,
+                    'sampled_out': self.sampled_out, 'queued': self.queue.qsize()}
+
+    def close(self):
+        if not self.stopped.is_set():
+            self.stopped.set()
+            self.thread.join(timeout=5)
+        if AccessLog.active is self:
+            AccessLog.active = None
+
+def log_event(message, level='info', **fields):
+    """Report a server event on the console and in the structured log
+
+    With a log running both happen on its writer thread; before the server
+    starts, or with logging off, the message is printed directly.
+    """
+    access_log = AccessLog.active
+    if access_log:
+        access_log.log(dict(fields, type='event', time=datetime.now().isoformat(timespec='milliseconds'),
+                            level=level, message=message))
+    else:
+        print(message)
+
+# Socket settings for serving a LAN; None leaves the operating system default
+NETWORK_PROFILES = {
+    'lan': {
+        'backlog': 128,                     # Pending connections before new ones are refused (stock: 5)
+        'send_buffer': 4 * 1024 * 1024,     # SO_SNDBUF, enough to keep a gigabit link busy
+        'recv_buffer': 4 * 1024 * 1024,     # SO_RCVBUF, set before listen so window scaling can use it
+        'nodelay': True,                    # Small JSON replies go out without waiting for Nagle
+        'keepalive': True,                  # Notice phones that vanished off the Wi-Fi
+        'keepalive_idle': 60,
+        'keepalive_interval': 10,
+        'read_timeout': 30,                 # Longest stall while receiving a request
+        'write_timeout': 60,                # Longest stall while a client isn't reading the response
+        'idle_timeout': 15,                 # How long a kept-alive connection may sit between requests
+    },
+    'stock': {
+        'backlog': 5, 'send_buffer': None, 'recv_buffer': None, 'nodelay': False, 'keepalive': False,
+        'keepalive_idle': None, 'keepalive_interval': None,
+        'read_timeout': None, 'write_timeout': None, 'idle_timeout': None,
+    },
+}
+
+def network_profile(name='lan', overrides=None):
+    """A complete profile: the named one with any overrides on top"""
+    if name not in NETWORK_PROFILES:
+        raise ValueError(f"Unknown network profile {name}, expected one of {', '.join(NETWORK_PROFILES)}")
+    profile = dict(NETWORK_PROFILES[name])
+    for key, value in (overrides or {}).items():
+        if key not in profile:
+            raise ValueError(f"Unknown network setting {key}")
+        profile[key] = value
+    return profile
+
+class TunedRequestHandler(WSGIRequestHandler):
+    """Werkzeug handler that applies the server's timeouts at each stage
+
+    The idle timeout covers the wait for the next request on a kept-alive
+    connection, the read timeout receiving one, and the write timeout a
+    client that stops reading the response, so a stalled phone releases its
+    worker thread instead of pinning it. With the structured access log on,
+    the synchronous per-request stderr line is skipped.
+    """
+    def handle_one_request(self):
+        self._set_timeout('idle_timeout')
+        super().handle_one_request()
+
+    def parse_request(self):
+        self._set_timeout('read_timeout')
+        return super().parse_request()
+
+    def send_response(self, code, message=None):
+        self._set_timeout('write_timeout')
+        super().send_response(code, message)
+
+    def _set_timeout(self, key):
+        profile = getattr(self.server, 'profile', None)
+        if profile:
+            self.connection.settimeout(profile[key])
+
+    def log_request(self, code='-', size='-'):
+        if not getattr(self.server, 'quiet', False):
+            super().log_request(code, size)
+
+class TunedWSGIServer(ThreadedWSGIServer):
+    """Threaded Werkzeug server with the socket options of a network profile"""
+    def __init__(self, host, port, app, profile=None, quiet=False):
+        self.profile = profile or network_profile('stock')
+        self.quiet = quiet
+        self.request_queue_size = self.profile['backlog'] or self.request_queue_size
+        self.active_connections = 0  # Worker threads currently holding a connection
+        self.connections_lock = threading.Lock()
+        super().__init__(host, port, app, handler=TunedRequestHandler)
+
+    def server_bind(self):
+        # Accepted sockets inherit buffer sizes from the listening one
+        self._set_buffers(self.socket)
+        super().server_bind()
+
+    def get_request(self):
+        conn, address = super().get_request()
+        profile = self.profile
+        if conn.family in (socket.AF_INET, socket.AF_INET6):
+            if profile['nodelay']:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if profile['keepalive']:
+                conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                idle, interval = profile['keepalive_idle'], profile['keepalive_interval']
+                if idle and interval:
+                    if hasattr(socket, 'SIO_KEEPALIVE_VALS'):
+                        conn.ioctl(socket.SIO_KEEPALIVE_VALS, (1, idle * 1000, interval * 1000))
+                    elif hasattr(socket, 'TCP_KEEPIDLE'):
+                        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+                        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+        self._set_buffers(conn)
+        return conn, address
+
+    def _set_buffers(self, sock):
+        if self.profile['send_buffer']:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.profile['send_buffer'])
+        if self.profile['recv_buffer']:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.profile['recv_buffer'])
+
+    def process_request_thread(self, request, client_address):
+        with self.connections_lock:
+            self.active_connections += 1
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self.connections_lock:
+                self.active_connections -= 1
+
+# Shown instead of a bare 503 when a download link is opened while the server is saturated
+BUSY_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta http-equiv="refresh" content="{{ retry }}">
+<title>LocalDrive is busy</title></head>
+<body style="font-family: sans-serif; text-align: center; padding-top: 4em">
+<p>LocalDrive is serving a lot of transfers right now.</p>
+<p>Trying again in {{ retry }} seconds...</p>
+</body></html>"""
+
+# Concurrent requests allowed per kind of transfer before new ones have to wait
+DEFAULT_TRANSFER_LIMITS = {'stream': 12, 'download': 8, 'upload': 4, 'archive': 4, 'text': 4, 'details': 2}
+
+class AdmissionController:
+    """Caps concurrent transfers per class so a crowd can't starve the rest
+
+    A request over its class limit waits in a short bounded queue for a slot.
+    If the queue is full or no slot frees up in time it is turned away, and
+    the caller answers 503 with a Retry-After hint instead of piling on more
+    open files and buffers. Classes without a limit are always admitted.
+    """
+    def __init__(self, limits=None, max_wait=2.0, queue_factor=2):
+        self.max_wait = max_wait
+        self.queue_factor = queue_factor  # Waiting requests allowed per slot
+        self.lock = threading.Lock()
+        self.freed = threading.Condition(self.lock)
+        self.limits = {}
+        self.active = {}
+        self.waiting = {}
+        self.rejected = {}
+        self.set_limits(limits or DEFAULT_TRANSFER_LIMITS)
+
+    def set_limits(self, limits):
+        with self.lock:
+            for name, limit in limits.items():
+                self.limits[name] = max(0, int(limit))  # 0 lifts the limit
+                self.active.setdefault(name, 0)
+                self.waiting.setdefault(name, 0)
+                self.rejected.setdefault(name, 0)
+            self.freed.notify_all()
+
+    def acquire(self, name):
+        """Take a slot for this class, True if admitted"""
+        deadline = time.monotonic() + self.max_wait
+        with self.lock:
+            limit = self.limits.get(name, 0)
+            if not limit:
+                self.active[name] = self.active.get(name, 0) + 1
+                return True
+            if self.active[name] >= limit and self.waiting[name] >= limit * self.queue_factor:
+                self.rejected[name] += 1
+                return False
+            self.waiting[name] += 1
+            try:
+                while self.active[name] >= self.limits[name] > 0:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected[name] += 1
+                        return False
+                    self.freed.wait(remaining)
+            finally:
+                self.waiting[name] -= 1
+            self.active[name] += 1
+            return True
+
+    def release(self, name):
+        with self.lock:
+            self.active[name] -= 1
+            self.freed.notify_all()
+
+    def retry_after(self, name):
+        """Seconds a turned-away client should wait, longer the deeper the queue"""
+        with self.lock:
+            limit = max(self.limits.get(name, 1), 1)
+            return 1 + self.waiting.get(name, 0) // limit
+
+    def stats(self):
+        with self.lock:
+            return {name: {'limit': self.limits[name], 'active': self.active[name],
+                           'waiting': self.waiting[name], 'rejected': self.rejected[name]}
+                    for name in self.limits}
+
+# Folders with more entries than this are streamed to the page without being cached
+STREAMED_LISTING_CACHE_LIMIT = 5000
+
+class Transfer:
+    """One download, stream or upload in flight
+
+    The request thread only adds to bytes_done as chunks pass; rates are
+    worked out by TransferRegistry.snapshot() when someone looks, so
+    tracking costs one addition per chunk.
+    """
+    def __init__(self, kind, client, path, bytes_total=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.client = client
+        self.path = path
+        self.bytes_total = bytes_total
+        self.bytes_done = 0
+        self.started = time.monotonic()
+        self.rate = 0.0
+        self.sampled_at = self.started
+        self.sampled_bytes = 0
+
+    def sample(self, now):
+        """Smoothed bytes per second since the last look; call with the registry lock held"""
+        elapsed = now - self.sampled_at
+        if elapsed >= 0.5:
+            current = (self.bytes_done - self.sampled_bytes) / elapsed
+            self.rate = 0.5 * self.rate + 0.5 * current if self.rate else current
+            self.sampled_at = now
+            self.sampled_bytes = self.bytes_done
+        return self.rate
+
+    def to_dict(self, now):
+        rate = self.rate
+        remaining = self.bytes_total - self.bytes_done if self.bytes_total else None
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'client': self.client,
+            'path': self.path,
+            'bytes_done': self.bytes_done,
+            'bytes_total': self.bytes_total,
+            'rate': rate,
+            'eta': remaining / rate if remaining is not None and rate > 0 else None,
+            'elapsed': now - self.started,
+        }
+
+class TransferRegistry:
+    """Every transfer currently in flight, for the desktop window and tray"""
+    def __init__(self):
+        self.transfers = {}
+        self.lock = threading.Lock()
+
+    def start(self, kind, client, path, bytes_total=None):
+        transfer = Transfer(kind, client, path, bytes_total)
+        with self.lock:
+            self.transfers[transfer.id] = transfer
+        return transfer
+
+    def finish(self, transfer):
+        with self.lock:
+            self.transfers.pop(transfer.id, None)
+
+    def snapshot(self):
+        """Every transfer with its current rate; the window timer and /api/transfers both land here"""
+        now = time.monotonic()
+        with self.lock:
+            transfers = sorted(self.transfers.values(), key=lambda t: t.started)
+            # Sampling changes the smoothing state, so callers on different threads take turns
+            for transfer in transfers:
+                transfer.sample(now)
+            return [transfer.to_dict(now) for transfer in transfers]
+
+class CountingReader:
+    """Wraps a request body so an upload's progress can be followed"""
+    def __init__(self, stream, transfer):
+        self.stream = stream
+        self.transfer = transfer
+
+    def read(self, *args):
+        data = self.stream.read(*args)
+        self.transfer.bytes_done += len(data)
+        return data
+
+    def readline(self, *args):
+        data = self.stream.readline(*args)
+        self.transfer.bytes_done += len(data)
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+class ClosingBody:
+    """Wraps a response body so on_close runs exactly once, whether or not it was iterated
+
+    Werkzeug hands passthrough bodies straight to the server, which closes
+    them, and for HEAD, 204 and 304 it never iterates the body at all but
+    still closes it through Response.close(). A generator's finally block
+    would be skipped in that second case.
+    """
+    def __init__(self, body, on_close, on_chunk=None):
+        self.body = body
+        self.on_close = on_close
+        self.on_chunk = on_chunk
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.body:
+            if self.on_chunk:
+                self.on_chunk(chunk)
+            yield chunk
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self.on_close()
+
+class DirectoryCache:
+    """Caches directory listings and recursive folder sizes
+
+    Listings are validated against the directory mtime so outside changes are
+    picked up automatically. Folder sizes depend on the whole subtree, so they
+    expire after a short TTL and are dropped explicitly whenever LocalDrive
+    itself changes something below them.
+    """
+    def __init__(self, size_ttl=60):
+        self.size_ttl = size_ttl
+        self.listings = {}  # rel_dir -> (mtime_ns, items)
+        self.sizes = {}     # rel_dir -> (timestamp, size)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(rel_dir):
+        return normalize_rel_path(rel_dir)
+
+    def get_listing(self, rel_dir, mtime_ns):
+        with self.lock:
+            cached = self.listings.get(self._key(rel_dir))
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        return None
+
+    def set_listing(self, rel_dir, mtime_ns, items):
+        with self.lock:
+            self.listings[self._key(rel_dir)] = (mtime_ns, items)
+
+    def get_size(self, rel_dir):
+        with self.lock:
+            cached = self.sizes.get(self._key(rel_dir))
+        if cached and time.time() - cached[0] < self.size_ttl:
+            return cached[1]
+        return None
+
+    def set_size(self, rel_dir, size):
+        with self.lock:
+            self.sizes[self._key(rel_dir)] = (time.time(), size)
+
+    def invalidate(self, rel_dir):
+        """Drop the listing of rel_dir and the sizes of rel_dir and all its parents"""
+        key = self._key(rel_dir)
+        with self.lock:
+            self.listings.pop(key, None)
+            # A removed folder may leave cached children behind
+            prefix = key + '/' if key else ''
+            for cached_key in [k for k in self.listings if prefix and k.startswith(prefix)]:
+                del self.listings[cached_key]
+            while True:
+                self.sizes.pop(key, None)
+                if not key:
+                    break
+                key = key.rpartition('/')[0]
+
+    def clear(self):
+        with self.lock:
+            self.listings.clear()
+            self.sizes.clear()
+
+class BlockCache:
+    """Shared in-memory cache of file blocks for /stream and /download
+
+    Uses a segmented LRU: new blocks enter a small probation segment and are
+    only promoted to the protected segment when read again, so one-off scans
+    of big files can't push out the blocks everyone keeps asking for. Blocks
+    are keyed by the file's size and mtime, so a changed file is never served
+    from stale data.
+    """
+    def __init__(self, budget_bytes=64 * 1024 * 1024, block_size=256 * 1024, protected_ratio=0.8):
+        self.block_size = block_size
+        self.budget_bytes = budget_bytes
+        self.protected_ratio = protected_ratio
+        self.protected_budget = int(budget_bytes * protected_ratio)
+        self.probation = OrderedDict()  # key -> bytes, oldest first
+        self.protected = OrderedDict()
+        self.probation_bytes = 0
+        self.protected_bytes = 0
+        self.identities = {}  # path -> (size, mtime_ns) currently cached
+        self.block_counts = {}  # path -> blocks cached, so identities leave with the last block
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.budget_bytes >= self.block_size
+
+    def set_budget(self, budget_bytes):
+        with self.lock:
+            self.budget_bytes = budget_bytes
+            self.protected_budget = int(budget_bytes * self.protected_ratio)
+            while self.protected_bytes > self.protected_budget and self.protected:
+                key, data = self.protected.popitem(last=False)
+                self.protected_bytes -= len(data)
+                self.evictions += 1
+                self._released(key)
+            self._trim()
+
+    def _forget_file(self, path):
+        # Called with the lock held when a file's size or mtime changed
+        for segment in (self.probation, self.protected):
+            for key in [k for k in segment if k[0] == path]:
+                data = segment.pop(key)
+                if segment is self.probation:
+                    self.probation_bytes -= len(data)
+                else:
+                    self.protected_bytes -= len(data)
+        self.identities.pop(path, None)
+        self.block_counts.pop(path, None)
+
+    def _released(self, key):
+        # Called with the lock held for each block that leaves the cache
+        path = key[0]
+        count = self.block_counts.get(path, 0) - 1
+        if count > 0:
+            self.block_counts[path] = count
+        else:
+            self.block_counts.pop(path, None)
+            self.identities.pop(path, None)
+
+    def _get(self, key):
+        with self.lock:
+            data = self.protected.get(key)
+            if data is not None:
+                self.protected.move_to_end(key)
+                self.hits += 1
+                return data
+            data = self.probation.pop(key, None)
+            if data is None:
+                self.misses += 1
+                return None
+            # Second touch: promote, demoting protected blocks if needed
+            self.hits += 1
+            self.probation_bytes -= len(data)
+            self.protected[key] = data
+            self.protected_bytes += len(data)
+            while self.protected_bytes > self.protected_budget and len(self.protected) > 1:
+                old_key, old_data = self.protected.popitem(last=False)
+                self.protected_bytes -= len(old_data)
+                self.probation[old_key] = old_data
+                self.probation_bytes += len(old_data)
+            self._trim()
+            return data
+
+    def _put(self, key, data):
+        with self.lock:
+            if key in self.probation or key in self.protected:
+                return
+            path, identity, _ = key
+            if self.identities.get(path, identity) != identity:
+                return  # The file changed while this block was being read
+            self.identities[path] = identity
+            self.block_counts[path] = self.block_counts.get(path, 0) + 1
+            self.probation[key] = data
+            self.probation_bytes += len(data)
+            self._trim()
+
+    def _trim(self):
+        while self.probation_bytes + self.protected_bytes > self.budget_bytes and self.probation:
+            key, data = self.probation.popitem(last=False)
+            self.probation_bytes -= len(data)
+            self.evictions += 1
+            self._released(key)
+
+    def read(self, path, start, length):
+        """Yield the bytes of path from start for length bytes, block by block"""
+        stats = os.stat(path)
+        identity = (stats.st_size, stats.st_mtime_ns)
+        if self.enabled:
+            with self.lock:
+                if self.identities.get(path, identity) != identity:
+                    self._forget_file(path)
+
+        block_size = self.block_size
+        end = start + length
+        with open(path, 'rb') as f:
+            position = start
+            while position < end:
+                index = position // block_size
+                block_start = index * block_size
+                key = (path, identity, index)
+                data = self._get(key) if self.enabled else None
+                if data is None:
+                    f.seek(block_start)
+                    data = f.read(block_size)
+                    if not data:
+                        break
+                    if self.enabled:
+                        self._put(key, data)
+                chunk = data[position - block_start:end - block_start]
+                if not chunk:
+                    break
+                position += len(chunk)
+                yield chunk
+
+    def clear(self):
+        with self.lock:
+            self.probation.clear()
+            self.protected.clear()
+            self.probation_bytes = self.protected_bytes = 0
+            self.identities.clear()
+            self.block_counts.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'budget_bytes': self.budget_bytes,
+                'block_size': self.block_size,
+                'used_bytes': self.probation_bytes + self.protected_bytes,
+                'protected_bytes': self.protected_bytes,
+                'probation_bytes': self.probation_bytes,
+                'blocks': len(self.probation) + len(self.protected),
+                'files': len(self.identities),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+class LineIndex:
+    """Sparse line-offset index of a text file for random-access paging
+
+    Only the byte offset of every `step`-th line is kept, so even a file with
+    hundreds of millions of lines needs little memory. Reading line N seeks to
+    the nearest checkpoint and skips forward from there. When the file has
+    grown since it was indexed, scanning resumes where it left off.
+    """
+    FINGERPRINT_BYTES = 64
+
+    def __init__(self, path, step=1000, scan_size=1024 * 1024):
+        self.path = path
+        self.step = step
+        self.scan_size = scan_size
+        self.checkpoints = [0]   # Offset of line 0, step, 2*step, ...
+        self.lines = 0           # Newlines seen so far
+        self.indexed = 0         # Bytes scanned so far
+        self.last_line_start = 0 # Offset just past the last newline
+        self.mtime_ns = None
+        self.fingerprint = b''   # Bytes just before `indexed`, to tell appends from rewrites
+        self.scanned = 0         # Bytes of the scan in progress, for reporting how far along it is
+        self.building = False    # A scan runs in the background; see LineIndexCache
+        self.lock = threading.Lock()
+
+    def _fingerprint(self, f, end):
+        start = max(0, end - self.FINGERPRINT_BYTES)
+        f.seek(start)
+        return f.read(end - start)
+
+    def _rewritten(self, f, stat):
+        """True when the file was truncated or rewritten rather than appended to"""
+        appended = stat.st_size > self.indexed or stat.st_mtime_ns == self.mtime_ns
+        return stat.st_size < self.indexed or not appended or self._fingerprint(f, self.indexed) != self.fingerprint
+
+    def pending(self):
+        """Bytes the next refresh has to scan"""
+        with self.lock, open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            return stat.st_size if self._rewritten(f, stat) else stat.st_size - self.indexed
+
+    def refresh(self):
+        """Bring the index up to date with the file and return its size"""
+        with self.lock, open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            if self._rewritten(f, stat):
+                self.checkpoints, self.lines, self.indexed, self.last_line_start = [0], 0, 0, 0
+            self.mtime_ns = stat.st_mtime_ns
+
+            f.seek(self.indexed)
+            position = self.scanned = self.indexed
+            while position < size:
+                chunk = f.read(min(self.scan_size, size - position))
+                if not chunk:
+                    break
+                # Line lengths come from C-level split/accumulate; a per-newline
+                # Python loop would be several times slower on big logs
+                ends = list(accumulate(map(len, chunk.split(b'\n')[:-1])))
+                first = (-self.lines - 1) % self.step  # Chunk line that completes the next checkpoint
+                for i in range(first, len(ends), self.step):
+                    self.checkpoints.append(position + ends[i] + i + 1)
+                if ends:
+                    self.lines += len(ends)
+                    self.last_line_start = position + ends[-1] + len(ends)
+                position += len(chunk)
+                self.scanned = position
+            if position != self.indexed:
+                self.indexed = position
+                self.fingerprint = self._fingerprint(f, position)
+            return size
+
+    def total_lines(self):
+        """Line count, including a last line that has no newline yet"""
+        return self.lines + (1 if self.indexed > self.last_line_start else 0)
+
+    @staticmethod
+    def _skip_line(f, block=64 * 1024):
+        while True:
+            data = f.readline(block)
+            if not data:
+                return False
+            if data.endswith(b'\n'):
+                return True
+
+    @staticmethod
+    def read_line(f, max_length):
+        """Read one line, cut at max_length bytes; returns (bytes, truncated)"""
+        data = f.readline(max_length)
+        if len(data) < max_length or data.endswith(b'\n'):
+            return data, False
+        LineIndex._skip_line(f)
+        return data, True
+
+    def read_lines(self, start, count, max_length=4096):
+        """Up to count lines from line `start` on, as (text, truncated) pairs"""
+        lines = []
+        with self.lock, open(self.path, 'rb') as f:
+            checkpoint = min(start // self.step, len(self.checkpoints) - 1)
+            f.seek(self.checkpoints[checkpoint])
+            for _ in range(start - checkpoint * self.step):
+                if not self._skip_line(f):
+                    return lines
+            for _ in range(count):
+                data, truncated = self.read_line(f, max_length)
+                if not data:
+                    break
+                lines.append((data.rstrip(b'\r\n').decode('utf-8', errors='replace'), truncated))
+        return lines
+
+    def read_from(self, offset, max_bytes=256 * 1024, max_length=4096):
+        """Complete lines appended after byte `offset`, for follow mode
+
+        Returns (lines, next_offset); an unfinished last line is left for the
+        next call so it is never delivered in pieces.
+        """
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(max_bytes)
+        end = data.rfind(b'\n')
+        if end < 0:
+            if len(data) < max_bytes:
+                return [], offset
+            end = len(data) - 1  # One line longer than max_bytes; hand it over cut
+        lines = []
+        for line in data[:end + 1].split(b'\n')[:-1]:
+            lines.append((line[:max_length].rstrip(b'\r').decode('utf-8', errors='replace'),
+                          len(line) > max_length))
+        return lines, offset + end + 1
+
+class LineIndexCache:
+    """Line indexes of recently previewed text files, least recently used evicted
+
+    Catching up on a few megabytes happens in the request; a longer scan, such
+    as the first look at a multi-gigabyte log, runs on a background thread and
+    callers are told to come back while it does.
+    """
+    def __init__(self, max_files=32, inline_bytes=16 * 1024 * 1024):
+        self.max_files = max_files
+        self.inline_bytes = inline_bytes
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """(index, file size), or (index, None) while the index is being built"""
+        with self.lock:
+            index = self.indexes.get(path)
+            if index is None:
+                index = self.indexes[path] = LineIndex(path)
+            self.indexes.move_to_end(path)
+            while len(self.indexes) > self.max_files:
+                self.indexes.popitem(last=False)
+            if index.building:
+                return index, None
+        # Built or extended outside the cache lock so other files aren't held up
+        if index.pending() <= self.inline_bytes:
+            return index, index.refresh()
+        with self.lock:
+            if index.building:
+                return index, None
+            index.building = True
+        Thread(target=self._build, args=(index,), daemon=True, name='line-index').start()
+        return index, None
+
+    @staticmethod
+    def _build(index):
+        try:
+            index.refresh()
+        except OSError as e:
+            log_event(f"Could not index {index.path}: {e}", level='warning', path=index.path)
+        finally:
+            index.building = False
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+
+class ArchiveIndex:
+    """Member index of a ZIP or TAR archive, for serving single entries in place
+
+    ZIP archives are indexed from the central directory alone; TAR archives
+    need one pass over the member headers. Members stored without compression
+    (ZIP stored entries, plain TAR) are served straight from their byte range
+    in the archive. Deflated ZIP members are inflated on the fly, and members
+    of compressed TARs are read through tarfile. Nothing is written to disk.
+    """
+    ZIP_LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+    READ_SIZE = 256 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.members = OrderedDict()  # name -> entry dict
+        self.tar_infos = {}           # name -> TarInfo, for compressed TARs
+        if zipfile.is_zipfile(path):
+            self.kind = 'zip'
+            self._index_zip()
+        elif tarfile.is_tarfile(path):
+            self.kind = 'tar'
+            self._index_tar()
+        else:
+            raise ValueError("Not a ZIP or TAR archive")
+
+    def _index_zip(self):
+        with zipfile.ZipFile(self.path) as archive:
+            for info in archive.infolist():
+                name = info.filename.rstrip('/')
+                self.members[name] = {
+                    'name': name,
+                    'type': 'folder' if info.is_dir() else 'file',
+                    'size': 0 if info.is_dir() else info.file_size,
+                    'mtime': time.mktime(info.date_time + (0, 0, -1)),
+                    'filename': info.filename,
+                    'method': info.compress_type,
+                    'header_offset': info.header_offset,
+                    'compressed_size': info.compress_size,
+                    'encrypted': bool(info.flag_bits & 0x1),
+                    'data_offset': None,  # Filled in from the local header on first read
+                }
+
+    def _index_tar(self):
+        try:
+            archive = tarfile.open(self.path, 'r:')
+            compressed = False
+        except tarfile.ReadError:
+            archive = tarfile.open(self.path, 'r:*')
+            compressed = True
+        with archive:
+            for info in archive:
+                if not (info.isfile() or info.isdir()):
+                    continue  # Links and devices have nothing to serve
+                name = info.name.rstrip('/')
+                direct = not compressed and not info.sparse
+                self.members[name] = {
+                    'name': name,
+                    'type': 'folder' if info.isdir() else 'file',
+                    'size': info.size if info.isfile() else 0,
+                    'mtime': info.mtime,
+                    'data_offset': info.offset_data if direct else None,
+                }
+                if not direct and info.isfile():
+                    self.tar_infos[name] = info
+
+    def list(self, prefix=''):
+        """Direct children of a folder inside the archive"""
+        prefix = normalize_rel_path(prefix)
+        base = f"{prefix}/" if prefix else ''
+        children = OrderedDict()
+        for name, entry in self.members.items():
+            if not name.startswith(base) or name == prefix:
+                continue
+            child, _, rest = name[len(base):].partition('/')
+            path = base + child
+            if rest:
+                # Archives don't always carry entries for intermediate folders
+                children.setdefault(child, {'name': child, 'path': path, 'type': 'folder', 'size': 0, 'mtime': entry['mtime']})
+            else:
+                children[child] = {'name': child, 'path': path, 'type': entry['type'],
+                                   'size': entry['size'], 'mtime': entry['mtime']}
+        return list(children.values())
+
+    def _read_range(self, offset, length):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while length > 0:
+                data = f.read(min(self.READ_SIZE, length))
+                if not data:
+                    break
+                length -= len(data)
+                yield data
+
+    def _zip_data_offset(self, entry):
+        if entry['data_offset'] is None:
+            with open(self.path, 'rb') as f:
+                f.seek(entry['header_offset'])
+                header = self.ZIP_LOCAL_HEADER.unpack(f.read(self.ZIP_LOCAL_HEADER.size))
+            if header[0] != b'PK\x03\x04':
+                raise ValueError("Corrupt ZIP local header")
+            name_length, extra_length = header[-2], header[-1]
+            entry['data_offset'] = entry['header_offset'] + self.ZIP_LOCAL_HEADER.size + name_length + extra_length
+        return entry['data_offset']
+
+    def _inflate(self, offset, compressed_size, start, length):
+        """Inflate a deflated member, skipping to start; memory stays bounded"""
+        inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        skip = start
+        for chunk in self._read_range(offset, compressed_size):
+            while chunk and length > 0:
+                data = inflater.decompress(chunk, self.READ_SIZE)
+                chunk = inflater.unconsumed_tail
+                if skip:
+                    dropped = min(skip, len(data))
+                    data = data[dropped:]
+                    skip -= dropped
+                if data:
+                    data = data[:length]
+                    length -= len(data)
+                    yield data
+            if length <= 0:
+                return
+
+    def _read_through(self, member_file, start, length):
+        with member_file:
+            member_file.seek(start)
+            while length > 0:
+                data = member_file.read(min(self.READ_SIZE, length))
+                if not data:
+                    break
+                length -= len(data)
+                yield data
+
+    def read(self, name, start, length):
+        """Yield bytes start..start+length of one member"""
+        entry = self.members[name]
+        if self.kind == 'zip':
+            if entry['encrypted']:
+                raise ValueError("Encrypted ZIP members can't be previewed")
+            if entry['method'] == zipfile.ZIP_STORED:
+                yield from self._read_range(self._zip_data_offset(entry) + start, length)
+            elif entry['method'] == zipfile.ZIP_DEFLATED:
+                yield from self._inflate(self._zip_data_offset(entry), entry['compressed_size'], start, length)
+            else:
+                # bzip2/LZMA members go through zipfile, which can still skip ahead
+                with zipfile.ZipFile(self.path) as archive:
+                    yield from self._read_through(archive.open(entry['filename']), start, length)
+        elif entry['data_offset'] is not None:
+            yield from self._read_range(entry['data_offset'] + start, length)
+        else:
+            with tarfile.open(self.path, 'r:*') as archive:
+                yield from self._read_through(archive.extractfile(self.tar_infos[name]), start, length)
+
+class ArchiveIndexCache:
+    """Archive indexes keyed by path and checked against size and mtime"""
+    def __init__(self, max_archives=16):
+        self.max_archives = max_archives
+        self.indexes = OrderedDict()  # path -> ((size, mtime_ns), ArchiveIndex)
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        stat = os.stat(path)
+        identity = (stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            cached = self.indexes.get(path)
+            if cached and cached[0] == identity:
+                self.indexes.move_to_end(path)
+                return cached[1]
+        index = ArchiveIndex(path)
+        with self.lock:
+            self.indexes[path] = (identity, index)
+            self.indexes.move_to_end(path)
+            while len(self.indexes) > self.max_archives:
+                self.indexes.popitem(last=False)
+        return index
+
+def lower_thread_priority():
+    """Put the calling thread in background mode, so its CPU and disk use yield to everything else"""
+    if platform.system() == "Windows":
+        try:
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), 0x00010000)  # THREAD_MODE_BACKGROUND_BEGIN
+        except Exception as e:
+            log_event(f"Could not lower thread priority: {e}", level='warning')
+
+def exif_date(value):
+    """'2024:05:01 10:20:30' as ISO 8601, None when it isn't a usable date"""
+    match = re.match(r'(\d{4}):(\d{2}):(\d{2})[ T](\d{2}):(\d{2}):(\d{2})', str(value or '').strip('\x00 '))
+    if not match or match.group(1) == '0000':
+        return None
+    return '{}-{}-{}T{}:{}:{}'.format(*match.groups())
+
+def read_image_metadata(path):
+    # Image.open reads the header only; the pixels are never decoded
+    with Image.open(path) as image:
+        width, height = image.size
+        exif = image.getexif()
+        make = str(exif.get(0x010F, '')).strip('\x00 ')
+        model = str(exif.get(0x0110, '')).strip('\x00 ')
+        taken = exif_date(exif.get_ifd(0x8769).get(0x9003)) or exif_date(exif.get(0x0132))  # DateTimeOriginal, DateTime
+        if exif.get(0x0112) in (5, 6, 7, 8):
+            width, height = height, width  # Stored sideways, shown upright
+    meta = {'kind': 'image', 'width': width, 'height': height}
+    camera = model if model.lower().startswith(make.lower()) else f"{make} {model}".strip()
+    if camera:
+        meta['camera'] = camera
+    if taken:
+        meta['taken'] = taken
+    return meta
+
+def iter_mp4_boxes(f, start, end):
+    """(type, data start, data end) of the ISO media boxes between start and end"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack('>I4s', f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos  # Runs to the end of the file
+        if size < header_size:
+            raise ValueError("Corrupt MP4 box")
+        yield kind, pos + header_size, min(pos + size, end)
+        pos += size
+
+def read_mp4_metadata(path):
+    meta = {}
+    with open(path, 'rb') as f:
+        end = os.fstat(f.fileno()).st_size
+        # Only the moov box is read; mdat is skipped with a seek wherever it sits
+        moov = next(((start, stop) for kind, start, stop in iter_mp4_boxes(f, 0, end) if kind == b'moov'), None)
+        if moov is None:
+            raise ValueError("No moov box")
+        for kind, start, stop in iter_mp4_boxes(f, *moov):
+            if kind == b'mvhd':
+                f.seek(start)
+                version = f.read(4)[0]
+                if version == 1:
+                    _, _, timescale, duration = struct.unpack('>QQIQ', f.read(28))
+                else:
+                    _, _, timescale, duration = struct.unpack('>IIII', f.read(16))
+                if timescale:
+                    meta['duration'] = round(duration / timescale, 3)
+            elif kind == b'trak' and 'width' not in meta:
+                size = handler = None
+                for track_kind, track_start, track_stop in iter_mp4_boxes(f, start, stop):
+                    if track_kind == b'tkhd':
+                        # Width and height are the last two 16.16 fixed point fields
+                        f.seek(track_stop - 8)
+                        width, height = struct.unpack('>II', f.read(8))
+                        size = (width >> 16, height >> 16)
+                    elif track_kind == b'mdia':
+                        for media_kind, media_start, _ in iter_mp4_boxes(f, track_start, track_stop):
+                            if media_kind == b'hdlr':
+                                f.seek(media_start + 8)
+                                handler = f.read(4)
+                if handler == b'vide' and size and size[0]:
+                    meta['width'], meta['height'] = size
+    meta['kind'] = 'video' if 'width' in meta else 'audio'
+    return meta
+
+def read_ebml_number(f, is_id=False):
+    """One EBML variable-length number: an element ID, or a size (None when unknown)"""
+    first = f.read(1)
+    if not first:
+        raise EOFError("End of EBML data")
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first[0] & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("Corrupt EBML number")
+    rest = f.read(length - 1)
+    if is_id:
+        return int.from_bytes(first + rest, 'big')
+    value = int.from_bytes(bytes([first[0] & (mask - 1)]) + rest, 'big')
+    return None if value == (1 << (7 * length)) - 1 else value
+
+def iter_ebml(f, start, end):
+    """(ID, data start, data end) of the EBML elements between start and end"""
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        try:
+            element_id = read_ebml_number(f, is_id=True)
+            size = read_ebml_number(f)
+        except EOFError:
+            return
+        data_start = f.tell()
+        data_end = end if size is None else min(data_start + size, end)
+        yield element_id, data_start, data_end
+        pos = data_end
+
+def read_mkv_metadata(path):
+    meta = {}
+    scale = 1000000  # Nanoseconds per timestamp tick, the Matroska default
+    duration = None
+    with open(path, 'rb') as f:
+        end = os.fstat(f.fileno()).st_size
+        segment = next(((start, stop) for element_id, start, stop in iter_ebml(f, 0, end)
+                        if element_id == 0x18538067), None)
+        if segment is None:
+            raise ValueError("No Matroska segment")
+        for element_id, start, stop in iter_ebml(f, *segment):
+            if element_id == 0x1549A966:  # Info
+                for child_id, child_start, child_stop in iter_ebml(f, start, stop):
+                    f.seek(child_start)
+                    data = f.read(child_stop - child_start)
+                    if child_id == 0x2AD7B1:
+                        scale = int.from_bytes(data, 'big')
+                    elif child_id == 0x4489:
+                        duration = struct.unpack('>f' if len(data) == 4 else '>d', data)[0]
+                    elif child_id == 0x7BA9:
+                        meta['title'] = data.decode('utf-8', 'replace').strip('\x00')
+            elif element_id == 0x1654AE6B:  # Tracks
+                for entry_id, entry_start, entry_stop in iter_ebml(f, start, stop):
+                    if entry_id != 0xAE or 'width' in meta:
+                        continue
+                    for child_id, child_start, child_stop in iter_ebml(f, entry_start, entry_stop):
+                        if child_id == 0xE0:  # Video
+                            for video_id, video_start, video_stop in iter_ebml(f, child_start, child_stop):
+                                f.seek(video_start)
+                                value = int.from_bytes(f.read(video_stop - video_start), 'big')
+                                if video_id == 0xB0:
+                                    meta['width'] = value
+                                elif video_id == 0xBA:
+                                    meta['height'] = value
+            elif element_id == 0x1F43B675:  # Cluster: the headers are behind us
+                break
+    if duration is not None:
+        meta['duration'] = round(duration * scale / 1e9, 3)
+    meta['kind'] = 'video' if 'width' in meta else 'audio'
+    return meta
+
+ID3_TEXT_FRAMES = {b'TIT2': 'title', b'TPE1': 'artist', b'TALB': 'album',
+                   b'TT2': 'title', b'TP1': 'artist', b'TAL': 'album'}
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG-1 Layer III
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],      # MPEG-2 and 2.5 Layer III
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+def id3_text(data):
+    encoding = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}.get(data[:1][0] if data else 0, 'latin-1')
+    return data[1:].decode(encoding, 'replace').strip('\x00 ').split('\x00')[0]
+
+def syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def read_mp3_metadata(path):
+    meta = {'kind': 'audio'}
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        audio_start = 0
+        header = f.read(10)
+        if header[:3] == b'ID3' and len(header) == 10:
+            version = header[3]
+            tag_end = 10 + syncsafe(header[6:10]) + (10 if header[5] & 0x10 else 0)
+            audio_start = tag_end
+            pos = 10
+            id_size, head_size = (3, 6) if version == 2 else (4, 10)
+            while pos + head_size <= tag_end:
+                f.seek(pos)
+                frame = f.read(head_size)
+                frame_id = frame[:id_size]
+                if not frame_id.strip(b'\x00'):
+                    break  # Padding
+                if version == 2:
+                    size = int.from_bytes(frame[3:6], 'big')
+                elif version == 4:
+                    size = syncsafe(frame[4:8])
+                else:
+                    size = int.from_bytes(frame[4:8], 'big')
+                if frame_id in ID3_TEXT_FRAMES and size < 4096:
+                    text = id3_text(f.read(size))
+                    if text:
+                        meta[ID3_TEXT_FRAMES[frame_id]] = text
+                pos += head_size + size  # Cover art and the like are skipped, not read
+        # The first valid frame header after the tag
+        f.seek(audio_start)
+        data = f.read(64 * 1024)
+        for i in range(len(data) - 4):
+            if data[i] != 0xFF or data[i + 1] & 0xE0 != 0xE0:
+                continue
+            version_bits = (data[i + 1] >> 3) & 3
+            layer_bits = (data[i + 1] >> 1) & 3
+            bitrate_index = data[i + 2] >> 4
+            rate_index = (data[i + 2] >> 2) & 3
+            if version_bits == 1 or layer_bits != 1 or bitrate_index in (0, 15) or rate_index == 3:
+                continue  # Not Layer III, or not a frame header at all
+            mpeg1 = version_bits == 3
+            bitrate = MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+            sample_rate = MP3_SAMPLE_RATES[version_bits][rate_index]
+            samples_per_frame = 1152 if mpeg1 else 576
+            mono = data[i + 3] >> 6 == 3
+            # A Xing/Info or VBRI header in the first frame gives the frame count of VBR files
+            side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+            xing = data[i + 4 + side_info:i + 4 + side_info + 12]
+            vbri = data[i + 36:i + 36 + 18]
+            frames = None
+            if xing[:4] in (b'Xing', b'Info') and int.from_bytes(xing[4:8], 'big') & 1:
+                frames = int.from_bytes(xing[8:12], 'big')
+            elif vbri[:4] == b'VBRI':
+                frames = int.from_bytes(vbri[14:18], 'big')
+            if frames:
+                meta['duration'] = round(frames * samples_per_frame / sample_rate, 3)
+            else:
+                # Constant bitrate: the audio bytes give the duration, less an ID3v1 tag at the end
+                f.seek(max(0, file_size - 128))
+                audio_end = file_size - 128 if file_size >= 128 and f.read(3) == b'TAG' else file_size
+                meta['duration'] = round((audio_end - audio_start - i) * 8 / bitrate, 3)
+            meta['sample_rate'] = sample_rate
+            break
+        else:
+            raise ValueError("No MP3 frame found")
+    return meta
+
+def read_flac_metadata(path):
+    meta = {'kind': 'audio'}
+    with open(path, 'rb') as f:
+        if f.read(4) != b'fLaC':
+            raise ValueError("Not a FLAC file")
+        last = False
+        while not last:
+            header = f.read(4)
+            if len(header) < 4:
+                break
+            last = bool(header[0] & 0x80)
+            block_type = header[0] & 0x7F
+            length = int.from_bytes(header[1:], 'big')
+            if block_type == 0:  # STREAMINFO
+                bits = int.from_bytes(f.read(length)[10:18], 'big')
+                sample_rate = bits >> 44
+                total_samples = bits & 0xFFFFFFFFF
+                if sample_rate:
+                    meta['sample_rate'] = sample_rate
+                    if total_samples:
+                        meta['duration'] = round(total_samples / sample_rate, 3)
+            elif block_type == 4 and length < 1024 * 1024:  # VORBIS_COMMENT
+                block = f.read(length)
+                pos = 4 + int.from_bytes(block[:4], 'little')
+                count = int.from_bytes(block[pos:pos + 4], 'little')
+                pos += 4
+                for _ in range(count):
+                    size = int.from_bytes(block[pos:pos + 4], 'little')
+                    name, _, value = block[pos + 4:pos + 4 + size].decode('utf-8', 'replace').partition('=')
+                    pos += 4 + size
+                    if name.lower() in ('title', 'artist', 'album') and value:
+                        meta.setdefault(name.lower(), value)
+            else:
+                f.seek(length, os.SEEK_CUR)  # Pictures, seek tables and padding are skipped
+    return meta
+
+PDF_SCAN_BYTES = 1024 * 1024  # Read from each end of a PDF; page trees and the Info dict live there
+
+def pdf_string(match):
+    """Decode a PDF literal (...) or hex <...> string from a regex match"""
+    if match.group(1) is not None:
+        raw = re.sub(rb'\\([()\\])', rb'\1', match.group(1))
+    else:
+        raw = bytes.fromhex(match.group(2).decode('ascii') + ('0' if len(match.group(2)) % 2 else ''))
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', 'replace')
+    return raw.decode('latin-1')
+
+def pdf_page_count(data):
+    """Largest /Count of a /Type /Pages node in data, which is the root of the page tree"""
+    counts = []
+    for match in re.finditer(rb'/Type\s*/Pages\b', data):
+        # The node's /Count sits in the same dictionary, a little before or after /Type
+        window = data[max(0, match.start() - 200):match.end() + 200]
+        counts += [int(count) for count in re.findall(rb'/Count\s+(\d+)', window)]
+    return max(counts) if counts else None
+
+def read_pdf_metadata(path):
+    with open(path, 'rb') as f:
+        if f.read(5) != b'%PDF-':
+            raise ValueError("Not a PDF file")
+        size = os.fstat(f.fileno()).st_size
+        f.seek(0)
+        data = f.read(PDF_SCAN_BYTES)
+        if size > PDF_SCAN_BYTES:
+            f.seek(max(PDF_SCAN_BYTES, size - PDF_SCAN_BYTES))
+            data += b'\n' + f.read()
+    meta = {'kind': 'document'}
+    linearized = re.search(rb'/Linearized\b[^>]*?/N\s+(\d+)', data[:2048])
+    pages = int(linearized.group(1)) if linearized else pdf_page_count(data)
+    if pages is None:
+        # PDF 1.5+ can keep the page tree inside compressed object streams
+        for match in re.finditer(rb'/Type\s*/ObjStm\b.*?stream\r?\n', data, re.S):
+            try:
+                inflated = zlib.decompressobj().decompress(data[match.end():match.end() + PDF_SCAN_BYTES], 4 * PDF_SCAN_BYTES)
+            except zlib.error:
+                continue
+            found = pdf_page_count(inflated)
+            if found is not None:
+                pages = max(pages or 0, found)
+    if pages is not None:
+        meta['pages'] = pages
+    if b'/Encrypt' not in data:
+        for key, field in ((b'Title', 'title'), (b'Author', 'author')):
+            match = re.search(rb'/' + key + rb'\s*(?:\(((?:\\.|[^\\)])*)\)|<([0-9A-Fa-f\s]*)>)', data)
+            if match:
+                text = pdf_string(match).strip('\x00 ')
+                if text:
+                    meta[field] = text
+    return meta
+
+# Extension -> header reader returning a metadata dict
+MEDIA_READERS = {
+    **dict.fromkeys(('.jpg', '.jpeg', '.png', '.gif', '.webp', '.tif', '.tiff', '.bmp'), read_image_metadata),
+    **dict.fromkeys(('.mp4', '.m4v', '.mov', '.3gp', '.m4a'), read_mp4_metadata),
+    **dict.fromkeys(('.mkv', '.webm', '.mka'), read_mkv_metadata),
+    '.mp3': read_mp3_metadata,
+    '.flac': read_flac_metadata,
+    '.pdf': read_pdf_metadata,
+}
+MEDIA_NUMERIC_FIELDS = ('duration', 'width', 'height', 'pages', 'sample_rate')
+MEDIA_TEXT_FIELDS = ('camera', 'title', 'artist', 'album', 'author')
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+def media_caption(meta):
+    """One short line describing a media file, for its card in the listing"""
+    parts = []
+    if meta.get('duration'):
+        parts.append(format_duration(meta['duration']))
+    if meta.get('width'):
+        parts.append(f"{meta['width']}×{meta['height']}")
+    if meta.get('pages'):
+        parts.append(f"{meta['pages']} page{'s' if meta['pages'] != 1 else ''}")
+    if meta.get('kind') == 'audio' and meta.get('artist'):
+        parts.append(meta['artist'])
+    return ' · '.join(parts)
+
+def query_media(items, args):
+    """Filter and sort listing items by their metadata, from request arguments
+
+    kind=video,audio keeps those kinds; min_<field> and max_<field> bound
+    duration, width, height, pages, sample_rate and taken; camera, title,
+    artist, album and author match case-insensitive substrings. sort takes name,
+    size, mtime or any metadata field, order=desc reverses it, and items
+    without the field always come last. Raises ValueError on bad numbers.
+    """
+    kinds = {kind for kind in args.get('kind', '').split(',') if kind}
+    bounds = []
+    for field in MEDIA_NUMERIC_FIELDS + ('taken',):
+        for prefix, keep in (('min_', lambda value, limit: value >= limit), ('max_', lambda value, limit: value <= limit)):
+            limit = args.get(prefix + field)
+            if limit:
+                bounds.append((field, keep, limit if field == 'taken' else float(limit)))
+    texts = [(field, args[field].lower()) for field in MEDIA_TEXT_FIELDS if args.get(field)]
+
+    def matches(item):
+        meta = item.get('meta') or {}
+        if kinds and meta.get('kind') not in kinds:
+            return False
+        for field, keep, limit in bounds:
+            if meta.get(field) is None or not keep(meta[field], limit):
+                return False
+        return all(text in str(meta.get(field, '')).lower() for field, text in texts)
+
+    if kinds or bounds or texts:
+        items = [item for item in items if matches(item)]
+    sort = args.get('sort')
+    if sort:
+        def value(item):
+            return item.get(sort) if sort in ('name', 'size', 'mtime') else (item.get('meta') or {}).get(sort)
+        present = [item for item in items if value(item) is not None]
+        missing = [item for item in items if value(item) is None]
+        present.sort(key=lambda item: (value(item).lower() if isinstance(value(item), str) else value(item)),
+                     reverse=args.get('order') == 'desc')
+        items = present + missing
+    return items
+
+class MediaIndex:
+    """Duration, resolution, camera, date taken and page count of media files
+
+    Only headers are read, by the readers in MEDIA_READERS. Results are kept
+    by path, size and mtime in memory and in the share's catalog, so a file
+    is parsed once until it changes. Listings queue the files they find that
+    aren't indexed yet on a small pool of background-priority workers and
+    show whatever is known so far.
+    """
+    def __init__(self, workers=2, max_entries=20000, max_pending=10000):
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self.entries = OrderedDict()  # (root path, rel_path) -> ((size, mtime), meta); {} when unreadable
+        self.pending = set()          # (root path, rel_path) queued or being read
+        self.lock = threading.Lock()
+        self.indexed = 0
+        self.failed = 0
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media',
+                                       initializer=lower_thread_priority)
+
+    @staticmethod
+    def reader_for(name):
+        return MEDIA_READERS.get(os.path.splitext(name)[1].lower())
+
+    def get(self, key, identity):
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is None or cached[0] != identity:
+                return None
+            self.entries.move_to_end(key)
+            return cached[1]
+
+    def _remember(self, key, identity, meta):
+        with self.lock:
+            self.entries[key] = (identity, meta)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def extract(self, root, rel_path):
+        """Metadata of one file, read now unless it is cached; {} when there is none"""
+        rel_path = normalize_rel_path(rel_path)
+        reader = self.reader_for(rel_path)
+        if reader is None:
+            return {}
+        full_path = root.resolve_path(rel_path)
+        stat = os.stat(full_path)
+        identity = (stat.st_size, stat.st_mtime)
+        key = (root.path, rel_path)
+        meta = self.get(key, identity)
+        if meta is not None:
+            return meta
+        rel_dir, _, name = rel_path.rpartition('/')
+        if root.catalog:
+            stored = root.catalog.get_media(rel_dir, [name]).get(name)
+            if stored and stored[0] == identity:
+                self._remember(key, identity, stored[1])
+                return stored[1]
+        try:
+            meta = reader(full_path)
+            with self.lock:
+                self.indexed += 1
+        except Exception as e:
+            # Truncated or odd files are remembered as having no metadata, not retried
+            log_event(f"No metadata for {full_path}: {e}", level='warning', path=full_path)
+            meta = {}
+            with self.lock:
+                self.failed += 1
+        self._remember(key, identity, meta)
+        if root.catalog:
+            root.catalog.set_media(rel_path, identity, meta)
+        return meta
+
+    def annotate(self, root, rel_dir, items, batch_size=200):
+        """Yield listing items, with 'meta' added where it is known; queue the rest
+
+        Items go through in batches, each needing at most one catalog query
+        for the files memory doesn't know, so huge folders still stream.
+        """
+        rel_dir = normalize_rel_path(rel_dir)
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield from self._annotate_batch(root, rel_dir, batch)
+                batch = []
+        yield from self._annotate_batch(root, rel_dir, batch)
+
+    def _annotate_batch(self, root, rel_dir, items):
+        known = {}  # name -> metadata from memory, None when it has to be looked up
+        for item in items:
+            if item['type'] == 'file' and self.reader_for(item['name']):
+                known[item['name']] = self.get((root.path, item['path']), (item['size'], item['mtime']))
+        missing = [name for name, meta in known.items() if meta is None]
+        stored = root.catalog.get_media(rel_dir, missing) if missing and root.catalog else {}
+        for item in items:
+            if item['name'] in known:
+                identity = (item['size'], item['mtime'])
+                meta = known[item['name']]
+                cached = stored.get(item['name'])
+                if meta is None and cached and cached[0] == identity:
+                    meta = cached[1]
+                    self._remember((root.path, item['path']), identity, meta)
+                if meta is None:
+                    self.queue(root, item['path'])
+                elif meta:
+                    item = dict(item, meta=meta)  # Listings are shared with the caches, never changed in place
+            yield item
+
+    def queue(self, root, rel_path):
+        key = (root.path, rel_path)
+        with self.lock:
+            if key in self.pending or len(self.pending) >= self.max_pending:
+                return  # Already on its way, or the next listing will ask again
+            self.pending.add(key)
+        self.pool.submit(self._index, root, rel_path, key)
+
+    def _index(self, root, rel_path, key):
+        try:
+            if root.path == key[0]:  # The share may have been moved to another folder meanwhile
+                self.extract(root, rel_path)
+        except (OSError, ValueError):
+            pass  # Deleted or renamed before its turn
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+
+    def pending_in(self, root, rel_dir):
+        """Media files of a folder still waiting to be read"""
+        rel_dir = normalize_rel_path(rel_dir)
+        with self.lock:
+            return sum(1 for path, rel_path in self.pending
+                       if path == root.path and rel_path.rpartition('/')[0] == rel_dir)
+
+    def stats(self):
+        with self.lock:
+            return {'cached': len(self.entries), 'pending': len(self.pending),
+                    'indexed': self.indexed, 'failed': self.failed}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class FeedSubscription:
+    """One client's view of the change feed: the folders it watches and its pending events"""
+    def __init__(self, dirs):
+        self.dirs = {normalize_rel_path(d) for d in dirs}
+        self.pending = {}  # rel_dir -> {path: event}, or None once collapsed into a resync
+        self.condition = threading.Condition()
+
+    def push(self, rel_dir, events, limit):
+        with self.condition:
+            if rel_dir in self.pending and self.pending[rel_dir] is None:
+                return  # Already waiting for a full resync of this folder
+            merged = self.pending.setdefault(rel_dir, {})
+            for event in events:
+                previous = merged.get(event['path'])
+                if previous is None:
+                    merged[event['path']] = event
+                elif previous['type'] == 'created' and event['type'] == 'deleted':
+                    # Appeared and vanished before anyone saw it
+                    del merged[event['path']]
+                elif previous['type'] == 'created':
+                    merged[event['path']] = dict(event, type='created')
+                elif previous['type'] == 'deleted' and event['type'] == 'created':
+                    merged[event['path']] = dict(event, type='modified')
+                else:
+                    merged[event['path']] = event
+            if len(merged) > limit:
+                self.pending[rel_dir] = None
+            self.condition.notify_all()
+
+    def wait(self, timeout):
+        with self.condition:
+            return self.condition.wait_for(lambda: bool(self.pending), timeout=timeout)
+
+    def drain(self):
+        """Take everything pending as one batch per folder"""
+        with self.condition:
+            pending, self.pending = self.pending, {}
+        batches = []
+        for rel_dir, events in pending.items():
+            if events is None:
+                batches.append({'path': rel_dir, 'resync': True, 'changes': []})
+            elif events:
+                batches.append({'path': rel_dir, 'resync': False, 'changes': list(events.values())})
+        return batches
+
+class ChangeFeed:
+    """Fans out folder change events to the clients viewing those folders
+
+    Events for the same path are merged while they wait to be delivered, and a
+    folder with too many pending changes collapses into a single resync notice
+    so a big copy can't flood slow clients.
+    """
+    def __init__(self, max_events_per_dir=200, coalesce_delay=0.3):
+        self.max_events_per_dir = max_events_per_dir
+        self.coalesce_delay = coalesce_delay  # Seconds to let a burst accumulate before sending
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+        self.journal = None  # Every published change is also recorded here when set
+
+    def subscribe(self, dirs):
+        subscription = FeedSubscription(dirs)
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def watched_dirs(self):
+        with self.lock:
+            return set().union(*(sub.dirs for sub in self.subscriptions))
+
+    def publish(self, rel_dir, events):
+        rel_dir = normalize_rel_path(rel_dir)
+        if self.journal:
+            self.journal.record(rel_dir, events)
+        with self.lock:
+            targets = [sub for sub in self.subscriptions if rel_dir in sub.dirs]
+        for subscription in targets:
+            subscription.push(rel_dir, events, self.max_events_per_dir)
+
+class DirectoryWatcher:
+    """Polls the folders clients are viewing and publishes what changed
+
+    Only folders with at least one subscriber are scanned. LocalDrive's own
+    changes ask for an immediate rescan, so they show up without waiting for
+    the next poll and without being reported twice.
+    """
+    def __init__(self, feed, scan, interval=2.0):
+        self.feed = feed
+        self.scan = scan  # rel_dir -> list of item dicts
+        self.interval = interval
+        self.snapshots = {}  # rel_dir -> {path: item}
+        self.urgent = set()
+        self.lock = threading.Lock()
+        self.wake = Event()
+        self.stopped = Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = Thread(target=self._run, name='dir-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+    def watch(self, dirs):
+        """Take a baseline of newly subscribed folders right away"""
+        with self.lock:
+            for rel_dir in dirs:
+                if rel_dir not in self.snapshots:
+                    self.snapshots[rel_dir] = None
+                    self.urgent.add(rel_dir)
+        self.start()
+        self.wake.set()
+
+    def rescan(self, rel_dir):
+        """Ask for an immediate rescan of rel_dir if anyone is watching it"""
+        rel_dir = normalize_rel_path(rel_dir)
+        with self.lock:
+            if rel_dir not in self.snapshots:
+                return
+            self.urgent.add(rel_dir)
+        self.wake.set()
+
+    def reset(self):
+        with self.lock:
+            self.snapshots.clear()
+            self.urgent.clear()
+
+    def _run(self):
+        next_poll = 0
+        while not self.stopped.is_set():
+            self.wake.wait(timeout=max(0.05, next_poll - time.time()))
+            self.wake.clear()
+            if self.stopped.is_set():
+                break
+
+            watched = self.feed.watched_dirs()
+            with self.lock:
+                for rel_dir in list(self.snapshots):
+                    if rel_dir not in watched:
+                        del self.snapshots[rel_dir]
+                urgent, self.urgent = self.urgent, set()
+
+            poll_due = time.time() >= next_poll
+            targets = watched if poll_due else urgent & watched
+            started = time.time()
+            for rel_dir in targets:
+                self._check(rel_dir)
+            if poll_due:
+                # Back off on huge folders so polling never dominates the machine
+                next_poll = time.time() + max(self.interval, (time.time() - started) * 10)
+
+    def _check(self, rel_dir):
+        try:
+            current = {item['path']: item for item in self.scan(rel_dir)}
+        except (OSError, ValueError):
+            current = {}
+        with self.lock:
+            previous = self.snapshots.get(rel_dir)
+            self.snapshots[rel_dir] = current
+        if previous is None:
+            return  # First look at this folder is the baseline
+
+        events = []
+        for path, item in current.items():
+            old = previous.get(path)
+            if old is None:
+                events.append({'type': 'created', 'path': path, 'item': item})
+            elif (old['size'], old['mtime'], old['type']) != (item['size'], item['mtime'], item['type']):
+                events.append({'type': 'modified', 'path': path, 'item': item})
+        for path in previous.keys() - current.keys():
+            events.append({'type': 'deleted', 'path': path, 'item': previous[path]})
+        if events:
+            self.feed.publish(rel_dir, events)
+
+class JobCancelled(Exception):
+    """Raised inside a job function when the job has been cancelled"""
+
+class Job:
+    """A long-running file operation with progress that clients can poll"""
+    def __init__(self, kind, description):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.status = 'queued'  # queued, running, completed, failed, cancelled
+        self.items_total = 0
+        self.items_done = 0
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.result = None
+        self.version = 0  # Bumped on every change so watchers can wait for updates
+        self.cancel_event = Event()
+        self.lock = threading.Lock()
+        self.manager = None
+
+    def record(self, items=0, bytes=0):
+        """Record finished work; safe to call from several worker threads"""
+        with self.lock:
+            self.items_done += items
+            self.bytes_done += bytes
+        self._changed()
+
+    def set_totals(self, items=None, bytes=None):
+        if items is not None:
+            self.items_total = items
+        if bytes is not None:
+            self.bytes_total = bytes
+        self._changed()
+
+    def add_progress(self, items=0, bytes=0):
+        """Record finished work; also the place where cancellation is noticed"""
+        self.record(items, bytes)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def is_active(self):
+        return self.status in ('queued', 'running')
+
+    def _changed(self):
+        if self.manager:
+            self.manager.notify(self)
+
+    def eta(self):
+        """Estimated seconds left, based on bytes when known and items otherwise"""
+        if self.status != 'running' or not self.started:
+            return None
+        elapsed = time.time() - self.started
+        if self.bytes_total and self.bytes_done:
+            done, total = self.bytes_done, self.bytes_total
+        elif self.items_total and self.items_done:
+            done, total = self.items_done, self.items_total
+        else:
+            return None
+        rate = done / max(elapsed, 0.001)
+        return max(0.0, (total - done) / rate)
+
+    def to_dict(self):
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'description': self.description,
+            'status': self.status,
+            'items_total': self.items_total,
+            'items_done': self.items_done,
+            'bytes_total': self.bytes_total,
+            'bytes_done': self.bytes_done,
+            'bytes_per_second': self.bytes_done / elapsed if elapsed > 0 else 0,
+            'eta': self.eta(),
+            'elapsed': elapsed,
+            'error': self.error,
+            'result': self.result,
+            'version': self.version
+        }
+
+class JobManager:
+    """Runs long file operations on a small worker pool
+
+    A job function receives its Job as the first argument and reports progress
+    through it. Finished jobs are kept for a while so clients can read the result.
+    """
+    def __init__(self, max_workers=2, keep_finished=50):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self.condition = threading.Condition()
+
+    def submit(self, kind, description, func, *args, **kwargs):
+        job = Job(kind, description)
+        job.manager = self
+        with self.condition:
+            self.jobs[job.id] = job
+            self._prune()
+        self.pool.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_event.is_set():
+            job.status = 'cancelled'
+            job.finished = time.time()
+            self.notify(job)
+            return
+        job.status = 'running'
+        job.started = time.time()
+        self.notify(job)
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = 'completed'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            log_event(f"Job {job.id} ({job.description}) failed: {e}", level='error', job=job.id)
+        finally:
+            job.finished = time.time()
+            self.notify(job)
+
+    def notify(self, job):
+        with self.condition:
+            job.version += 1
+            self.condition.notify_all()
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if not job.is_active()]
+        finished.sort(key=lambda job: job.finished or job.created)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.id]
+
+    def get(self, job_id):
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def list(self, active_only=False):
+        with self.condition:
+            jobs = list(self.jobs.values())
+        if active_only:
+            jobs = [job for job in jobs if job.is_active()]
+        return sorted(jobs, key=lambda job: job.created)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if not job or not job.is_active():
+            return False
+        job.cancel_event.set()
+        self.notify(job)
+        return True
+
+    def wait_for_update(self, job, version, timeout=15):
+        """Block until the job changes past version or the timeout expires"""
+        with self.condition:
+            self.condition.wait_for(lambda: job.version != version, timeout=timeout)
+            return job.version
+
+    def shutdown(self):
+        for job in self.list(active_only=True):
+            job.cancel_event.set()
+        self.pool.shutdown(wait=False)
+
+def is_link(path):
+    """True for symlinks and, on Windows, directory junctions"""
+    return os.path.islink(path) or bool(getattr(os.path, 'isjunction', lambda _: False)(path))
+
+def remove_link(path):
+    """Remove the link itself, never what it points to"""
+    try:
+        os.remove(path)
+    except (IsADirectoryError, PermissionError):
+        os.rmdir(path)  # Directory symlinks and junctions on Windows
+
+def delete_tree(job, path):
+    """Job function that removes a folder tree while reporting progress
+
+    Links are removed as links; nothing outside the tree is ever walked.
+    """
+    if is_link(path) or not os.path.isdir(path):
+        raise ValueError(f"Not a folder: {path}")
+    # First pass counts the work so progress and ETA mean something
+    items = 0
+    total_bytes = 0
+    for root, dirs, files in os.walk(path):
+        job.check_cancelled()
+        items += len(files) + len(dirs)
+        dirs[:] = [name for name in dirs if not is_link(os.path.join(root, name))]
+        for name in files:
+            try:
+                total_bytes += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    job.set_totals(items=items + 1, bytes=total_bytes)
+
+    # Files and links go on the way down, the emptied folders deepest first afterwards
+    folders = []
+    for root, dirs, files in os.walk(path):
+        folders.append(root)
+        for name in files:
+            file_path = os.path.join(root, name)
+            try:
+                size = os.lstat(file_path).st_size
+            except OSError:
+                size = 0
+            os.remove(file_path)
+            job.add_progress(items=1, bytes=size)
+        for name in list(dirs):
+            dir_path = os.path.join(root, name)
+            if is_link(dir_path):
+                remove_link(dir_path)
+                dirs.remove(name)  # Never walk into a link
+                job.add_progress(items=1)
+    for folder in reversed(folders):
+        os.rmdir(folder)
+        job.add_progress(items=1)
+    return job.items_done
+
+def _reflink(src_fd, dst_fd):
+    """Clone a file on copy-on-write filesystems (Btrfs, XFS); Linux only"""
+    import fcntl
+    FICLONE = 0x40049409
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+def fast_copy_file(src, dst, progress=None, chunk_size=8 * 1024 * 1024):
+    """Copy one file using the fastest mechanism the OS offers
+
+    Tries a reflink, then copy_file_range, then sendfile on Linux, so the
+    data stays inside the kernel; on Windows CopyFileExW does the copy,
+    including timestamps and attributes. Elsewhere it is shutil.copy2.
+    progress(bytes) is called as data is copied.
+    """
+    size = os.path.getsize(src)
+    if platform.system() == "Windows":
+        return _windows_copy(src, dst, progress)
+    if sys.platform.startswith('linux'):
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+            try:
+                _reflink(src_fd, dst_fd)
+                if progress:
+                    progress(size)
+                shutil.copystat(src, dst)
+                return size
+            except (ImportError, OSError):
+                pass
+
+            copied = 0
+            copier = getattr(os, 'copy_file_range', None)
+            while copied < size:
+                count = min(chunk_size, size - copied)
+                try:
+                    if copier:
+                        sent = copier(src_fd, dst_fd, count)
+                    else:
+                        sent = os.sendfile(dst_fd, src_fd, copied, count)
+                except OSError:
+                    if copier and copied == 0:
+                        # Not supported between these filesystems, try sendfile
+                        copier = None
+                        continue
+                    raise
+                if sent == 0:
+                    break
+                copied += sent
+                if progress:
+                    progress(sent)
+        shutil.copystat(src, dst)
+        return copied
+
+    shutil.copy2(src, dst)
+    if progress:
+        progress(size)
+    return size
+
+def _windows_copy(src, dst, progress=None):
+    """CopyFileExW, reporting progress from its callback; errors raised in progress() stop the copy"""
+    PROGRESS_CONTINUE, PROGRESS_CANCEL = 0, 1
+    routine_type = ctypes.WINFUNCTYPE(ctypes.c_uint32, ctypes.c_int64, ctypes.c_int64, ctypes.c_int64,
+                                      ctypes.c_int64, ctypes.c_uint32, ctypes.c_uint32,
+                                      ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p)
+    reported = [0]
+    failure = []
+
+    def on_progress(total, transferred, stream_size, stream_transferred, stream, reason, source, dest, data):
+        try:
+            if progress and transferred > reported[0]:
+                progress(transferred - reported[0])
+            reported[0] = transferred
+            return PROGRESS_CONTINUE
+        except BaseException as e:  # Exceptions can't cross the callback, so stop the copy and re-raise after
+            failure.append(e)
+            return PROGRESS_CANCEL
+
+    routine = routine_type(on_progress)
+    copy_file = ctypes.windll.kernel32.CopyFileExW
+    copy_file.argtypes = [ctypes.c_wchar_p, ctypes.c_wchar_p, routine_type, ctypes.c_void_p,
+                          ctypes.c_void_p, ctypes.c_uint32]
+    copy_file.restype = ctypes.c_int
+    if not copy_file(src, dst, routine, None, None, 0):
+        if failure:
+            raise failure[0]
+        raise ctypes.WinError()
+    return reported[0]
+
+def unique_destination(dest_dir, name, taken=()):
+    """Pick 'name', 'name (copy)', 'name (copy 2)', ... that doesn't exist yet in dest_dir or in taken"""
+    target = os.path.join(dest_dir, name)
+    if not os.path.lexists(target) and target not in taken:
+        return target
+    stem, ext = os.path.splitext(name)
+    if os.path.isdir(target):
+        stem, ext = name, ''
+    counter = 1
+    while True:
+        suffix = ' (copy)' if counter == 1 else f' (copy {counter})'
+        target = os.path.join(dest_dir, f"{stem}{suffix}{ext}")
+        if not os.path.lexists(target) and target not in taken:
+            return target
+        counter += 1
+
+def plan_copy(job, pairs):
+    """Work for copying each (source, target) pair: files, folders to create and links to recreate
+
+    Links to folders, including Windows junctions, are copied as links, so a
+    copy never reaches outside the tree it was given.
+    """
+    plan = []  # (src, dst, size)
+    folders = []
+    links = []
+    for source, target in pairs:
+        if is_link(source) and os.path.isdir(source):
+            links.append((source, target))
+        elif os.path.isdir(source):
+            if os.path.commonpath([os.path.dirname(target), source]) == source:
+                raise ValueError(f"Cannot copy {os.path.basename(source)} into itself")
+            for root, dirs, files in os.walk(source):
+                job.check_cancelled()
+                target_root = os.path.join(target, os.path.relpath(root, source))
+                folders.append((root, target_root))
+                for name in dirs:
+                    if is_link(os.path.join(root, name)):
+                        links.append((os.path.join(root, name), os.path.join(target_root, name)))
+                dirs[:] = [name for name in dirs if not is_link(os.path.join(root, name))]
+                for name in files:
+                    src_file = os.path.join(root, name)
+                    try:
+                        size = os.path.getsize(src_file)
+                    except OSError:
+                        continue
+                    plan.append((src_file, os.path.join(target_root, name), size))
+        else:
+            plan.append((source, target, os.path.getsize(source)))
+    return plan, folders, links
+
+def run_copy(job, plan, folders, links, workers=4, count_items=True):
+    """Carry out plan_copy()'s work; count_items=False leaves the job's item progress alone"""
+    for _, target_root in folders:
+        os.makedirs(target_root, exist_ok=True)
+    for source, target in links:
+        os.symlink(os.readlink(source), target, target_is_directory=True)
+        if count_items:
+            job.add_progress(items=1)
+
+    def copy_one(entry):
+        src, dst, _ = entry
+        job.check_cancelled()
+        fast_copy_file(src, dst, progress=lambda sent: job.add_progress(bytes=sent))
+        if count_items:
+            job.add_progress(items=1)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='copy') as pool:
+        for future in [pool.submit(copy_one, entry) for entry in plan]:
+            future.result()
+
+    # Folder timestamps last, since copying files into them changes their mtime
+    for root, target_root in folders:
+        shutil.copystat(root, target_root)
+
+def copy_items(job, sources, dest_dir, workers=4):
+    """Job function copying files and folder trees into dest_dir
+
+    Folders are created up front and their files copied on a bounded pool.
+    """
+    pairs = []
+    taken = set()  # Targets picked for this job, which don't exist yet
+    for source in sources:
+        target = unique_destination(dest_dir, os.path.basename(source), taken)
+        taken.add(target)
+        pairs.append((source, target))
+    plan, folders, links = plan_copy(job, pairs)
+    job.set_totals(items=len(plan) + len(links), bytes=sum(size for _, _, size in plan))
+    run_copy(job, plan, folders, links, workers)
+    return job.items_done
+
+def move_items(job, sources, dest_dir, workers=4):
+    """Job function moving items into dest_dir
+
+    A rename is used whenever source and destination share a filesystem;
+    otherwise the item is copied and the original removed.
+    """
+    job.set_totals(items=len(sources))
+    moved = 0
+    for source in sources:
+        job.check_cancelled()
+        target = os.path.join(dest_dir, os.path.basename(source))
+        if os.path.lexists(target):
+            raise FileExistsError(f"{os.path.basename(source)} already exists in destination")
+        if os.path.isdir(source) and not is_link(source) and os.path.commonpath([dest_dir, source]) == source:
+            raise ValueError(f"Cannot move {os.path.basename(source)} into itself")
+        try:
+            os.rename(source, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Different filesystem: copy, counting its bytes on top of the move's own totals, then delete
+            plan, folders, links = plan_copy(job, [(source, target)])
+            job.set_totals(bytes=job.bytes_total + sum(size for _, _, size in plan))
+            run_copy(job, plan, folders, links, workers, count_items=False)
+            if is_link(source):
+                remove_link(source)
+            elif os.path.isdir(source):
+                shutil.rmtree(source)
+            else:
+                os.remove(source)
+        moved += 1
+        job.record(items=1)
+    return moved
+
+def make_root_name(folder_path, taken=()):
+    """Derive a URL-safe share name from a folder path, unique among taken"""
+    base = re.sub(r'[^A-Za-z0-9_-]+', '-', os.path.basename(os.path.abspath(folder_path))).strip('-').lower()
+    base = base or 'share'
+    name = base
+    counter = 2
+    while name in taken:
+        name = f"{base}-{counter}"
+        counter += 1
+    return name
+
+def diff_listings(rel_dir, old, new):
+    """Change events between two {name: item} listings of the same folder"""
+    events = []
+    for name, item in new.items():
+        path = f"{rel_dir}/{name}" if rel_dir else name
+        item = dict(item, path=path)
+        previous = old.get(name)
+        if previous is None:
+            events.append({'type': 'created', 'path': path, 'item': item})
+        elif (previous['type'], previous['size'], previous['mtime']) != (item['type'], item['size'], item['mtime']):
+            events.append({'type': 'modified', 'path': path, 'item': item})
+    for name in old.keys() - new.keys():
+        path = f"{rel_dir}/{name}" if rel_dir else name
+        events.append({'type': 'deleted', 'path': path, 'item': dict(old[name], path=path)})
+    return events
+
+class ChangeJournal:
+    """Sequence-numbered log of changes in a share, for incremental sync
+
+    Clients keep the token of the last change they saw and ask for what came
+    after it. Events arrive from several places (the folder watcher, catalog
+    refreshes after LocalDrive's own changes, background reconciliation), so
+    an event that only repeats the last known state of a path is dropped. Old
+    entries are compacted: superseded changes to the same path are merged
+    after a while, and the oldest ones are dropped past the retention limits,
+    which moves the floor below which tokens need a full resync.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, time REAL NOT NULL, "
+        "kind TEXT NOT NULL, dir TEXT NOT NULL, path TEXT NOT NULL, old_path TEXT, item TEXT)",
+        "CREATE INDEX IF NOT EXISTS changes_path ON changes (path, seq)",
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    )
+
+    def __init__(self, db_path=None, max_entries=100000, max_age=7 * 24 * 3600,
+                 merge_after=3600, compact_every=500):
+        self.db_path = db_path or ':memory:'
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.merge_after = merge_after  # Seconds before superseded changes are merged
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.last_state = OrderedDict()  # path -> signature of the last recorded state
+        self.since_compact = 0
+        if db_path:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        for statement in self.SCHEMA:
+            self.conn.execute(statement)
+        # The epoch changes whenever the journal starts over, so old tokens can't be misread
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()
+        if row:
+            self.epoch = row[0]
+        else:
+            self.epoch = uuid.uuid4().hex[:8]
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('epoch', ?)", (self.epoch,))
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('floor', '0')")
+        self.conn.commit()
+
+    @staticmethod
+    def _signature(kind, item):
+        if kind == 'deleted' or item is None:
+            return ('deleted',)
+        return ('present', item['type'], item['size'], item['mtime'])
+
+    def _pair_renames(self, events):
+        """Turn a deletion and a creation of an identical item into one rename"""
+        deleted = {}
+        for event in events:
+            if event['type'] == 'deleted' and event.get('item'):
+                old = event['item']
+                deleted.setdefault((old['type'], old['size'], old['mtime']), []).append(event)
+        if not deleted:
+            return events
+        paired = []
+        renamed_from = set()
+        for event in events:
+            if event['type'] == 'created':
+                item = event['item']
+                candidates = deleted.get((item['type'], item['size'], item['mtime']))
+                if candidates:
+                    old = candidates.pop(0)
+                    renamed_from.add(old['path'])
+                    paired.append(dict(event, type='renamed', old_path=old['path']))
+                    continue
+            paired.append(event)
+        return [e for e in paired if not (e['type'] == 'deleted' and e['path'] in renamed_from)]
+
+    def record(self, rel_dir, events):
+        rel_dir = normalize_rel_path(rel_dir)
+        now = time.time()
+        rows = []
+        with self.lock:
+            for event in self._pair_renames(events):
+                kind, path, item = event['type'], event['path'], event.get('item')
+                if kind == 'deleted':
+                    item = None
+                signature = self._signature(kind, item)
+                if kind != 'renamed' and self.last_state.get(path) == signature:
+                    continue  # Already recorded from another source
+                if kind == 'renamed':
+                    self.last_state[event['old_path']] = ('deleted',)
+                self.last_state[path] = signature
+                self.last_state.move_to_end(path)
+                rows.append((now, kind, rel_dir, path, event.get('old_path'), json.dumps(item) if item else None))
+            while len(self.last_state) > 10000:
+                self.last_state.popitem(last=False)
+            if not rows:
+                return
+            self.conn.executemany("INSERT INTO changes (time, kind, dir, path, old_path, item) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+            self.since_compact += len(rows)
+            if self.since_compact >= self.compact_every:
+                self.since_compact = 0
+                self._compact(now)
+
+    def _compact(self, now):
+        conn = self.conn
+        # Merge: an older change is redundant once a later one describes the same path
+        conn.execute("DELETE FROM changes WHERE time < ? AND kind != 'renamed' AND EXISTS "
+                     "(SELECT 1 FROM changes later WHERE later.path = changes.path AND later.seq > changes.seq)",
+                     (now - self.merge_after,))
+        # Retention: dropping history raises the floor for valid tokens
+        last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        cutoff = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes WHERE time < ? OR seq <= ?",
+                              (now - self.max_age, last_seq - self.max_entries)).fetchone()[0]
+        if cutoff:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (cutoff,))
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'floor' AND CAST(value AS INTEGER) < ?",
+                         (str(cutoff), cutoff))
+        conn.commit()
+
+    def compact(self):
+        with self.lock:
+            self._compact(time.time())
+
+    def token(self, seq):
+        return f"{self.epoch}.{seq}"
+
+    def _floor(self):
+        return int(self.conn.execute("SELECT value FROM meta WHERE key = 'floor'").fetchone()[0])
+
+    def _last_seq(self, floor):
+        # Retention can empty the table; the floor still marks where history stands
+        return max(self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0], floor)
+
+    def current_token(self):
+        with self.lock:
+            return self.token(self._last_seq(self._floor()))
+
+    def changes_since(self, token, limit=1000, prefix=''):
+        """Changes after token, or None when the token is too old or from another journal"""
+        try:
+            epoch, seq = token.split('.', 1)
+            seq = int(seq)
+        except (AttributeError, ValueError):
+            return None
+        prefix = normalize_rel_path(prefix)
+        with self.lock:
+            floor = self._floor()
+            last_seq = self._last_seq(floor)
+            if epoch != self.epoch or seq < floor or seq > last_seq:
+                return None
+            rows = self.conn.execute(
+                "SELECT seq, time, kind, path, old_path, item FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                (seq, limit)).fetchall()
+        changes = []
+        for row_seq, when, kind, path, old_path, item in rows:
+            if prefix and not (path == prefix or path.startswith(prefix + '/')):
+                continue
+            change = {'seq': row_seq, 'time': when, 'type': kind, 'path': path}
+            if old_path:
+                change['old_path'] = old_path
+            if item:
+                change['item'] = json.loads(item)
+            changes.append(change)
+        next_seq = rows[-1][0] if rows else seq
+        return {'changes': changes, 'token': self.token(next_seq), 'more': next_seq < last_seq}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class ShareCatalog:
+    """Persistent SQLite catalog of a share's folders, entries and sizes
+
+    Opened lazily, so startup never waits on it. Listings are served from it
+    whenever the folder's mtime still matches, which makes the first requests
+    after a restart as cheap as warm ones. A background pass reconciles it
+    with the disk and fills in folder sizes while requests are served.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER)",
+        "CREATE TABLE IF NOT EXISTS entries (dir TEXT NOT NULL, name TEXT NOT NULL, type TEXT NOT NULL, "
+        "size INTEGER NOT NULL, mtime REAL NOT NULL, PRIMARY KEY (dir, name)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS media (dir TEXT NOT NULL, name TEXT NOT NULL, size INTEGER NOT NULL, "
+        "mtime REAL NOT NULL, meta TEXT NOT NULL, PRIMARY KEY (dir, name)) WITHOUT ROWID",
+    )
+
+    def __init__(self, catalog_dir, root):
+        self.catalog_dir = catalog_dir
+        self.root = root
+        # Request threads come and go, so read connections are pooled rather than kept per thread;
+        # WAL lets them read while the writer thread, the only one that writes, commits
+        self.readers = queue.LifoQueue()
+        self.max_readers = 8
+        self.writes = queue.Queue()  # (generation, func, args) run in order by the writer thread
+        self.generation = 0
+        self.stop_event = Event()
+        self.reconciling = False
+        self.reconciled = None  # Time the last full reconciliation finished
+        self.db_path = self._db_path()
+        self.writer = Thread(target=self._run_writes, daemon=True, name=f"catalog-writer-{root.name}")
+        self.writer.start()
+
+    def _db_path(self):
+        key = hashlib.sha1(os.path.normcase(self.root.path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.catalog_dir, f"{key}.db")
+
+    def _connect(self):
+        os.makedirs(self.catalog_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        return conn
+
+    def _query(self, sql, params=()):
+        """Rows of one read, on a pooled connection of the current catalog"""
+        generation = self.generation
+        while True:
+            try:
+                conn_generation, conn = self.readers.get_nowait()
+            except queue.Empty:
+                conn_generation, conn = generation, self._connect()
+                break
+            if conn_generation == generation:
+                break
+            conn.close()  # Left over from the folder the root pointed at before
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            if self.readers.qsize() < self.max_readers:
+                self.readers.put((conn_generation, conn))
+            else:
+                conn.close()
+
+    def write(self, func, *args):
+        """Queue func(conn, *args) for the writer thread, which commits after each one"""
+        self.writes.put((self.generation, func, args))
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been written"""
+        done = Event()
+        self.writes.put((None, lambda conn: done.set(), ()))
+        return done.wait(timeout)
+
+    def _run_writes(self):
+        conn = None
+        conn_generation = None
+        while True:
+            generation, func, args = self.writes.get()
+            if func is None:
+                break
+            if generation is not None and generation != self.generation:
+                continue  # Meant for the catalog of a folder the root no longer points at
+            try:
+                if conn is None or conn_generation != self.generation:
+                    if conn is not None:
+                        conn.close()
+                    conn, conn_generation = self._connect(), self.generation
+                func(conn, *args)
+                conn.commit()
+            except Exception as e:
+                if conn is not None:
+                    conn.rollback()
+                log_event(f"Catalog write for {self.root.path} failed: {e}", level='warning', root=self.root.name)
+        if conn is not None:
+            conn.close()
+
+    def reset(self):
+        """Switch to the catalog of the root's new folder"""
+        self.stop_event.set()
+        self.generation += 1
+        self.db_path = self._db_path()
+        self.reconciled = None
+        self.stop_event = Event()
+
+    def get_listing(self, rel_dir, mtime_ns):
+        rel_dir = normalize_rel_path(rel_dir)
+        rows = self._query("SELECT mtime_ns FROM dirs WHERE path = ?", (rel_dir,))
+        if not rows or rows[0][0] != mtime_ns:
+            return None
+        rows = self._query("SELECT name, type, size, mtime FROM entries WHERE dir = ?", (rel_dir,))
+        return [{'name': name, 'type': kind, 'path': f"{rel_dir}/{name}" if rel_dir else name,
+                 'size': size, 'mtime': mtime} for name, kind, size, mtime in rows]
+
+    def set_listing(self, rel_dir, mtime_ns, items):
+        self.write(self._store_listing, normalize_rel_path(rel_dir), mtime_ns, items)
+
+    def _store_listing(self, conn, rel_dir, mtime_ns, items):
+        if self.root.journal and conn.execute("SELECT 1 FROM dirs WHERE path = ?", (rel_dir,)).fetchone():
+            # The catalog's previous listing is the baseline for journaling what changed
+            old = {name: {'name': name, 'type': kind, 'size': size, 'mtime': mtime}
+                   for name, kind, size, mtime in conn.execute(
+                       "SELECT name, type, size, mtime FROM entries WHERE dir = ?", (rel_dir,))}
+            events = diff_listings(rel_dir, old, {item['name']: item for item in items})
+            if events:
+                self.root.journal.record(rel_dir, events)
+        conn.execute("DELETE FROM entries WHERE dir = ?", (rel_dir,))
+        conn.executemany("INSERT OR REPLACE INTO entries (dir, name, type, size, mtime) VALUES (?, ?, ?, ?, ?)",
+                         [(rel_dir, item['name'], item['type'], item['size'], item['mtime']) for item in items])
+        conn.execute("INSERT INTO dirs (path, mtime_ns) VALUES (?, ?) "
+                     "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns", (rel_dir, mtime_ns))
+
+    def get_size(self, rel_dir):
+        rows = self._query("SELECT size FROM dirs WHERE path = ?", (normalize_rel_path(rel_dir),))
+        return rows[0][0] if rows else None
+
+    def set_size(self, rel_dir, size):
+        self.write(self._store_size, normalize_rel_path(rel_dir), size)
+
+    @staticmethod
+    def _store_size(conn, rel_dir, size):
+        conn.execute("INSERT INTO dirs (path, size) VALUES (?, ?) "
+                     "ON CONFLICT(path) DO UPDATE SET size = excluded.size", (rel_dir, size))
+
+    def get_media(self, rel_dir, names):
+        """name -> ((size, mtime), metadata) for those of the named files of rel_dir that are stored"""
+        names = list(names)
+        query = f"SELECT name, size, mtime, meta FROM media WHERE dir = ? AND name IN ({', '.join('?' * len(names))})"
+        rows = self._query(query, [normalize_rel_path(rel_dir)] + names) if names else []
+        return {name: ((size, mtime), json.loads(meta)) for name, size, mtime, meta in rows}
+
+    def set_media(self, rel_path, identity, meta):
+        rel_dir, _, name = normalize_rel_path(rel_path).rpartition('/')
+        self.write(self._store_media, rel_dir, name, identity, json.dumps(meta))
+
+    @staticmethod
+    def _store_media(conn, rel_dir, name, identity, meta):
+        conn.execute("INSERT OR REPLACE INTO media (dir, name, size, mtime, meta) VALUES (?, ?, ?, ?, ?)",
+                     (rel_dir, name, identity[0], identity[1], meta))
+
+    def invalidate(self, rel_dir):
+        """Forget the listing of rel_dir and the sizes of it and its parents"""
+        self.write(self._forget_dir, normalize_rel_path(rel_dir))
+
+    @staticmethod
+    def _forget_dir(conn, key):
+        conn.execute("UPDATE dirs SET mtime_ns = NULL WHERE path = ?", (key,))
+        while True:
+            conn.execute("UPDATE dirs SET size = NULL WHERE path = ?", (key,))
+            if not key:
+                break
+            key = key.rpartition('/')[0]
+
+    def refresh(self, rel_dir):
+        """Re-read one folder into the catalog, which journals what changed in it"""
+        self.write(self._refresh_dir, normalize_rel_path(rel_dir))
+
+    def _refresh_dir(self, conn, rel_dir):
+        try:
+            mtime_ns = os.stat(self.root.resolve_path(rel_dir)).st_mtime_ns
+            items = self.root.list_directory(rel_dir)
+        except (OSError, ValueError):
+            return  # Gone already; its parent's refresh records that
+        self._store_listing(conn, rel_dir, mtime_ns, items)
+
+    def _forget_children(self, conn, rel_dir, keep):
+        """Drop catalog rows of subfolders of rel_dir that no longer exist"""
+        prefix = f"{rel_dir}/" if rel_dir else ''
+        rows = conn.execute("SELECT path FROM dirs WHERE path != '' AND path LIKE ? ESCAPE '\\'",
+                            (self._like_escape(prefix) + '%',)).fetchall()
+        for (path,) in rows:
+            child = path[len(prefix):].split('/', 1)[0]
+            if child not in keep:
+                conn.execute("DELETE FROM dirs WHERE path = ?", (path,))
+                conn.execute("DELETE FROM entries WHERE dir = ?", (path,))
+                conn.execute("DELETE FROM media WHERE dir = ?", (path,))
+
+    @staticmethod
+    def _like_escape(text):
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    def search(self, query, limit=200):
+        """Entries whose name contains query, case-insensitively"""
+        pattern = '%' + self._like_escape(query) + '%'
+        rows = self._query("SELECT dir, name, type, size, mtime FROM entries WHERE name LIKE ? ESCAPE '\\' LIMIT ?",
+                           (pattern, limit))
+        return [{'name': name, 'type': kind, 'path': f"{rel_dir}/{name}" if rel_dir else name,
+                 'size': size, 'mtime': mtime} for rel_dir, name, kind, size, mtime in rows]
+
+    def start_reconcile(self, interval=600):
+        """Reconcile now and then every interval seconds, until reset or closed"""
+        stop_event = self.stop_event
+
+        def loop():
+            while not stop_event.is_set():
+                self.reconcile()
+                stop_event.wait(interval)
+
+        Thread(target=loop, daemon=True, name=f"catalog-{self.root.name}").start()
+
+    def reconcile(self):
+        """Walk the share and bring the catalog in line with the disk"""
+        stop_event = self.stop_event
+        self.reconciling = True
+        try:
+            self._reconcile_dir('', stop_event)
+            while not self.flush(timeout=1) and not stop_event.is_set():
+                pass
+            if not stop_event.is_set():
+                self.reconciled = time.time()
+        except OSError as e:
+            log_event(f"Catalog reconciliation of {self.root.path} stopped: {e}", level='warning', root=self.root.name)
+        finally:
+            self.reconciling = False
+
+    def _reconcile_dir(self, rel_dir, stop_event, walked=frozenset()):
+        if stop_event.is_set():
+            return 0
+        stats = os.stat(self.root.resolve_path(rel_dir))
+        mtime_ns = stats.st_mtime_ns
+        # Linked folders are listed and walked like the browser shows them; a link back up the tree is not
+        walked = walked | {(stats.st_dev, stats.st_ino)}
+        # The same items the browser lists, so a pass never differs from a live listing
+        items = [{'name': item['name'], 'type': item['type'], 'size': item['size'], 'mtime': item['mtime']}
+                 for item in self.root.iter_directory(rel_dir)]
+        subdirs = [item['name'] for item in items if item['type'] == 'folder']
+        total = sum(item['size'] for item in items if item['type'] == 'file')
+
+        # Each folder is its own short transaction on the writer thread, so request writes never wait
+        # behind a whole pass; the walk only pauses when it gets far ahead of the writer
+        while self.writes.qsize() > 100 and not stop_event.is_set():
+            stop_event.wait(0.05)
+        rows = self._query("SELECT mtime_ns FROM dirs WHERE path = ?", (rel_dir,))
+        if not rows or rows[0][0] != mtime_ns:
+            self.write(self._store_reconciled, rel_dir, mtime_ns, items, set(subdirs))
+
+        for name in subdirs:
+            child = f"{rel_dir}/{name}" if rel_dir else name
+            try:
+                child_stats = os.stat(self.root.resolve_path(child))
+                if (child_stats.st_dev, child_stats.st_ino) in walked:
+                    continue
+                total += self._reconcile_dir(child, stop_event, walked)
+            except OSError:
+                continue  # Vanished or unreadable; the next pass cleans it up
+        self.set_size(rel_dir, total)
+        return total
+
+    def _store_reconciled(self, conn, rel_dir, mtime_ns, items, subdirs):
+        self._store_listing(conn, rel_dir, mtime_ns, items)
+        self._forget_children(conn, rel_dir, subdirs)
+
+    def stats(self):
+        return {
+            'path': self.db_path,
+            'dirs': self._query("SELECT COUNT(*) FROM dirs")[0][0],
+            'entries': self._query("SELECT COUNT(*) FROM entries")[0][0],
+            'media': self._query("SELECT COUNT(*) FROM media")[0][0],
+            'reconciling': self.reconciling,
+            'reconciled': self.reconciled,
+            'queued_writes': self.writes.qsize(),
+        }
+
+    def close(self):
+        self.stop_event.set()
+        self.writes.put((None, None, ()))
+        self.writer.join(timeout=5)
+        while True:
+            try:
+                self.readers.get_nowait()[1].close()
+            except queue.Empty:
+                break
+
+class ShareRoot:
+    """One shared folder with its own URL prefix, caches and change feed"""
+    IGNORE_FILE = '.localdriveignore'
+
+    def __init__(self, name, path, catalog_dir=None, ignore_patterns=None):
+        self.name = name
+        self.path = os.path.abspath(path)
+        # Base rules plus the share's own .localdriveignore, reloaded when it changes
+        self.ignore_patterns = list(DEFAULT_IGNORE_PATTERNS if ignore_patterns is None else ignore_patterns)
+        self._ignore = None
+        self._ignore_stamp = None
+        self._ignore_checked = 0.0
+        self.ignore_lock = threading.Lock()
+        self.cache = DirectoryCache()
+        self.feed = ChangeFeed()
+        self.watcher = DirectoryWatcher(self.feed, self.list_directory)
+        self.hashes = {}  # rel_path -> ((size, mtime_ns), digest)
+        self.hashes_lock = threading.Lock()
+        self.pending_dirs = set()  # Folders waiting for a batched invalidation
+        self.pending_timer = None
+        self.pending_lock = threading.Lock()
+        self.catalog_dir = catalog_dir
+        self.catalog = ShareCatalog(catalog_dir, self) if catalog_dir else None
+        self.journal = None
+        self.open_journal()
+        if self.catalog:
+            self.catalog.start_reconcile()
+
+    def open_journal(self):
+        """Start the change journal of the current folder; kept next to the catalog when there is one"""
+        if self.journal:
+            self.journal.close()
+        db_path = self.catalog.db_path[:-len('.db')] + '.journal.db' if self.catalog else None
+        self.journal = ChangeJournal(db_path)
+        self.feed.journal = self.journal
+
+    def set_path(self, path):
+        """Point this root at another folder, dropping everything cached for the old one"""
+        self.path = os.path.abspath(path)
+        self.cache.clear()
+        self.watcher.reset()
+        with self.hashes_lock:
+            self.hashes.clear()
+        if self.catalog:
+            self.catalog.reset()
+        self.open_journal()
+        if self.catalog:
+            self.catalog.start_reconcile()
+
+    def close(self):
+        self.watcher.stop()
+        if self.catalog:
+            self.catalog.close()
+        self.journal.close()
+
+    @property
+    def prefix(self):
+        return f"/r/{self.name}"
+
+    def to_dict(self):
+        # The host path stays on the server; browsers only need the URL prefix
+        return {'name': self.name, 'prefix': self.prefix}
+
+    def resolve_path(self, rel_path):
+        """Map a path from the web UI onto the share, refusing anything outside it"""
+        full_path = os.path.abspath(os.path.join(self.path, rel_path.lstrip('/')))
+        if os.path.commonpath([full_path, self.path]) != self.path:
+            raise ValueError(f"Path is outside the shared folder: {rel_path}")
+        return full_path
+
+    def relative_path(self, full_path):
+        """Return full_path relative to the share, using forward slashes"""
+        rel_path = os.path.relpath(full_path, self.path)
+        return '' if rel_path == '.' else rel_path.replace('\\', '/')
+
+    def relative_dir(self, full_path):
+        """Return the share-relative parent folder of full_path"""
+        return self.relative_path(os.path.dirname(full_path))
+
+    @property
+    def ignore(self):
+        """Compiled ignore rules; the share's ignore file is checked at most every two seconds"""
+        now = time.monotonic()
+        if self._ignore is not None and now - self._ignore_checked < 2.0:
+            return self._ignore
+        with self.ignore_lock:
+            ignore_file = os.path.join(self.path, self.IGNORE_FILE)
+            try:
+                stat = os.stat(ignore_file)
+                stamp = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                stamp = None
+            if self._ignore is None or stamp != self._ignore_stamp:
+                self._ignore = IgnoreRules.from_file(ignore_file, self.ignore_patterns)
+                self._ignore_stamp = stamp
+            self._ignore_checked = now
+            return self._ignore
+
+    def set_ignore_patterns(self, patterns):
+        with self.ignore_lock:
+            self.ignore_patterns = list(patterns)
+            self._ignore = None
+        self.cache.clear()
+
+    def cached_listing(self, rel_dir):
+        """Listing of a share folder from memory, then the catalog, then the disk"""
+        mtime_ns = os.stat(self.resolve_path(rel_dir)).st_mtime_ns
+        items = self.cache.get_listing(rel_dir, mtime_ns)
+        if items is None:
+            # After a restart the catalog still knows every folder that hasn't changed
+            items = self.catalog.get_listing(rel_dir, mtime_ns) if self.catalog else None
+            if items is None:
+                items = self.list_directory(rel_dir)
+                if self.catalog:
+                    self.catalog.set_listing(rel_dir, mtime_ns, items)
+            self.cache.set_listing(rel_dir, mtime_ns, items)
+        return items
+
+    def list_directory(self, rel_dir):
+        """List the visible entries of a share folder as item dicts"""
+        return list(self.iter_directory(rel_dir))
+
+    def iter_directory(self, rel_dir):
+        """Item dicts of a share folder one at a time, as os.scandir finds them"""
+        ignore = self.ignore
+        rel_dir = normalize_rel_path(rel_dir)
+        with os.scandir(self.resolve_path(rel_dir)) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                    if ignore.is_ignored(f"{rel_dir}/{entry.name}" if rel_dir else entry.name, is_dir):
+                        continue
+                    stats = entry.stat()
+                except OSError:
+                    continue  # Vanished or unreadable while listing
+                yield {
+                    'name': entry.name,
+                    'type': 'folder' if is_dir else 'file',
+                    'path': self.relative_path(entry.path),
+                    'size': 0 if is_dir else stats.st_size,
+                    'mtime': stats.st_mtime
+                }
+
+    def manifest(self, rel_dir=''):
+        """Every visible file and folder below rel_dir, for mirroring
+
+        Only stats files, so it stays quick on large shares; hashes are
+        computed separately for the few files that need them.
+        """
+        files = []
+        dirs = []
+        ignore = self.ignore
+        pending = [normalize_rel_path(rel_dir)]
+        while pending:
+            current = pending.pop()
+            try:
+                it = os.scandir(self.resolve_path(current))
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    rel_path = f"{current}/{entry.name}" if current else entry.name
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if ignore.is_ignored(rel_path, is_dir):
+                            continue
+                        if is_dir:
+                            dirs.append(rel_path)
+                            pending.append(rel_path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat()
+                            files.append([rel_path, stat.st_size, stat.st_mtime_ns])
+                    except OSError:
+                        continue
+        return {'path': normalize_rel_path(rel_dir), 'generated': time.time(), 'files': files, 'dirs': dirs}
+
+    def walk_items(self, rel_dir=''):
+        """Yield the visible items below rel_dir, folder by folder"""
+        pending = [normalize_rel_path(rel_dir)]
+        while pending:
+            current = pending.pop()
+            try:
+                items = self.list_directory(current)
+            except OSError:
+                continue
+            for item in items:
+                if item['type'] == 'folder':
+                    pending.append(item['path'])
+                yield item
+
+    def file_hash(self, rel_path):
+        """BLAKE2 digest of a share file, cached until its size or mtime changes"""
+        rel_path = normalize_rel_path(rel_path)
+        full_path = self.resolve_path(rel_path)
+        stat = os.stat(full_path)
+        identity = (stat.st_size, stat.st_mtime_ns)
+        with self.hashes_lock:
+            cached = self.hashes.get(rel_path)
+        if cached and cached[0] == identity:
+            return cached[1]
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(full_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        with self.hashes_lock:
+            self.hashes[rel_path] = (identity, digest.hexdigest())
+        return digest.hexdigest()
+
+    def invalidate(self, rel_dirs):
+        """Invalidate cached data for each affected directory exactly once"""
+        for rel_dir in {normalize_rel_path(d) for d in rel_dirs}:
+            self.cache.invalidate(rel_dir)
+            if self.catalog:
+                self.catalog.invalidate(rel_dir)
+                self.catalog.refresh(rel_dir)
+            self.watcher.rescan(rel_dir)
+
+    def invalidate_soon(self, rel_dirs, delay=0.5):
+        """Batch invalidations from a burst of small changes, such as a folder upload"""
+        with self.pending_lock:
+            self.pending_dirs.update(normalize_rel_path(d) for d in rel_dirs)
+            if self.pending_timer is None:
+                self.pending_timer = threading.Timer(delay, self._flush_invalidations)
+                self.pending_timer.daemon = True
+                self.pending_timer.start()
+
+    def _flush_invalidations(self):
+        with self.pending_lock:
+            dirs, self.pending_dirs = self.pending_dirs, set()
+            self.pending_timer = None
+        self.invalidate(dirs)
+
+    def run_batch(self, operations, job=None, workers=8):
+        """Run a list of delete/rename/move operations with bounded parallelism
+
+        Returns one result per operation, in the order they were given. When a
+        job is passed, progress is reported per item and cancellation skips
+        the operations that have not started yet.
+        """
+        affected = set()
+        affected_lock = threading.Lock()
+
+        def run_one(index, operation):
+            op = operation.get('op', '')
+            path = operation.get('path', '')
+            result = {'index': index, 'op': op, 'path': path}
+            if job and job.cancel_event.is_set():
+                result['status'] = 'cancelled'
+                return result
+            try:
+                source = self.resolve_path(path)
+                if source == self.path:
+                    raise ValueError("The shared folder itself cannot be changed")
+                if not os.path.lexists(source):
+                    raise FileNotFoundError(f"No such file or folder: {path}")
+
+                if op == 'delete':
+                    if is_link(source):
+                        remove_link(source)
+                    elif os.path.isdir(source):
+                        shutil.rmtree(source)
+                    else:
+                        os.remove(source)
+                    dirs = [self.relative_dir(source)]
+                elif op == 'rename':
+                    new_name = operation.get('new_name', '')
+                    if not new_name or '/' in new_name or '\\' in new_name:
+                        raise ValueError(f"Invalid name: {new_name!r}")
+                    target = os.path.join(os.path.dirname(source), new_name)
+                    if os.path.exists(target):
+                        raise FileExistsError(f"{new_name} already exists")
+                    os.rename(source, target)
+                    dirs = [self.relative_dir(source)]
+                elif op == 'move':
+                    dest_dir = self.resolve_path(operation.get('dest', ''))
+                    if not os.path.isdir(dest_dir):
+                        raise NotADirectoryError(f"Destination is not a folder: {operation.get('dest', '')}")
+                    target = os.path.join(dest_dir, os.path.basename(source))
+                    if os.path.commonpath([target, source]) == source:
+                        raise ValueError("Cannot move a folder into itself")
+                    if os.path.exists(target):
+                        raise FileExistsError(f"{os.path.basename(source)} already exists in destination")
+                    shutil.move(source, target)
+                    dirs = [self.relative_dir(source), self.relative_dir(target)]
+                else:
+                    raise ValueError(f"Unknown operation: {op!r}")
+
+                with affected_lock:
+                    affected.update(dirs)
+                result['status'] = 'success'
+            except Exception as e:
+                result['status'] = 'error'
+                result['error'] = str(e)
+            if job:
+                job.record(items=1)
+            return result
+
+        if not operations:
+            return []
+        if job:
+            job.set_totals(items=len(operations))
+
+        workers = max(1, min(workers, len(operations)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as pool:
+            results = list(pool.map(run_one, range(len(operations)), operations))
+
+        self.invalidate(affected)
+        return results
+
+
+class PeerUnavailable(Exception):
+    """A peer node could not be reached or is backing off after failures"""
+
+class PeerNode:
+    """Another LocalDrive node on the LAN whose files are browsed through this one"""
+    # Headers passed through when proxying a download or stream
+    REQUEST_HEADERS = ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since')
+    RESPONSE_HEADERS = ('Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges',
+                        'Content-Disposition', 'ETag', 'Last-Modified', 'Cache-Control')
+
+    def __init__(self, name, base_url, timeout=3.0, pool_size=8, max_listings=256):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        # One keep-alive pool per node, shared by listings and proxied downloads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.lock = threading.Lock()
+        self.latency = None  # Smoothed response time in seconds
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = None
+        self.listings = OrderedDict()  # path -> (etag, payload), least recently used first
+        self.max_listings = max_listings
+        # Listing fetches run one at a time per node, so a slow node only ever ties up its own thread
+        self.fetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"peer-{name}")
+        self.pending = {}  # path -> future of the fetch already queued or running for it
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def available(self):
+        return time.monotonic() >= self.retry_at
 
-# Flask imports
-from flask import Flask, request, render_template, send_from_directory, jsonify, Response
-import shutil
-import humanize
-import mimetypes
-import re
-from werkzeug.serving import make_server
-import time
+    def is_slow(self, deadline):
+        """True when the node's usual response time is past deadline, so waiting for it is pointless"""
+        with self.lock:
+            return self.latency is not None and self.latency > deadline
 
-# Register signal handlers for clean shutdown globally
-def setup_signal_handlers():
-    def signal_handler(sig, frame):
-        print("\nShutting down server...")
-        sys.exit(0)
-        
-    # Register signal handler for clean shutdown
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    def record(self, elapsed=None, error=None):
+        with self.lock:
+            if error is None:
+                # Exponentially weighted so one slow reply doesn't define the node
+                self.latency = elapsed if self.latency is None else 0.7 * self.latency + 0.3 * elapsed
+                self.failures = 0
+                self.retry_at = 0.0
+                self.last_error = None
+            else:
+                self.failures += 1
+                self.retry_at = time.monotonic() + min(60, 2 ** self.failures)
+                self.last_error = str(error)
 
-# Set up signal handlers when imported
-setup_signal_handlers()
+    def cached_listing(self, path):
+        with self.lock:
+            entry = self.listings.get(normalize_rel_path(path))
+            return entry[1] if entry else None
+
+    def fetch_listing(self, path):
+        """Listing of a folder on the peer, revalidated against the cached copy"""
+        if not self.available():
+            raise PeerUnavailable(f"{self.name} is unavailable: {self.last_error}")
+        path = normalize_rel_path(path)
+        with self.lock:
+            entry = self.listings.get(path)
+        headers = {'If-None-Match': entry[0]} if entry and entry[0] else {}
+
+        started = time.monotonic()
+        try:
+            response = self.session.get(self.url('/api/list'), params={'path': path},
+                                        headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry:
+                payload = entry[1]
+            else:
+                response.raise_for_status()
+                payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.record(error=e)
+            raise PeerUnavailable(f"{self.name} is unavailable: {e}") from e
+        self.record(elapsed=time.monotonic() - started)
+
+        with self.lock:
+            self.listings[path] = (response.headers.get('ETag'), payload)
+            self.listings.move_to_end(path)
+            while len(self.listings) > self.max_listings:
+                self.listings.popitem(last=False)
+        return payload
+
+    def fetch_listing_async(self, path):
+        """Future of fetch_listing(path), shared with any fetch of the same folder still outstanding"""
+        path = normalize_rel_path(path)
+        with self.lock:
+            future = self.pending.get(path)
+            if future is None:
+                future = self.fetcher.submit(self.fetch_listing, path)
+                self.pending[path] = future
+                future.add_done_callback(lambda done: self._fetched(path, done))
+        return future
+
+    def _fetched(self, path, future):
+        with self.lock:
+            if self.pending.get(path) is future:
+                del self.pending[path]
+
+    def open(self, path, headers):
+        """Start a streamed GET on the peer, forwarding range and cache headers"""
+        if not self.available():
+            raise PeerUnavailable(f"{self.name} is unavailable: {self.last_error}")
+        forwarded = {key: headers[key] for key in self.REQUEST_HEADERS if key in headers}
+        started = time.monotonic()
+        try:
+            response = self.session.get(self.url(quote(path)), headers=forwarded,
+                                        stream=True, timeout=(self.timeout, 30))
+        except requests.RequestException as e:
+            self.record(error=e)
+            raise PeerUnavailable(f"{self.name} is unavailable: {e}") from e
+        self.record(elapsed=time.monotonic() - started)
+        return response
+
+    def status(self):
+        with self.lock:
+            return {
+                'name': self.name,
+                'url': self.base_url,
+                'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+                'failures': self.failures,
+                'available': time.monotonic() >= self.retry_at,
+                'error': self.last_error,
+                'prefix': f"/peer/{self.name}",
+            }
+
+    def close(self):
+        self.fetcher.shutdown(wait=False)
+        self.session.close()
+
+class PeerRegistry:
+    """Peer nodes plus the deadline-bounded fan-out used by aggregated views"""
+    def __init__(self, timeout=3.0, deadline=1.5):
+        self.peers = OrderedDict()
+        self.lock = threading.Lock()
+        self.timeout = timeout
+        self.deadline = deadline  # Longest an aggregated view waits for any node
+
+    def add(self, url, name=None):
+        if '://' not in url:
+            url = f"http://{url}"
+        with self.lock:
+            for peer in self.peers.values():
+                if peer.base_url == url.rstrip('/'):
+                    return peer
+            name = make_root_name(name or urlparse(url).netloc.replace(':', '-'), self.peers)
+            peer = PeerNode(name, url, timeout=self.timeout)
+            self.peers[name] = peer
+        log_event(f"Browsing peer {peer.base_url} at /peer/{name}/", peer=name)
+        return peer
+
+    def remove(self, name):
+        with self.lock:
+            peer = self.peers.pop(name, None)
+        if peer:
+            peer.close()
+        return peer is not None
+
+    def get(self, name):
+        with self.lock:
+            return self.peers.get(name)
+
+    def list(self):
+        with self.lock:
+            return list(self.peers.values())
+
+    def listing(self, peer, path):
+        """One peer's listing; past the deadline the cached copy is served instead"""
+        return self.aggregate(path, [peer])[peer.name]
+
+    def aggregate(self, path, peers=None):
+        """Listings of the same folder on several peers, bounded by one shared deadline
+
+        Requests still running at the deadline keep going in the background so
+        their results warm the cache for the next view. Nodes known to answer
+        slower than the deadline aren't waited for when a cached copy exists,
+        and nodes backing off after failures aren't asked at all.
+        """
+        peers = self.list() if peers is None else peers
+        futures = {}
+        for peer in peers:
+            if peer.available():
+                futures[peer.name] = peer.fetch_listing_async(path)
+            else:
+                futures[peer.name] = future = Future()
+                future.set_exception(PeerUnavailable(f"{peer.name} is unavailable: {peer.last_error}"))
+        waited = [futures[peer.name] for peer in peers
+                  if not (peer.is_slow(self.deadline) and peer.cached_listing(path) is not None)]
+        wait_futures(waited, timeout=self.deadline)
+
+        results = {}
+        for peer in peers:
+            future = futures[peer.name]
+            if future.done() and future.exception() is None:
+                results[peer.name] = {'status': 'ok', 'stale': False, **future.result()}
+                continue
+            error = str(future.exception()) if future.done() else f"{peer.name} is slow to respond"
+            cached = peer.cached_listing(path)
+            if cached is not None:
+                results[peer.name] = {'status': 'stale', 'stale': True, 'error': error, **cached}
+            else:
+                results[peer.name] = {'status': 'unavailable', 'stale': False, 'error': error,
+                                      'path': normalize_rel_path(path), 'items': []}
+        return results
+
+    def shutdown(self):
+        for peer in self.list():
+            peer.close()
+
+
+class MirrorTask:
+    """One-way incremental mirror of a folder on another node into a local share
+
+    Each run compares the source's manifest with the local one and only pulls
+    files that are new or changed, in parallel ranged requests over pooled
+    connections. Files are written to a hidden part file next to the target
+    with a small progress record, so an interrupted run picks up where it
+    stopped; resumed ranges are sent with If-Range, so a file that changed
+    meanwhile starts over instead of being stitched from two versions. Files
+    that vanished from the source are deleted locally unless delete=False,
+    but a run that would empty the mirror or remove more than half of it is
+    held back, since that is far more often a wrong or half-mounted source
+    folder than a real deletion.
+    """
+    PART_PREFIX = '.'
+    PART_SUFFIX = '.ldpart'
+    MASS_DELETE_FRACTION = 0.5  # Deleting more of the local files than this is held back
+    MASS_DELETE_MIN = 10        # ...unless it is only a handful of files
+
+    def __init__(self, source_url, root, rel_dir='', delete=True, interval=None,
+                 workers=4, chunk_size=8 * 1024 * 1024, timeout=10.0):
+        if '://' not in source_url:
+            source_url = f"http://{source_url}"
+        self.id = uuid.uuid4().hex[:12]
+        self.source_url = source_url.rstrip('/')
+        self.root = root
+        self.rel_dir = normalize_rel_path(rel_dir)
+        self.delete = delete
+        self.interval = interval  # Seconds between runs, None for a one-off mirror
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers * 2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stop_event = Event()
+        self.last_job_id = None
+        self.last_result = None
+        self.last_synced = None  # Local time the manifest of the last complete run was fetched
+        self.held_deletes = 0    # Deletions the last plan refused as a likely mass deletion
+
+    def part_paths(self, rel_path):
+        head, _, name = rel_path.rpartition('/')
+        part_rel = f"{head}/{self.PART_PREFIX}{name}{self.PART_SUFFIX}" if head else f"{self.PART_PREFIX}{name}{self.PART_SUFFIX}"
+        part_path = self.root.resolve_path(part_rel)
+        return part_path, part_path + '.json'
+
+    def plan(self, remote):
+        """Split the source manifest into files to fetch, touch and delete"""
+        local = self.root.manifest(self.rel_dir)
+        local_files = {path: (size, mtime_ns) for path, size, mtime_ns in local['files']}
+        remote_paths = set()
+        fetch, same_size = [], []
+        for path, size, mtime_ns in remote['files']:
+            remote_paths.add(path)
+            current = local_files.get(path)
+            if current == (size, mtime_ns):
+                continue
+            # Same size but a different mtime is usually a touched file; check hashes first
+            (same_size if current and current[0] == size else fetch).append((path, size, mtime_ns))
+
+        touch = []
+        if same_size:
+            response = self.session.post(f"{self.source_url}/api/manifest/hashes",
+                                         json={'paths': [path for path, _, _ in same_size]},
+                                         timeout=self.timeout)
+            response.raise_for_status()
+            remote_hashes = response.json().get('hashes', {})
+            for path, size, mtime_ns in same_size:
+                try:
+                    unchanged = remote_hashes.get(path) == self.root.file_hash(path)
+                except OSError:
+                    unchanged = False
+                (touch if unchanged else fetch).append((path, size, mtime_ns))
+
+        delete_files, delete_dirs = [], []
+        self.held_deletes = 0
+        if self.delete:
+            delete_files = [path for path in local_files if path not in remote_paths]
+            if delete_files and (not remote_paths or len(delete_files) > max(
+                    self.MASS_DELETE_MIN, len(local_files) * self.MASS_DELETE_FRACTION)):
+                self.held_deletes = len(delete_files)
+                return fetch, touch, [], []
+            remote_dirs = set(remote['dirs'])
+            # Deepest first so parents are empty by the time they are removed
+            delete_dirs = sorted((d for d in local['dirs'] if d not in remote_dirs),
+                                 key=lambda d: d.count('/'), reverse=True)
+        return fetch, touch, delete_files, delete_dirs
+
+    def _prepare_part(self, job, path, size, mtime_ns):
+        """Open or resume the part file; returns the chunk indexes still missing"""
+        part_path, state_path = self.part_paths(path)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        chunks = max(1, -(-size // self.chunk_size))
+        try:
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+            if (state.get('size'), state.get('mtime_ns'), state.get('chunk_size')) != (size, mtime_ns, self.chunk_size) \
+                    or not os.path.exists(part_path):
+                raise ValueError("stale part file")
+            done = set(state.get('done', []))
+        except (OSError, ValueError):
+            state = {'size': size, 'mtime_ns': mtime_ns, 'chunk_size': self.chunk_size, 'done': []}
+            done = set()
+            with open(part_path, 'wb') as f:
+                f.truncate(size)
+            with open(state_path, 'w') as f:
+                json.dump(state, f)
+        if done:
+            resumed = sum(min(self.chunk_size, size - index * self.chunk_size) for index in done)
+            job.record(bytes=resumed)
+        return {'path': path, 'size': size, 'mtime_ns': mtime_ns, 'part': part_path, 'state': state_path,
+                'done': done, 'missing': [i for i in range(chunks) if i not in done], 'etag': state.get('etag'),
+                'lock': threading.Lock(), 'error': None, 'restart': False}
+
+    def _save_state(self, pull):
+        with open(pull['state'], 'w') as f:
+            json.dump({'size': pull['size'], 'mtime_ns': pull['mtime_ns'], 'chunk_size': self.chunk_size,
+                       'etag': pull['etag'], 'done': sorted(pull['done'])}, f)
+
+    def _discard(self, pull):
+        """Drop a part file and its progress, so the next run fetches the file from the start"""
+        for path in (pull['part'], pull['state']):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _fetch_chunk(self, job, pull, index):
+        start = index * self.chunk_size
+        end = min(pull['size'], start + self.chunk_size) - 1
+        if end < start:
+            return pull
+        # Only bytes of the version the part file holds are wanted: the ETag once one has been seen,
+        # the manifest's mtime before that. A changed file comes back whole, with a 200.
+        with pull['lock']:
+            validator = pull['etag'] or http_date(pull['mtime_ns'] / 1e9)
+        response = self.session.get(f"{self.source_url}/download/{quote(pull['path'])}",
+                                    headers={'Range': f"bytes={start}-{end}", 'If-Range': validator},
+                                    stream=True, timeout=(self.timeout, 60))
+        try:
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            etag = response.headers.get('ETag')
+            with pull['lock']:
+                if etag and not etag.startswith('W/') and pull['etag'] is None:
+                    pull['etag'] = etag
+                changed = response.status_code == 200 or (etag and pull['etag'] and etag != pull['etag'])
+                if changed:
+                    pull['restart'] = True
+            if changed:
+                raise IOError(f"{pull['path']} changed on the source, it is fetched again from the start next run")
+            if response.status_code != 206 or total != str(pull['size']):
+                raise IOError(f"{pull['path']} changed on the source (HTTP {response.status_code})")
+            with open(pull['part'], 'r+b') as f:
+                f.seek(start)
+                for block in response.iter_content(chunk_size=256 * 1024):
+                    f.write(block)
+                    job.add_progress(bytes=len(block))
+        finally:
+            response.close()
+
+        with pull['lock']:
+            pull['done'].add(index)
+            self._save_state(pull)
+        return pull
+
+    def _finish(self, pull):
+        target = self.root.resolve_path(pull['path'])
+        if os.path.isdir(target) and not os.path.islink(target):
+            shutil.rmtree(target)
+        os.replace(pull['part'], target)
+        os.utime(target, ns=(pull['mtime_ns'], pull['mtime_ns']))
+        try:
+            os.remove(pull['state'])
+        except OSError:
+            pass
+
+    def run(self, job):
+        # Lag is measured on this machine's clock; the source's may not agree with it
+        manifest_at = time.time()
+        response = self.session.get(f"{self.source_url}/api/manifest", params={'path': self.rel_dir},
+                                    timeout=max(self.timeout, 60))
+        response.raise_for_status()
+        remote = response.json()
+        fetch, touch, delete_files, delete_dirs = self.plan(remote)
+        if self.held_deletes:
+            log_event(f"Mirror of {self.source_url} would delete {self.held_deletes} files; "
+                      "holding them back as a likely wrong source", level='warning', mirror=self.id)
+        job.set_totals(items=len(fetch) + len(touch) + len(delete_files),
+                       bytes=sum(size for _, size, _ in fetch))
+
+        affected = set()
+        for rel_dir in remote['dirs']:
+            if not os.path.isdir(self.root.resolve_path(rel_dir)):
+                os.makedirs(self.root.resolve_path(rel_dir), exist_ok=True)
+                affected.add(rel_dir.rpartition('/')[0])
+
+        for path, size, mtime_ns in touch:
+            os.utime(self.root.resolve_path(path), ns=(mtime_ns, mtime_ns))
+            job.record(items=1)
+
+        # Every missing chunk of every file goes into one pool, so small and
+        # large files alike keep all connections busy
+        errors = []
+        fetched = 0
+        pulls = [self._prepare_part(job, *entry) for entry in fetch]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='mirror') as pool:
+            futures = {}
+            for pull in pulls:
+                if not pull['missing']:
+                    futures[pool.submit(lambda p=pull: p)] = pull
+                for index in pull['missing']:
+                    futures[pool.submit(self._fetch_chunk, job, pull, index)] = pull
+            remaining = {id(pull): len(pull['missing']) or 1 for pull in pulls}
+            try:
+                for future in as_completed(futures):
+                    pull = futures[future]
+                    try:
+                        future.result()
+                    except JobCancelled:
+                        raise
+                    except Exception as e:
+                        pull['error'] = pull['error'] or str(e)
+                    remaining[id(pull)] -= 1
+                    if remaining[id(pull)]:
+                        continue
+                    if pull['error']:
+                        errors.append({'path': pull['path'], 'error': pull['error']})
+                        if pull['restart']:
+                            self._discard(pull)
+                    else:
+                        self._finish(pull)
+                        fetched += 1
+                        affected.add(pull['path'].rpartition('/')[0])
+                    job.record(items=1)
+            except JobCancelled:
+                # Part files and their progress records stay behind for the next run
+                for future in futures:
+                    future.cancel()
+                raise
+
+        deleted = 0
+        for path in delete_files:
+            try:
+                os.remove(self.root.resolve_path(path))
+                deleted += 1
+                affected.add(path.rpartition('/')[0])
+            except OSError as e:
+                errors.append({'path': path, 'error': str(e)})
+            job.add_progress(items=1)
+        for rel_dir in delete_dirs:
+            shutil.rmtree(self.root.resolve_path(rel_dir), ignore_errors=True)
+            affected.add(rel_dir.rpartition('/')[0])
+
+        self.root.invalidate(affected)
+        finished = time.time()
+        if not errors:
+            self.last_synced = manifest_at
+        self.last_result = {
+            'fetched': fetched,
+            'touched': len(touch),
+            'deleted': deleted + len(delete_dirs),
+            'unchanged': len(remote['files']) - len(fetch) - len(touch),
+            'failed': len(errors),
+            'errors': errors[:20],
+            'held_deletes': self.held_deletes,
+            'bytes': job.bytes_done,
+            'bytes_per_second': job.bytes_done / max(finished - job.started, 0.001),
+            # How far behind the source the mirror was when this run finished
+            'lag_seconds': finished - manifest_at,
+        }
+        return self.last_result
+
+    def status(self):
+        return {
+            'id': self.id,
+            'source': self.source_url,
+            'root': self.root.name,
+            'path': self.rel_dir,
+            'interval': self.interval,
+            'last_job': self.last_job_id,
+            'last_result': self.last_result,
+            'lag_seconds': time.time() - self.last_synced if self.last_synced else None,
+        }
+
+    def close(self):
+        self.stop_event.set()
+        self.session.close()
+
+
+class AssetBundle:
+    """Front-end files built into static/dist by build_assets.py
+
+    Their names carry a content hash, looked up in the build's manifest, so
+    pages can link them with long cache lifetimes. Small files such as the
+    critical CSS are read once and pasted into the page instead.
+    """
+    def __init__(self, static_folder):
+        self.dist = os.path.join(static_folder, 'dist')
+        self.inlined = {}
+        try:
+            with open(os.path.join(self.dist, 'manifest.json'), encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+            print("Front-end assets are missing from static/dist, run build_assets.py")
+
+    def url(self, name):
+        return f"/static/dist/{self.manifest.get(name, name)}"
+
+    def inline(self, name):
+        if name not in self.inlined:
+            try:
+                with open(os.path.join(self.dist, self.manifest.get(name, name)), encoding='utf-8') as f:
+                    self.inlined[name] = Markup(f.read())
+            except OSError:
+                self.inlined[name] = Markup('')
+        return self.inlined[name]
 
 # Flask server class to manage the server in the same process
 class FlaskServerThread:
-    def __init__(self, upload_folder='.'):
-        self.upload_folder = os.path.abspath(upload_folder)
+    def __init__(self, upload_folder='.', block_cache_mb=64, catalog_dir=None, access_log_path=None):
         self.server = None
         self.ctx = None
         self.app = None
         self.thread = None
+        self.host = '0.0.0.0'
+        self.port = 5000
         self.shutdown_event = Event()  # Event to signal shutdown
+        self.start_error = None
+        # JSON-lines request log, None keeps Werkzeug's plain stderr line instead
+        self.access_log = AccessLog(access_log_path, sample_rates={
+            '/stream/<path:filename>': 0.1,
+            '/peer/<node>/stream/<path:filename>': 0.1,
+            '/api/text/<path:filename>': 0.2,
+            '/api/archive/get': 0.2,
+        }) if access_log_path else None
+        if self.access_log:
+            AccessLog.active = self.access_log
+        self.roots = OrderedDict()  # name -> ShareRoot, the first one is the default
+        self.roots_lock = threading.Lock()
+        self.catalog_dir = catalog_dir  # Where share catalogs persist between runs, None keeps them off
+        self.ignore_patterns = list(DEFAULT_IGNORE_PATTERNS)  # Each share can add more in its .localdriveignore
+        self.default_root = self.add_root(upload_folder)
+        self.block_cache = BlockCache(budget_bytes=int(block_cache_mb * 1024 * 1024))
+        self.batch_workers = 8  # Upper bound for parallel batch operations
+        self.copy_workers = 4   # Parallel file copies within one copy job
+        self.upload_concurrency = 3  # Files each browser uploads in parallel
+        self.admission = AdmissionController()
+        self.transfers = TransferRegistry()
+        self.network_profile = network_profile('lan')  # Applied when the server (re)starts
+        self.jobs = JobManager()
+        self.peers = PeerRegistry()  # Other LocalDrive nodes browsed through this one
+        self.peer_redirect = False   # Send peer downloads straight to the owning node instead of proxying
+        self.mirrors = OrderedDict()  # id -> MirrorTask pulling another node into a local share
+        self.line_indexes = LineIndexCache()  # Text preview paging
+        self.archive_indexes = ArchiveIndexCache()  # Browsing inside ZIP/TAR files
+        self.media = MediaIndex()  # Duration, resolution, camera and the like, read in the background
         self.setup_app()
 
+    @property
+    def upload_folder(self):
+        """Folder of the default share, served at /"""
+        return self.default_root.path
+
+    def add_root(self, folder_path, name=None):
+        """Share another folder under /r/<name>/; safe while the server is running"""
+        with self.roots_lock:
+            for root in self.roots.values():
+                if root.path == os.path.abspath(folder_path):
+                    return root
+            name = make_root_name(name or folder_path, self.roots)
+            root = ShareRoot(name, folder_path, self.catalog_dir, self.ignore_patterns)
+            self.roots[name] = root
+        log_event(f"Sharing {root.path} at /r/{name}/", root=name)
+        return root
+
+    def remove_root(self, name):
+        """Stop sharing a folder; the default share can be switched but not removed"""
+        with self.roots_lock:
+            root = self.roots.get(name)
+            if root is None or root is self.default_root:
+                return False
+            del self.roots[name]
+        root.close()
+        return True
+
+    def add_mirror(self, source_url, root=None, rel_dir='', delete=True, interval=None):
+        """Mirror a folder of another node into a share, once or every interval seconds"""
+        mirror = MirrorTask(source_url, root or self.default_root, rel_dir, delete, interval)
+        self.mirrors[mirror.id] = mirror
+        if interval:
+            Thread(target=self._mirror_loop, args=(mirror,), daemon=True).start()
+        else:
+            self.run_mirror(mirror)
+        return mirror
+
+    def run_mirror(self, mirror):
+        job = self.jobs.submit('mirror', f"Mirror {mirror.source_url} into {mirror.root.name}", mirror.run)
+        mirror.last_job_id = job.id
+        return job
+
+    def remove_mirror(self, mirror_id):
+        mirror = self.mirrors.pop(mirror_id, None)
+        if mirror:
+            mirror.close()
+        return mirror is not None
+
+    def _mirror_loop(self, mirror):
+        while not mirror.stop_event.is_set():
+            job = self.run_mirror(mirror)
+            while job.is_active() and not mirror.stop_event.wait(1):
+                pass
+            mirror.stop_event.wait(mirror.interval)
+
+    def set_ignore_patterns(self, patterns):
+        """Replace the base ignore rules of every share"""
+        self.ignore_patterns = list(patterns)
+        for root in self.list_roots():
+            root.set_ignore_patterns(self.ignore_patterns)
+
+    def get_root(self, name):
+        with self.roots_lock:
+            return self.roots.get(name)
+
+    def list_roots(self):
+        with self.roots_lock:
+            return list(self.roots.values())
+
     def setup_app(self):
         # Determine if we're running as a PyInstaller bundle
         if getattr(sys, 'frozen', False):
@@ -85,163 +3866,879 @@ class FlaskServerThread:
             self.app = Flask(__name__)
 
         self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.assets = AssetBundle(self.app.static_folder)
+
+        # Every share is reachable under /r/<name>/, and the default one also at /
+        def share_route(rule, **options):
+            def decorator(func):
+                self.app.add_url_rule(rule, func.__name__, func, **options)
+                self.app.add_url_rule(f'/r/<root>{rule}', func.__name__, func, **options)
+                return func
+            return decorator
+
+        @self.app.url_value_preprocessor
+        def pick_root(endpoint, values):
+            g.root_name = values.pop('root', None) if values else None
+
+        def current_root():
+            if g.get('root_name') is None:
+                return self.default_root
+            root = self.get_root(g.root_name)
+            if root is None:
+                abort(404)
+            return root
+
+        @self.app.context_processor
+        def share_context():
+            root = current_root() if request else self.default_root
+            prefix = '' if root is self.default_root else f'/r/{root.name}'
+            return {'root_prefix': prefix, 'root_name': root.name, 'roots': self.list_roots(),
+                    'peers': self.peers.list(), 'peer_name': None, 'read_only': False,
+                    'asset_url': self.assets.url, 'inline_asset': self.assets.inline,
+                    'media_caption': media_caption}
+
+        @self.app.after_request
+        def cache_assets(response):
+            # Built files have their content hash in the name, so they never change under a URL
+            if request.path.startswith('/static/dist/') and response.status_code == 200:
+                response.cache_control.public = True
+                response.cache_control.max_age = 365 * 24 * 3600
+                response.cache_control.immutable = True
+                response.cache_control.no_cache = None
+            return response
+        
+        @self.app.before_request
+        def start_timer():
+            g.request_started = time.perf_counter()
+
+        @self.app.after_request
+        def log_access(response):
+            if not self.access_log:
+                return response
+            rule = request.url_rule.rule if request.url_rule else None
+            if rule and rule.startswith('/r/<root>'):
+                rule = rule[len('/r/<root>'):]
+            rate = self.access_log.sample_rate(rule, response.status_code)
+            if not rate:
+                return response
+            record = {
+                'type': 'access',
+                'time': datetime.now().isoformat(timespec='milliseconds'),
+                'method': request.method,
+                'route': rule,
+                'path': request.path,
+                'status': response.status_code,
+                'client': request.remote_addr,
+                'root': g.get('root_name'),
+                'range': request.headers.get('Range'),
+            }
+            if rate < 1:
+                record['sample_rate'] = rate
+            started = g.get('request_started', time.perf_counter())
+
+            def finish(sent):
+                record['bytes'] = sent
+                record['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+                self.access_log.log(record)
+
+            if response.is_streamed:
+                # Count what actually went out and log once the client has it (or went away)
+                sent = [0]
+
+                def count(chunk):
+                    sent[0] += len(chunk)
+                response.response = ClosingBody(response.response, lambda: finish(sent[0]), on_chunk=count)
+            else:
+                response.call_on_close(lambda: finish(response.content_length or 0))
+            return response
+
+        @self.app.route('/api/log/stats')
+        def access_log_stats():
+            if not self.access_log:
+                return jsonify({'enabled': False})
+            return jsonify(dict(self.access_log.stats(), enabled=True))
+
+        # Endpoints that hold a transfer slot for as long as their body is being sent
+        transfer_classes = {
+            'stream_file': 'stream', 'peer_stream': 'stream',
+            'download_file': 'download', 'peer_download': 'download',
+            'upload_file': 'upload',
+            'archive_list': 'archive', 'archive_get': 'archive',
+            'text_preview': 'text',
+            'get_item_details': 'details',
+        }
+
+        @self.app.before_request
+        def admit_transfer():
+            name = transfer_classes.get(request.endpoint)
+            if name is None:
+                return None
+            if not self.admission.acquire(name):
+                retry = self.admission.retry_after(name)
+                if request.accept_mimetypes.accept_html and not request.accept_mimetypes.accept_json:
+                    # A plain link or address bar, so let the page retry by itself
+                    body = render_template_string(BUSY_PAGE, retry=retry)
+                    response = Response(body, 503, mimetype='text/html')
+                else:
+                    response = jsonify({'status': 'error', 'error': 'Server busy, try again shortly',
+                                        'retry_after': retry})
+                    response.status_code = 503
+                response.headers['Retry-After'] = str(retry)
+                return response
+            g.transfer_class = name
+
+        @self.app.after_request
+        def hand_off_transfer(response):
+            name = g.pop('transfer_class', None)
+            if name is None:
+                return response
+            if not response.is_streamed:
+                self.admission.release(name)
+                return response
+            # The slot stays taken until the body has been sent, the client goes away,
+            # or, for HEAD, 204 and 304, the response is closed without a body
+            response.response = ClosingBody(response.response, lambda: self.admission.release(name))
+            return response
+
+        @self.app.teardown_request
+        def release_transfer(exc):
+            # Only still set when the view failed before a response was made
+            name = g.pop('transfer_class', None)
+            if name is not None:
+                self.admission.release(name)
+
+        @self.app.route('/api/admission/stats')
+        def admission_stats():
+            return jsonify(self.admission.stats())
+
+        @self.app.route('/api/media/stats')
+        def media_stats():
+            return jsonify(self.media.stats())
+        
+        # Transfers shown live in the desktop window, by endpoint
+        tracked_transfers = {
+            'stream_file': 'stream', 'peer_stream': 'stream',
+            'download_file': 'download', 'peer_download': 'download', 'archive_get': 'download',
+            'upload_file': 'upload',
+        }
+
+        @self.app.before_request
+        def track_upload():
+            if tracked_transfers.get(request.endpoint) != 'upload':
+                return
+            # The page names the file in the query string, the form isn't parsed yet
+            transfer = self.transfers.start('upload', request.remote_addr, request.args.get('name', ''),
+                                            request.content_length)
+            request.environ['wsgi.input'] = CountingReader(request.environ['wsgi.input'], transfer)
+            g.transfer = transfer
+
+        @self.app.after_request
+        def track_download(response):
+            kind = tracked_transfers.get(request.endpoint)
+            if kind not in ('download', 'stream') or response.status_code >= 300 or not response.is_streamed:
+                return response
+            path = (request.view_args or {}).get('filename') or request.args.get('member', '')
+            transfer = self.transfers.start(kind, request.remote_addr, path, response.content_length)
+
+            def count(chunk):
+                transfer.bytes_done += len(chunk)
+            response.response = ClosingBody(response.response, lambda: self.transfers.finish(transfer),
+                                            on_chunk=count)
+            return response
+
+        @self.app.teardown_request
+        def finish_upload(exc):
+            transfer = g.pop('transfer', None)
+            if transfer is not None:
+                self.transfers.finish(transfer)
+
+        @self.app.route('/api/transfers')
+        def list_transfers():
+            return jsonify({'transfers': self.transfers.snapshot()})
         
         # Register all the routes
-        @self.app.route('/')
+        @share_route('/')
         def index():
+            root = current_root()
             path = request.args.get('path', '')
-            current_path = os.path.join(self.upload_folder, path.lstrip('/'))
+            current_path = root.resolve_path(path)
             
             if not os.path.exists(current_path):
                 os.makedirs(current_path)
-            
-            items = []
-            for item in os.listdir(current_path):
-                # Skip Python files and system files
-                if item.startswith('.') or item.endswith('.py') or item == '__pycache__' or item == 'static':
-                    continue
-                    
-                full_path = os.path.join(current_path, item)
-                items.append({
-                    'name': item,
-                    'type': 'folder' if os.path.isdir(full_path) else 'file',
-                    'path': os.path.relpath(full_path, self.upload_folder).replace('\\', '/')
-                })
-            return render_template('index.html', items=items, current_path=path)
-
-        @self.app.route('/create_folder', methods=['POST'])
+            mtime_ns = os.stat(current_path).st_mtime_ns
+
+            # The page shell goes out at once and the cards follow as the folder is read
+            started = []
+            items = self.media.annotate(root, path, iter_listing(root, path, mtime_ns, started))
+            chunks = stream_template('index.html', items=items, current_path=path,
+                                     upload_concurrency=self.upload_concurrency)
+            return Response(coalesce_chunks(chunks, started), mimetype='text/html')
+
+        def iter_listing(root, path, mtime_ns, started):
+            started.append(True)
+            items = root.cache.get_listing(path, mtime_ns)
+            if items is None and root.catalog:
+                items = root.catalog.get_listing(path, mtime_ns)
+                if items is not None:
+                    root.cache.set_listing(path, mtime_ns, items)
+            if items is not None:
+                yield from items
+                return
+            # Folders too big to keep in memory are read fresh each time instead of cached
+            collected = []
+            try:
+                for item in root.iter_directory(path):
+                    if collected is not None:
+                        collected.append(item)
+                        if len(collected) > STREAMED_LISTING_CACHE_LIMIT:
+                            collected = None
+                    yield item
+            except OSError as e:
+                # The page already went out with a 200, so the error becomes its last card
+                log_event(f"Listing {path or '/'} of {root.name} failed: {e}", level='error',
+                          root=root.name, path=path)
+                yield {'type': 'error', 'name': '', 'path': path, 'error': str(e)}
+                return  # Incomplete, so never cached
+            if collected is not None:
+                if root.catalog:
+                    root.catalog.set_listing(path, mtime_ns, collected)
+                root.cache.set_listing(path, mtime_ns, collected)
+
+        def coalesce_chunks(chunks, started, size=64 * 1024):
+            # Jinja yields tiny fragments; send them in blocks, but flush the shell before the first card
+            buffer = []
+            buffered = 0
+            shell_sent = False
+            for chunk in chunks:
+                if started and not shell_sent:
+                    shell_sent = True
+                    if buffer:
+                        yield ''.join(buffer)
+                        buffer, buffered = [], 0
+                buffer.append(chunk)
+                buffered += len(chunk)
+                if buffered >= size:
+                    yield ''.join(buffer)
+                    buffer, buffered = [], 0
+            if buffer:
+                yield ''.join(buffer)
+
+        @self.app.route('/api/roots')
+        def list_roots():
+            return jsonify({'default': self.default_root.name,
+                            'roots': [root.to_dict() for root in self.list_roots()]})
+
+        @share_route('/api/list')
+        def list_items():
+            root = current_root()
+            path = request.args.get('path', '')
+            try:
+                items = list(self.media.annotate(root, path, root.cached_listing(path)))
+            except (OSError, ValueError) as e:
+                return jsonify({'status': 'error', 'error': str(e)}), 404
+            try:
+                items = query_media(items, request.args)
+            except ValueError as e:
+                return jsonify({'status': 'error', 'error': f"Bad filter: {e}"}), 400
+            # media_pending counts files whose metadata is still being read; ask again to see it
+            response = jsonify({'path': normalize_rel_path(path), 'items': items,
+                                'media_pending': self.media.pending_in(root, path)})
+            # Lets peer nodes revalidate their cached copy with If-None-Match
+            response.add_etag()
+            return response.make_conditional(request)
+
+        @share_route('/api/events')
+        def change_events():
+            # Server-Sent Events feed of changes in the folders the client is viewing
+            root = current_root()
+            subscription = root.feed.subscribe(request.args.getlist('path') or [''])
+            root.watcher.watch(subscription.dirs)
+
+            def generate():
+                try:
+                    yield "retry: 3000\n\n"
+                    while not self.shutdown_event.is_set():
+                        if not subscription.wait(timeout=15):
+                            yield ": keep-alive\n\n"
+                            continue
+                        # Let a burst settle so it goes out as one message
+                        time.sleep(root.feed.coalesce_delay)
+                        for batch in subscription.drain():
+                            yield f"event: changes\ndata: {json.dumps(batch)}\n\n"
+                finally:
+                    root.feed.unsubscribe(subscription)
+
+            return Response(generate(), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        @share_route('/create_folder', methods=['POST'])
         def create_folder():
+            root = current_root()
             path = request.form.get('path', '')
             folder_name = request.form.get('name', '')
-            new_folder = os.path.join(self.upload_folder, path.lstrip('/'), folder_name)
+            new_folder = root.resolve_path(os.path.join(path.lstrip('/'), folder_name))
             if not os.path.exists(new_folder):
                 os.makedirs(new_folder)
+                root.invalidate([path])
             return jsonify({'status': 'success'})
 
-        @self.app.route('/rename', methods=['POST'])
+        @share_route('/rename', methods=['POST'])
         def rename_item():
-            old_path = os.path.join(self.upload_folder, request.form.get('old_path', '').lstrip('/'))
+            root = current_root()
+            old_path = root.resolve_path(request.form.get('old_path', ''))
             new_name = request.form.get('new_name', '')
-            new_path = os.path.join(os.path.dirname(old_path), new_name)
+            new_path = root.resolve_path(os.path.join(root.relative_dir(old_path), new_name))
             os.rename(old_path, new_path)
+            root.invalidate([root.relative_dir(old_path)])
             return jsonify({'status': 'success'})
 
-        @self.app.route('/delete', methods=['POST'])
+        @share_route('/delete', methods=['POST'])
         def delete_item():
-            path = os.path.join(self.upload_folder, request.form.get('path', '').lstrip('/'))
-            if os.path.isdir(path):
-                shutil.rmtree(path)
+            root = current_root()
+            path = root.resolve_path(request.form.get('path', ''))
+            if path == root.path:
+                return jsonify({'status': 'error', 'error': 'The shared folder itself cannot be deleted'}), 403
+            if is_link(path):
+                # A link to a folder is removed as a link; its target is left alone
+                remove_link(path)
+            elif os.path.isdir(path):
+                # Large folders can take minutes to remove, so do it in the background
+                def delete_job(job):
+                    try:
+                        return {'path': root.relative_path(path), 'items': delete_tree(job, path)}
+                    finally:
+                        root.invalidate([root.relative_dir(path)])
+
+                job = self.jobs.submit('delete', f"Delete {os.path.basename(path)}", delete_job)
+                return jsonify({'status': 'accepted', 'job_id': job.id}), 202
             else:
                 os.remove(path)
+            root.invalidate([root.relative_dir(path)])
+            return jsonify({'status': 'success'})
+
+        @share_route('/api/batch', methods=['POST'])
+        def batch_operations():
+            root = current_root()
+            payload = request.get_json(silent=True) or {}
+            operations = payload.get('operations')
+            if not isinstance(operations, list):
+                return jsonify({'status': 'error', 'error': 'Expected a list of operations'}), 400
+
+            if payload.get('background'):
+                job = self.jobs.submit('batch', f"{len(operations)} operations",
+                                       lambda job: summarize_batch(root.run_batch(operations, job, self.batch_workers)))
+                return jsonify({'status': 'accepted', 'job_id': job.id}), 202
+
+            return jsonify(summarize_batch(root.run_batch(operations, workers=self.batch_workers)))
+
+        def summarize_batch(results):
+            failed = sum(1 for result in results if result['status'] != 'success')
+            return {
+                'status': 'success' if not failed else ('error' if failed == len(results) else 'partial'),
+                'succeeded': len(results) - failed,
+                'failed': failed,
+                'results': results
+            }
+
+        def transfer_request(kind):
+            root = current_root()
+            payload = request.get_json(silent=True) or {}
+            paths = payload.get('paths') or []
+            if not isinstance(paths, list) or not paths:
+                return jsonify({'status': 'error', 'error': 'Expected a list of paths'}), 400
+            try:
+                sources = [root.resolve_path(path) for path in paths]
+                dest_dir = root.resolve_path(payload.get('dest', ''))
+            except ValueError as e:
+                return jsonify({'status': 'error', 'error': str(e)}), 403
+            if not os.path.isdir(dest_dir):
+                return jsonify({'status': 'error', 'error': 'Destination is not a folder'}), 400
+            missing = [path for path, source in zip(paths, sources)
+                       if source == root.path or not os.path.lexists(source)]
+            if missing:
+                return jsonify({'status': 'error', 'error': f"Cannot {kind}: {', '.join(missing)}"}), 404
+
+            affected = [root.relative_path(dest_dir)]
+            if kind == 'move':
+                affected += [root.relative_dir(source) for source in sources]
+            func = copy_items if kind == 'copy' else move_items
+
+            def transfer_job(job):
+                try:
+                    return {'items': func(job, sources, dest_dir, self.copy_workers)}
+                finally:
+                    root.invalidate(affected)
+
+            name = os.path.basename(sources[0]) if len(sources) == 1 else f"{len(sources)} items"
+            job = self.jobs.submit(kind, f"{kind.capitalize()} {name}", transfer_job)
+            return jsonify({'status': 'accepted', 'job_id': job.id}), 202
+
+        @share_route('/api/copy', methods=['POST'])
+        def copy_request():
+            return transfer_request('copy')
+
+        @share_route('/api/move', methods=['POST'])
+        def move_request():
+            return transfer_request('move')
+
+        @self.app.route('/api/jobs')
+        def list_jobs():
+            active_only = request.args.get('active', '') in ('1', 'true')
+            return jsonify({'jobs': [job.to_dict() for job in self.jobs.list(active_only)]})
+
+        @self.app.route('/api/jobs/<job_id>')
+        def get_job(job_id):
+            job = self.jobs.get(job_id)
+            if not job:
+                return jsonify({'status': 'error', 'error': 'Unknown job'}), 404
+            return jsonify(job.to_dict())
+
+        @self.app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+        def cancel_job(job_id):
+            if not self.jobs.cancel(job_id):
+                return jsonify({'status': 'error', 'error': 'Job is not running'}), 409
             return jsonify({'status': 'success'})
 
-        @self.app.route('/upload', methods=['POST'])
+        @self.app.route('/api/jobs/<job_id>/events')
+        def job_events(job_id):
+            job = self.jobs.get(job_id)
+            if not job:
+                return jsonify({'status': 'error', 'error': 'Unknown job'}), 404
+
+            # Server-Sent Events: push a snapshot whenever the job changes,
+            # at most a few times per second, until it finishes
+            def generate():
+                version = -1
+                while not self.shutdown_event.is_set():
+                    if job.version != version:
+                        version = job.version
+                        yield f"data: {json.dumps(job.to_dict())}\n\n"
+                        if not job.is_active():
+                            break
+                        time.sleep(0.25)
+                    elif self.jobs.wait_for_update(job, version) == version:
+                        yield ": keep-alive\n\n"
+
+            return Response(generate(), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        @share_route('/api/upload/prepare', methods=['POST'])
+        def prepare_upload():
+            # Create every folder of a folder upload in one go, before the files arrive
+            root = current_root()
+            data = request.get_json(silent=True) or {}
+            base = normalize_rel_path(data.get('path', ''))
+            created = []
+            try:
+                for rel_dir in sorted({normalize_rel_path(d) for d in data.get('dirs', [])}):
+                    full_path = root.resolve_path(f"{base}/{rel_dir}" if base else rel_dir)
+                    if not os.path.isdir(full_path):
+                        os.makedirs(full_path, exist_ok=True)
+                        created.append(rel_dir)
+            except ValueError:
+                return jsonify({'status': 'error', 'error': 'Invalid upload path'}), 403
+            except OSError as e:
+                return jsonify({'status': 'error', 'error': str(e)}), 500
+            if created:
+                root.invalidate([base] + [f"{base}/{d}".strip('/').rpartition('/')[0] for d in created])
+            return jsonify({'status': 'success', 'created': len(created)})
+
+        @share_route('/upload', methods=['POST'])
         def upload_file():
-            if 'file' not in request.files:
+            root = current_root()
+            files = [f for f in request.files.getlist('file') if f.filename]
+            if not files:
                 return 'No file selected'
-            file = request.files['file']
-            if file.filename == '':
-                return 'No file selected'
-            
+            # Folder uploads send each file's folder inside the upload, in the same order
+            relative_dirs = request.form.getlist('relative_path')
+
             # Get current path and create full upload path
             current_path = request.form.get('path', '').lstrip('/')
-            upload_path = os.path.join(self.app.config['UPLOAD_FOLDER'], current_path)
-            
-            # Ensure the directory exists
-            if not os.path.exists(upload_path):
-                os.makedirs(upload_path)
-            
-            if file:
-                filename = file.filename
-                file.save(os.path.join(upload_path, filename))
-                return 'File uploaded successfully'
+            affected = set()
+            for position, file in enumerate(files):
+                relative_dir = normalize_rel_path(relative_dirs[position]) if position < len(relative_dirs) else ''
+                target_dir = normalize_rel_path(os.path.join(current_path, relative_dir))
+                try:
+                    upload_path = root.resolve_path(target_dir)
+                    target = root.resolve_path(os.path.join(target_dir, os.path.basename(file.filename)))
+                except ValueError:
+                    return 'Invalid upload path', 403
 
-        @self.app.route('/download/<path:filename>')
-        def download_file(filename):
-            # Ensure the file path is correct and secure
-            safe_path = os.path.join(self.app.config['UPLOAD_FOLDER'], filename)
+                # Ensure the directory exists
+                if not os.path.exists(upload_path):
+                    os.makedirs(upload_path, exist_ok=True)
+                file.save(target)
+                affected.add(target_dir)
+
+            # Parallel uploads of many small files share one invalidation
+            root.invalidate_soon(affected)
+            return 'File uploaded successfully'
+
+        def parse_range(range_header, file_size):
+            """Return (start, end) for a single bytes range, or None when absent"""
+            if not range_header:
+                return None
+            match = re.search(r'bytes=(\d*)-(\d*)', range_header)
+            if not match or not any(match.groups()):
+                return None
+            first, last = match.groups()
+            if not first:
+                # Suffix range: the last N bytes
+                start = max(0, file_size - int(last))
+                end = file_size - 1
+            else:
+                start = int(first)
+                end = min(int(last), file_size - 1) if last else file_size - 1
+            if start >= file_size or start > end:
+                raise ValueError("Unsatisfiable range")
+            return start, end
+
+        def if_range_matches(if_range, etag, mtime):
+            """True when an If-Range validator still names this version of the file"""
+            if if_range.startswith(('"', 'W/')):
+                return if_range == etag  # Strong comparison, so a weak tag never matches
+            date = parse_date(if_range)
+            return date is not None and int(date.timestamp()) == int(mtime)
+
+        def send_file_range(path, always_partial=False):
+            """Serve a file through the block cache, honouring Range and conditional requests"""
+            stats = os.stat(path)
+            file_size = stats.st_size
+            etag = f'"{stats.st_mtime_ns:x}-{file_size:x}"'
+            range_header = request.headers.get('Range')
+            if_range = request.headers.get('If-Range')
+            if range_header and if_range and not if_range_matches(if_range, etag, stats.st_mtime):
+                range_header = None  # The client holds part of another version: send all of this one
             try:
-                directory = os.path.dirname(safe_path)
-                file_name = os.path.basename(safe_path)
-                return send_from_directory(directory, file_name)
-            except:
-                return "File not found", 404
+                byte_range = parse_range(range_header, file_size)
+            except ValueError:
+                return Response(status=416, headers={'Content-Range': f'bytes */{file_size}'})
+            if byte_range is None and always_partial and file_size:
+                byte_range = (0, file_size - 1)
 
-        @self.app.route('/stream/<path:filename>')
-        def stream_file(filename):
-            path = os.path.join(self.app.config['UPLOAD_FOLDER'], filename)
-            
-            # Get file size
-            file_size = os.path.getsize(path)
-            
-            # Parse range header
-            range_header = request.headers.get('Range', None)
-            byte1, byte2 = 0, None
-            
-            if range_header:
-                match = re.search(r'(\d+)-(\d*)', range_header)
-                groups = match.groups()
-                
-                if groups[0]: byte1 = int(groups[0])
-                if groups[1]: byte2 = int(groups[1])
-            
-            # Calculate chunk length
-            if byte2 is None:
-                byte2 = file_size - 1
-            length = byte2 - byte1 + 1
-            
             # Get content type
             content_type, _ = mimetypes.guess_type(path)
             if not content_type:
                 content_type = 'application/octet-stream'
-            
-            # Create response
-            def generate():
+
+            headers = {
+                'Content-Type': content_type,
+                'Accept-Ranges': 'bytes',
+                'Last-Modified': http_date(stats.st_mtime),
+                'ETag': etag,
+            }
+            if byte_range:
+                start, end = byte_range
+                headers['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+                status = 206
+            else:
+                start, end = 0, file_size - 1
+                status = 200
+            length = end - start + 1
+            headers['Content-Length'] = length
+
+            response = Response(self.block_cache.read(path, start, length), status, headers,
+                                direct_passthrough=True)
+            # If-None-Match and If-Modified-Since turn this into a 304 before any block is read
+            return response.make_conditional(request)
+
+        @share_route('/download/<path:filename>')
+        def download_file(filename):
+            # Ensure the file path is correct and secure
+            try:
+                path = current_root().resolve_path(filename)
+                if not os.path.isfile(path):
+                    raise FileNotFoundError(filename)
+                return send_file_range(path)
+            except (OSError, ValueError):
+                return "File not found", 404
+
+        @share_route('/stream/<path:filename>')
+        def stream_file(filename):
+            try:
+                path = current_root().resolve_path(filename)
+                if not os.path.isfile(path):
+                    raise FileNotFoundError(filename)
+            except (OSError, ValueError):
+                return "File not found", 404
+            # Video players expect a partial response even for the first request
+            return send_file_range(path, always_partial=True)
+
+        @share_route('/api/text/<path:filename>')
+        def text_preview(filename):
+            # Pages of a text file without downloading it: ?start=&count=, ?tail=N or ?follow=<offset>
+            try:
+                path = current_root().resolve_path(filename)
                 with open(path, 'rb') as f:
-                    f.seek(byte1)
-                    remaining = length
-                    chunk_size = 8192  # 8KB chunks
-                    
-                    while remaining:
-                        chunk_size = min(chunk_size, remaining)
-                        data = f.read(chunk_size)
-                        if not data:
-                            break
-                        remaining -= len(data)
-                        yield data
-            
+                    if b'\0' in f.read(8192):
+                        return jsonify({'status': 'error', 'error': 'Not a text file'}), 415
+            except (OSError, ValueError):
+                return jsonify({'status': 'error', 'error': 'File not found'}), 404
+
+            index, size = self.line_indexes.get(path)
+            if size is None:
+                # A large file seen for the first time; the page polls until the index is ready
+                response = jsonify({'status': 'indexing', 'indexed': index.scanned,
+                                    'size': os.path.getsize(path)})
+                response.status_code = 202
+                response.headers['Retry-After'] = '1'
+                return response
+            if 'follow' in request.args:
+                offset = request.args.get('follow', 0, type=int)
+                reset = offset > size
+                lines, next_offset = index.read_from(0 if reset else offset)
+                # Line numbers are only known when the read caught up with the index
+                first_line = index.lines - len(lines) if next_offset == index.last_line_start else None
+                return jsonify({'lines': [text for text, _ in lines], 'next_offset': next_offset,
+                                'first_line': first_line, 'reset': reset, 'size': size,
+                                'total_lines': index.total_lines()})
+
+            total = index.total_lines()
+            count = max(0, min(request.args.get('count', request.args.get('tail', 200, type=int), type=int), 1000))
+            if 'tail' in request.args:
+                start = max(0, total - count)
+            else:
+                start = max(0, request.args.get('start', 0, type=int))
+            lines = index.read_lines(start, count)
+            return jsonify({
+                'start': start,
+                'lines': [text for text, _ in lines],
+                'truncated': [i for i, (_, cut) in enumerate(lines) if cut],
+                'total_lines': total,
+                'size': size,
+                # Follow mode resumes here; a last line still being written is sent again once complete
+                'next_offset': index.last_line_start,
+            })
+
+        def open_archive():
+            root = current_root()
+            path = root.resolve_path(request.args.get('path', ''))
+            if not os.path.isfile(path):
+                raise FileNotFoundError(request.args.get('path', ''))
+            return self.archive_indexes.get(path)
+
+        @share_route('/api/archive/list')
+        def archive_list():
+            try:
+                index = open_archive()
+            except (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+                return jsonify({'status': 'error', 'error': str(e)}), 404
+            prefix = normalize_rel_path(request.args.get('prefix', ''))
+            return jsonify({'path': request.args.get('path', ''), 'type': index.kind, 'prefix': prefix,
+                            'members': len(index.members), 'entries': index.list(prefix)})
+
+        @share_route('/api/archive/get')
+        def archive_get():
+            member = request.args.get('member', '')
+            try:
+                index = open_archive()
+                entry = index.members[member]
+            except KeyError:
+                return jsonify({'status': 'error', 'error': 'No such member'}), 404
+            except (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+                return jsonify({'status': 'error', 'error': str(e)}), 404
+            if entry['type'] != 'file':
+                return jsonify({'status': 'error', 'error': 'Not a file'}), 400
+
+            size = entry['size']
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+            start, end = byte_range or (0, size - 1)
+            content_type = mimetypes.guess_type(member)[0] or 'application/octet-stream'
+            disposition = 'attachment' if request.args.get('download') else 'inline'
             headers = {
                 'Content-Type': content_type,
+                'Content-Length': end - start + 1,
                 'Accept-Ranges': 'bytes',
-                'Content-Range': f'bytes {byte1}-{byte2}/{file_size}',
-                'Content-Length': length
+                'Last-Modified': http_date(entry['mtime']),
+                'Content-Disposition': f"{disposition}; filename*=UTF-8''{quote(os.path.basename(member))}",
             }
-            
-            return Response(generate(), 206, headers)
-            
-        def get_dir_size(path):
+            status = 200
+            if byte_range:
+                headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+                status = 206
+            return Response(index.read(member, start, end - start + 1), status, headers, direct_passthrough=True)
+
+        @share_route('/api/changes')
+        def list_changes():
+            # Incremental sync: everything after ?since=<token>, or a resync signal when it's too old
+            root = current_root()
+            since = request.args.get('since')
+            if not since:
+                return jsonify({'resync_required': True, 'changes': [], 'token': root.journal.current_token()})
+            limit = min(request.args.get('limit', 1000, type=int), 5000)
+            result = root.journal.changes_since(since, limit, request.args.get('path', ''))
+            if result is None:
+                return jsonify({'resync_required': True, 'changes': [], 'token': root.journal.current_token()})
+            return jsonify(dict(result, resync_required=False))
+
+        @share_route('/api/search')
+        def search():
+            root = current_root()
+            query = request.args.get('q', '').strip()
+            limit = min(request.args.get('limit', 200, type=int), 1000)
+            if not query:
+                return jsonify({'items': [], 'complete': True})
+            if root.catalog:
+                # Answers right away; until the first reconciliation ends, results may be partial
+                return jsonify({'items': root.catalog.search(query, limit),
+                                'complete': root.catalog.reconciled is not None})
+            needle = query.lower()
+            items = [item for item in root.walk_items() if needle in item['name'].lower()][:limit]
+            return jsonify({'items': items, 'complete': True})
+
+        @self.app.route('/api/catalog/stats')
+        def catalog_stats():
+            return jsonify({'roots': {root.name: root.catalog.stats()
+                                      for root in self.list_roots() if root.catalog}})
+
+        @share_route('/api/manifest')
+        def manifest():
+            # Compact file list other nodes compare against when mirroring this share
+            try:
+                return jsonify(current_root().manifest(request.args.get('path', '')))
+            except ValueError as e:
+                return jsonify({'status': 'error', 'error': str(e)}), 400
+
+        @share_route('/api/manifest/hashes', methods=['POST'])
+        def manifest_hashes():
+            root = current_root()
+            hashes = {}
+            for path in (request.get_json(silent=True) or {}).get('paths', []):
+                try:
+                    hashes[path] = root.file_hash(path)
+                except (OSError, ValueError):
+                    hashes[path] = None
+            return jsonify({'hashes': hashes})
+
+        @share_route('/api/mirror', methods=['POST'])
+        def start_mirror():
+            # Pull another node's folder into this share; with an interval it keeps repeating
+            data = request.get_json(silent=True) or {}
+            if not data.get('source'):
+                return jsonify({'status': 'error', 'error': 'No source node given'}), 400
+            mirror = self.add_mirror(data['source'], current_root(), data.get('path', ''),
+                                     data.get('delete', True), data.get('interval'))
+            return jsonify({'status': 'accepted', 'mirror': mirror.status()}), 202
+
+        @self.app.route('/api/mirrors')
+        def list_mirrors():
+            return jsonify({'mirrors': [mirror.status() for mirror in self.mirrors.values()]})
+
+        @self.app.route('/api/mirrors/<mirror_id>', methods=['DELETE'])
+        def remove_mirror(mirror_id):
+            if not self.remove_mirror(mirror_id):
+                return jsonify({'status': 'error', 'error': 'Unknown mirror'}), 404
+            return jsonify({'status': 'success'})
+
+        # Federated browsing: other nodes' files under /peer/<node>/, read-only
+        def current_peer(node):
+            peer = self.peers.get(node)
+            if peer is None:
+                abort(404)
+            return peer
+
+        @self.app.route('/api/peers')
+        def list_peers():
+            return jsonify({'peers': [peer.status() for peer in self.peers.list()]})
+
+        @self.app.route('/api/network')
+        def network_listing():
+            # The same folder on this node and every peer; slow peers never hold up the reply
+            path = request.args.get('path', '')
+            try:
+                local = {'status': 'ok', 'path': normalize_rel_path(path),
+                         'items': self.default_root.cached_listing(path)}
+            except (OSError, ValueError) as e:
+                local = {'status': 'error', 'error': str(e), 'items': []}
+            return jsonify({'local': local, 'peers': self.peers.aggregate(path)})
+
+        @self.app.route('/peer/<node>/')
+        def peer_index(node):
+            peer = current_peer(node)
+            path = request.args.get('path', '')
+            listing = self.peers.listing(peer, path)
+            return render_template('index.html', items=listing['items'], current_path=path,
+                                   root_prefix=peer.status()['prefix'], root_name=None,
+                                   peer_name=peer.name, read_only=True, peer_status=listing)
+
+        @self.app.route('/peer/<node>/api/list')
+        def peer_list(node):
+            listing = self.peers.listing(current_peer(node), request.args.get('path', ''))
+            return jsonify(listing), (502 if listing['status'] == 'unavailable' else 200)
+
+        def proxy_peer_file(node, kind, filename):
+            peer = current_peer(node)
+            if self.peer_redirect:
+                return redirect(peer.url(f"{kind}/{quote(filename)}"))
+            try:
+                upstream = peer.open(f"{kind}/{filename}", request.headers)
+            except PeerUnavailable as e:
+                return str(e), 502
+
+            # Closed even when no body is sent, such as for a 304 passed on from the peer
+            body = ClosingBody(upstream.iter_content(chunk_size=self.block_cache.block_size), upstream.close)
+            headers = {key: upstream.headers[key] for key in PeerNode.RESPONSE_HEADERS
+                       if key in upstream.headers}
+            return Response(body, upstream.status_code, headers, direct_passthrough=True)
+
+        @self.app.route('/peer/<node>/download/<path:filename>')
+        def peer_download(node, filename):
+            return proxy_peer_file(node, 'download', filename)
+
+        @self.app.route('/peer/<node>/stream/<path:filename>')
+        def peer_stream(node, filename):
+            return proxy_peer_file(node, 'stream', filename)
+
+        @self.app.route('/api/cache/stats')
+        def cache_stats():
+            return jsonify({'block_cache': self.block_cache.stats()})
+
+        def get_dir_size(root, path):
+            rel_dir = root.relative_path(path)
+            cached = root.cache.get_size(rel_dir)
+            if cached is None and root.catalog:
+                cached = root.catalog.get_size(rel_dir)
+                if cached is not None:
+                    root.cache.set_size(rel_dir, cached)
+            if cached is not None:
+                return cached
+
             total = 0
+            ignore = root.ignore
             with os.scandir(path) as it:
                 for entry in it:
-                    if entry.is_file():
+                    is_dir = entry.is_dir()
+                    if ignore.is_ignored(f"{rel_dir}/{entry.name}" if rel_dir else entry.name, is_dir):
+                        continue  # node_modules, .git and the like are never walked
+                    if is_dir:
+                        total += get_dir_size(root, entry.path)
+                    elif entry.is_file():
                         total += entry.stat().st_size
-                    elif entry.is_dir():
-                        total += get_dir_size(entry.path)
+            root.cache.set_size(rel_dir, total)
+            if root.catalog:
+                root.catalog.set_size(rel_dir, total)
             return total
 
-        @self.app.route('/details', methods=['POST'])
+        @share_route('/details', methods=['POST'])
         def get_item_details():
-            path = os.path.join(self.upload_folder, request.form.get('path', '').lstrip('/'))
+            root = current_root()
+            path = root.resolve_path(request.form.get('path', ''))
             stats = os.stat(path)
             
             details = {
                 'name': os.path.basename(path),
                 'type': 'Folder' if os.path.isdir(path) else 'File',
-                'size': humanize.naturalsize(get_dir_size(path) if os.path.isdir(path) else stats.st_size),
-                'created': datetime.datetime.fromtimestamp(stats.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
-                'modified': datetime.datetime.fromtimestamp(stats.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                'size': humanize.naturalsize(get_dir_size(root, path) if os.path.isdir(path) else stats.st_size),
+                'created': datetime.fromtimestamp(stats.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
+                'modified': datetime.fromtimestamp(stats.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
                 'path': request.form.get('path', '')
             }
+            if not os.path.isdir(path):
+                # Cached when a listing already had it indexed, otherwise just this file's headers are read
+                details['media'] = self.media.extract(root, request.form.get('path', ''))
             
             return jsonify(details)
 
@@ -252,35 +4749,44 @@ class FlaskServerThread:
         
         # Reset shutdown event
         self.shutdown_event.clear()
+        self.host = host
+        self.port = port
+        started = Event()
         
         def run_server():
-            print(f"LocalDrive serving files from: {self.upload_folder}")
+            log_event(f"LocalDrive serving files from: {self.upload_folder}", port=port)
             try:
-                self.server = make_server(host, port, self.app)
+                # Threaded so progress streams and long transfers don't block other requests
+                self.server = TunedWSGIServer(host, port, self.app, self.network_profile, quiet=bool(self.access_log))
+                started.set()
                 self.ctx = self.app.app_context()
                 self.ctx.push()
-                # Use a timeout to allow checking for shutdown_event
+                # handle_request() blocks until a connection arrives; stop() sets shutdown_event and then
+                # sends one last request so the loop wakes up and sees it
                 while not self.shutdown_event.is_set():
                     self.server.handle_request()
             except Exception as e:
-                print(f"Server error: {e}")
+                log_event(f"Server error: {e}", level='error')
+                self.start_error = e
             finally:
+                started.set()
                 # Clean up resources
                 try:
                     if hasattr(self, 'ctx') and self.ctx:
                         self.ctx.pop()
                 except Exception as e:
-                    print(f"Error cleaning up app context: {e}")
+                    log_event(f"Error cleaning up app context: {e}", level='warning')
                 self.server = None
                 self.ctx = None
-                print("Server shutdown complete")
+                log_event("Server shutdown complete")
             
+        self.start_error = None
         self.thread = Thread(target=run_server)
         self.thread.daemon = True
         self.thread.start()
-        # Give the server a moment to start
-        time.sleep(0.5)
-        return True
+        # Wait until the socket is bound (or binding failed) instead of guessing
+        started.wait(timeout=5)
+        return self.start_error is None and self.server is not None
         
     def stop(self):
         """Stop the Flask server"""
@@ -290,6 +4796,8 @@ class FlaskServerThread:
         try:
             # Signal the thread to stop
             self.shutdown_event.set()
+            for root in self.list_roots():
+                root.watcher.stop()
             
             # If we have a server, try to shut it down
             if self.server:
@@ -303,7 +4811,7 @@ class FlaskServerThread:
                     
                     if requests_available:
                         try:
-                            requests.get(f"http://localhost:5000/", timeout=1)
+                            requests.get(f"http://localhost:{self.port}/", timeout=1)
                         except:
                             pass
                 except:
@@ -315,7 +4823,7 @@ class FlaskServerThread:
                 
                 # If it's still running, we'll have to force it
                 if self.thread and self.thread.is_alive():
-                    print("Server thread didn't exit cleanly, forcing shutdown")
+                    log_event("Server thread didn't exit cleanly, forcing shutdown", level='warning')
                     # Just reset our references and return
                     self.server = None
                     self.ctx = None
@@ -323,7 +4831,7 @@ class FlaskServerThread:
                     
             return True
         except Exception as e:
-            print(f"Error stopping server: {e}")
+            log_event(f"Error stopping server: {e}", level='error')
             # Reset state even on error
             self.server = None
             self.ctx = None
@@ -335,8 +4843,9 @@ class FlaskServerThread:
         return self.thread is not None and self.thread.is_alive() and not self.shutdown_event.is_set()
         
     def set_folder(self, folder_path):
-        """Change the upload folder"""
-        self.upload_folder = os.path.abspath(folder_path)
+        """Change the folder of the default share"""
+        self.default_root.set_path(folder_path)
+        self.block_cache.clear()
         if self.app:
             self.app.config['UPLOAD_FOLDER'] = self.upload_folder
             
@@ -346,16 +4855,132 @@ class FlaskServerThread:
         print(f"Server running at http://{host if host != '0.0.0.0' else 'localhost'}:{port}")
         print("Press Ctrl+C to stop")
         
-        # Start the Flask application directly (not in a thread)
+        # Serve from this thread with the same tuned server the GUI uses
         try:
-            self.app.run(host=host, port=port, debug=False, use_reloader=False)
+            self.server = TunedWSGIServer(host, port, self.app, self.network_profile, quiet=bool(self.access_log))
+            self.server.serve_forever()
         except KeyboardInterrupt:
             print("\nServer shutting down...")
         finally:
+            if self.server:
+                self.server.server_close()
             # Ensure clean shutdown
             print("Goodbye!")
 
 # Settings management
+class SettingsStore:
+    """The single in-memory copy of settings.json shared by every component
+
+    Changes are applied in memory and written out after a short quiet period,
+    so a burst of toggles becomes one write. Writes go to a temporary file that
+    is then renamed over settings.json, so a crash can't leave it truncated.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, settings_file='settings.json', defaults=None):
+        """Return the store for settings_file, creating it on first use"""
+        key = os.path.abspath(settings_file)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(key, defaults)
+            return cls._instances[key]
+
+    def __init__(self, settings_file, defaults=None, write_delay=0.5):
+        self.settings_file = settings_file
+        self.defaults = dict(defaults or {})
+        self.write_delay = write_delay
+        self.lock = threading.RLock()
+        self.subscribers = []
+        self.timer = None
+        self.dirty = False
+        self.data = self._read()
+        atexit.register(self.flush)
+
+    def _read(self):
+        try:
+            if os.path.exists(self.settings_file):
+                with open(self.settings_file, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+        return copy.deepcopy(self.defaults)
+
+    def get(self, key, default=None):
+        with self.lock:
+            return copy.deepcopy(self.data.get(key, default))
+
+    def all(self):
+        with self.lock:
+            return copy.deepcopy(self.data)
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def update(self, values):
+        """Apply several changes at once; subscribers hear about the ones that changed"""
+        changed = {}
+        with self.lock:
+            for key, value in values.items():
+                if self.data.get(key) != value or key not in self.data:
+                    self.data[key] = copy.deepcopy(value)
+                    changed[key] = value
+            if changed:
+                self._schedule_write()
+            subscribers = list(self.subscribers)
+        for key, value in changed.items():
+            for callback in subscribers:
+                try:
+                    callback(key, value)
+                except Exception as e:
+                    print(f"Error in settings subscriber: {e}")
+
+    def subscribe(self, callback):
+        """callback(key, value) runs on the thread that made the change"""
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def _schedule_write(self):
+        # Called with the lock held
+        self.dirty = True
+        if self.timer is None:
+            self.timer = threading.Timer(self.write_delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """Write pending changes now, atomically"""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.dirty:
+                return
+            self.dirty = False
+            payload = json.dumps(self.data, indent=4)
+        try:
+            directory = os.path.dirname(self.settings_file) or '.'
+            fd, temp_path = tempfile.mkstemp(prefix='.settings-', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.settings_file)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except Exception as e:
+            print(f"Error saving settings: {e}")
+            with self.lock:
+                self.dirty = True
+
 class AppSettings:
     def __init__(self, settings_file='settings.json'):
         self.settings_file = settings_file
@@ -365,33 +4990,40 @@ class AppSettings:
             'startup_with_windows': False,
             'start_minimized': False,
             'exit_behavior': 'ask',  # Options: 'ask', 'minimize', 'exit'
-            'context_menu': False    # Add new setting for context menu
+            'context_menu': False,   # Add new setting for context menu
+            'block_cache_mb': 64,    # Memory for caching hot file blocks, 0 disables it
+            'ui_stall_threshold_ms': 200,  # Log UI freezes longer than this, 0 disables it
+            'peers': [],             # URLs of other LocalDrive nodes to browse from this one
+            'peer_redirect': False,  # Send peer downloads to the owning node instead of proxying
+            'mirrors': [],           # {'source': url, 'path': '', 'interval': seconds, 'delete': True} pulled into the default share
+            'catalog': True,         # Keep an on-disk catalog of each share for fast cold starts
+            'upload_concurrency': 3, # Files each browser uploads in parallel
+            'ignore_patterns': None, # Gitignore-style rules for every share; None keeps the defaults
+            'access_log': True,      # Write requests as JSON lines to logs/access.log next to the program
+            'transfer_limits': {},   # Per-class overrides of DEFAULT_TRANSFER_LIMITS, 0 lifts a limit
+            'network_profile': 'lan',  # Socket tuning from NETWORK_PROFILES, used from the next server start
+            'network_overrides': {}    # Individual NETWORK_PROFILES keys to change
         }
-        self.settings = self.load_settings()
+        self.store = SettingsStore.shared(settings_file, self.default_settings)
+    
+    @property
+    def settings(self):
+        return self.store.all()
     
     def load_settings(self):
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    return json.load(f)
-            return self.default_settings.copy()
-        except Exception as e:
-            print(f"Error loading settings: {e}")
-            return self.default_settings.copy()
+        return self.store.all()
     
     def save_settings(self):
-        try:
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f, indent=4)
-        except Exception as e:
-            print(f"Error saving settings: {e}")
+        self.store.flush()
     
     def get(self, key, default=None):
-        return self.settings.get(key, default)
+        return self.store.get(key, default)
     
     def set(self, key, value):
-        self.settings[key] = value
-        self.save_settings()
+        self.store.set(key, value)
+    
+    def subscribe(self, callback):
+        self.store.subscribe(callback)
         
     def toggle_windows_startup(self, enable):
         try:
@@ -516,9 +5148,429 @@ class ModernStyle:
                       background=ModernStyle.GOLD,
                       foreground=ModernStyle.PRIMARY)
 
+class TkTaskRunner:
+    """Runs slow work off the Tk thread and hands results back to it
+
+    Tk must only be touched from the main loop, so workers put their results
+    on a queue that the main loop drains with after().
+    """
+    def __init__(self, root, max_workers=2, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tk-task')
+        self.results = queue.Queue()
+        self.closed = False
+        self.root.after(self.poll_ms, self._drain)
+
+    def submit(self, func, *args, on_done=None, on_error=None):
+        """Run func(*args) on a worker; on_done(result) or on_error(exc) run on the Tk thread"""
+        def work():
+            try:
+                result = func(*args)
+            except Exception as e:
+                if on_error:
+                    self.results.put((on_error, e))
+                else:
+                    log_event(f"Background task {getattr(func, '__name__', func)} failed: {e}", level='error')
+            else:
+                if on_done:
+                    self.results.put((on_done, result))
+        return self.pool.submit(work)
+
+    def run_on_ui(self, func, *args):
+        """Schedule func(*args) on the Tk thread; safe to call from any thread"""
+        self.results.put((lambda _: func(*args), None))
+
+    def _drain(self):
+        if self.closed:
+            return
+        while True:
+            try:
+                callback, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(value)
+            except Exception as e:
+                log_event(f"Error in UI callback: {e}", level='error')
+        self.root.after(self.poll_ms, self._drain)
+
+    def shutdown(self):
+        self.closed = True
+        self.pool.shutdown(wait=False)
+
+def render_qr_image(url, size):
+    """Render the LocalDrive QR code for url as a size x size PIL image"""
+    # Create a QR code with Krishna blue fill
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,  # Increased error correction
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    
+    qr_image = qr.make_image(fill_color=ModernStyle.PRIMARY, back_color="white")
+    # Resize for display with high quality
+    return qr_image.resize((size, size), Image.Resampling.LANCZOS)
+
+def qr_display_size(container_height):
+    """Side of the QR code shown in a QR box of the given height"""
+    return max(100, min(container_height - 40, 300))  # Leave space for instruction text
+
+def local_ip_address():
+    """Address other devices on the LAN reach this machine at"""
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect(('8.8.8.8', 80))
+        ip = s.getsockname()[0]
+        s.close()
+        return ip
+    except:
+        return 'localhost'
+
+class QRImageCache:
+    """Keeps rendered QR codes per (url, size) so resizing doesn't re-render them"""
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.images = OrderedDict()  # (url, size) -> PIL image
+        self.lock = threading.Lock()
+
+    def get(self, url, size):
+        with self.lock:
+            image = self.images.get((url, size))
+            if image is not None:
+                self.images.move_to_end((url, size))
+            return image
+
+    def render(self, url, size):
+        """Return the cached image or render it; safe to call from worker threads"""
+        image = self.get(url, size)
+        if image is None:
+            image = render_qr_image(url, size)
+            with self.lock:
+                self.images[(url, size)] = image
+                while len(self.images) > self.max_entries:
+                    self.images.popitem(last=False)
+        return image
+
+class MainLoopStallMonitor:
+    """Logs whenever the Tk main loop is blocked for longer than a threshold
+
+    The main loop stamps a heartbeat through after(); a watchdog thread notices
+    when it goes stale and logs where the main thread is stuck.
+    """
+    def __init__(self, root, threshold_ms=200, interval_ms=50):
+        self.root = root
+        self.threshold = threshold_ms / 1000
+        self.interval_ms = interval_ms
+        self.main_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stall_reported = False
+        self.running = False
+
+    def start(self):
+        if self.running or self.threshold <= 0:
+            return
+        self.running = True
+        self.root.after(self.interval_ms, self._beat)
+        Thread(target=self._watch, name='ui-stall-monitor', daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def _beat(self):
+        if not self.running:
+            return
+        now = time.monotonic()
+        if self.stall_reported:
+            log_event(f"UI thread was blocked for {(now - self.last_beat) * 1000:.0f} ms", level='warning')
+            self.stall_reported = False
+        self.last_beat = now
+        self.root.after(self.interval_ms, self._beat)
+
+    def _watch(self):
+        while self.running:
+            time.sleep(self.interval_ms / 1000)
+            lag = time.monotonic() - self.last_beat - self.interval_ms / 1000
+            if lag > self.threshold and not self.stall_reported:
+                self.stall_reported = True
+                frame = sys._current_frames().get(self.main_thread_id)
+                stack = ''.join(traceback.format_stack(frame)[-6:]) if frame else ''
+                log_event(f"UI thread blocked for more than {self.threshold * 1000:.0f} ms, currently in:\n{stack}",
+                          level='warning')
+
+class InstanceListener:
+    """The running LocalDrive's end of forward_to_running_instance()
+
+    Holding INSTANCE_PORT is what makes a process the running instance. The
+    token written next to the program keeps other local programs from
+    driving it.
+    """
+    MAX_MESSAGE = 64 * 1024
+
+    def __init__(self, sock, token, token_file):
+        self.sock = sock
+        self.token = token
+        self.token_file = token_file
+        self.handler = None
+        self.closed = False
+
+    @classmethod
+    def claim(cls, port=INSTANCE_PORT, token_file=INSTANCE_TOKEN_FILE):
+        """Become the running instance, or return None when another one already is"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if hasattr(socket, 'SO_EXCLUSIVEADDRUSE'):
+            # Without it Windows lets a second process bind the same port with SO_REUSEADDR
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        try:
+            sock.bind(('127.0.0.1', port))
+            sock.listen(8)
+        except OSError:
+            sock.close()
+            return None
+        listener = cls(sock, os.urandom(16).hex(), token_file)
+        try:
+            with open(token_file, 'w') as f:
+                f.write(listener.token)
+        except OSError as e:
+            print(f"Could not write {token_file}, other launches will start separately: {e}")
+        atexit.register(listener.close)
+        return listener
+
+    def serve(self, handler):
+        """Start taking launches; handler(argv, cwd) runs on the listener thread
+
+        Launches that arrived before this wait in the socket backlog.
+        """
+        self.handler = handler
+        Thread(target=self._run, name='instance-listener', daemon=True).start()
+
+    def _run(self):
+        while not self.closed:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                break
+            with conn:
+                try:
+                    conn.settimeout(2)
+                    message = json.loads(conn.makefile('rb').readline(self.MAX_MESSAGE))
+                    ok = hmac.compare_digest(str(message.get('token', '')), self.token)
+                    if ok:
+                        self.handler(list(message.get('argv', [])), message.get('cwd') or os.getcwd())
+                    conn.sendall(json.dumps({'ok': ok}).encode('utf-8') + b'\n')
+                except (OSError, ValueError, AttributeError) as e:
+                    print(f"Ignoring a bad launch message: {e}")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.sock.close()
+        try:
+            with open(self.token_file, 'r') as f:
+                ours = f.read().strip() == self.token
+            if ours:
+                os.remove(self.token_file)
+        except OSError:
+            pass
+
+def create_flask_server(settings, start_folder=None):
+    """Build the server the GUI runs, configured from AppSettings"""
+    server = FlaskServerThread(upload_folder=start_folder if start_folder else '.',
+                               block_cache_mb=settings.get('block_cache_mb', 64),
+                               catalog_dir=os.path.join(APP_DIR, 'catalog') if settings.get('catalog', True) else None,
+                               access_log_path=os.path.join(APP_DIR, 'logs', 'access.log') if settings.get('access_log', True) else None)
+    # Extra folders shared alongside the main one, each under /r/<name>/
+    for folder in settings.get('share_roots', []):
+        if os.path.isdir(folder):
+            server.add_root(folder)
+    for url in settings.get('peers', []):
+        server.peers.add(url)
+    server.peer_redirect = settings.get('peer_redirect', False)
+    server.upload_concurrency = settings.get('upload_concurrency', 3)
+    if settings.get('ignore_patterns') is not None:
+        server.set_ignore_patterns(settings.get('ignore_patterns'))
+    server.admission.set_limits(settings.get('transfer_limits') or {})
+    try:
+        server.network_profile = network_profile(settings.get('network_profile', 'lan'),
+                                                 settings.get('network_overrides'))
+    except ValueError as e:
+        print(f"Ignoring network settings: {e}")
+    for mirror in settings.get('mirrors', []):
+        server.add_mirror(mirror['source'], rel_dir=mirror.get('path', ''),
+                          delete=mirror.get('delete', True), interval=mirror.get('interval', 300))
+    return server
+
+class StartupTimer:
+    """Records how long each startup phase took, in ms since the process started
+
+    Every launch appends one JSON line to logs/startup.log next to the
+    program, so cold-start time can be compared across versions and machines.
+    """
+    def __init__(self, started=PROCESS_STARTED):
+        self.started = started
+        self.phases = OrderedDict()  # name -> {'start_ms', 'ms', 'error'}
+        self.marks = OrderedDict()   # name -> ms since start
+        self.lock = threading.Lock()
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def run(self, name, func, *args):
+        """Call func(*args) and record it as phase name; may be called from any thread"""
+        start = time.perf_counter()
+        error = None
+        try:
+            return func(*args)
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            phase = {'start_ms': round((start - self.started) * 1000, 1),
+                     'ms': round((time.perf_counter() - start) * 1000, 1)}
+            if error:
+                phase['error'] = error
+            with self.lock:
+                self.phases[name] = phase
+
+    def mark(self, name):
+        """Note when a milestone such as the first window on screen was reached"""
+        with self.lock:
+            self.marks[name] = self.elapsed_ms()
+
+    def report(self):
+        with self.lock:
+            return {'time': datetime.now().isoformat(timespec='seconds'),
+                    'total_ms': self.elapsed_ms(),
+                    'marks': dict(self.marks),
+                    'phases': copy.deepcopy(self.phases)}
+
+    def save(self, path=os.path.join(APP_DIR, 'logs', 'startup.log'), keep=500):
+        """Append this launch to path, keeping the last keep launches"""
+        report = self.report()
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            lines = []
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    lines = f.readlines()[-(keep - 1):]
+            lines.append(json.dumps(report) + '\n')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+        except OSError as e:
+            print(f"Error saving startup timings: {e}")
+        return report
+
+class StartupWarmup:
+    """The startup work done in parallel while the splash screen is showing
+
+    Each phase runs on its own worker and waits only for the phases it needs.
+    MainWindow takes over what was built, so nothing is done twice.
+    """
+    PHASES = OrderedDict([
+        ('settings', 'Loading settings'),
+        ('network', 'Finding network address'),
+        ('tray', 'Preparing tray icon'),
+        ('server', 'Opening shared folders'),
+        ('catalog', 'Warming folder cache'),
+        ('port', 'Starting server'),
+        ('qr', 'Drawing QR code'),
+    ])
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.settings = None
+        self.flask_server = None
+        self.server_ip = None      # Set once the server is listening, when it starts with the app
+        self.server_error = None
+        self.qr_cache = QRImageCache()
+        self.tray_image = None
+        self.futures = OrderedDict()
+        # One worker per phase, so a phase waiting on another never holds up a third
+        self.pool = ThreadPoolExecutor(max_workers=len(self.PHASES), thread_name_prefix='warmup')
+
+    def start(self):
+        settings = self._submit('settings', AppSettings)
+        ip = self._submit('network', local_ip_address)
+        self._submit('tray', SystemTrayIcon.load_icon)
+        server = self._submit('server', create_flask_server, settings)
+        self._submit('catalog', self._warm_catalog, server)
+        self._submit('port', self._bind, server, settings, ip)
+        self._submit('qr', self._render_qr, settings, ip)
+        self.pool.shutdown(wait=False)
+
+    def _submit(self, name, func, *needs):
+        def phase():
+            args = [future.result() for future in needs]
+            return self.timer.run(name, func, *args)
+        future = self.pool.submit(phase)
+        self.futures[name] = future
+        return future
+
+    def _warm_catalog(self, server):
+        # The top folder of every share is what the first page load will ask for
+        for root in server.list_roots():
+            try:
+                root.cached_listing('')
+            except OSError:
+                pass
+
+    def _bind(self, server, settings, ip):
+        if not settings.get('autostart_server', False):
+            return
+        if server.start(host='0.0.0.0', port=settings.get('port', 5000)):
+            self.server_ip = ip
+        else:
+            self.server_error = server.start_error or RuntimeError("Could not start server")
+
+    def _render_qr(self, settings, ip):
+        url = f"http://{ip}:{settings.get('port', 5000)}"
+        # The QR box is 250 px tall when the window opens and 40% of the 650 px window after the first resize
+        for container_height in (250, int(650 * 0.4)):
+            self.qr_cache.render(url, qr_display_size(container_height))
+
+    def done(self):
+        return sum(future.done() for future in self.futures.values())
+
+    def finished(self):
+        return self.done() == len(self.PHASES)
+
+    def pending_label(self):
+        """What the splash should say is happening"""
+        for name, future in self.futures.items():
+            if not future.done():
+                return f"{self.PHASES[name]}..."
+        return "Ready"
+
+    def collect(self):
+        """Keep what the phases built; a failed phase is simply redone by MainWindow"""
+        results = {}
+        for name, future in self.futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"Startup phase {name} failed: {e}")
+        self.settings = results.get('settings')
+        self.flask_server = results.get('server')
+        self.tray_image = results.get('tray')
+
+def gradient_image(width, height, top, bottom):
+    """A vertical gradient as one PIL image, so a canvas can show it as a single item"""
+    column = Image.new('RGB', (1, height))
+    column.putdata([tuple(int(a + (b - a) * i / height) for a, b in zip(top, bottom)) for i in range(height)])
+    return column.resize((width, height), Image.Resampling.NEAREST)
+
 class SplashScreen(tk.Tk):
-    def __init__(self):
+    def __init__(self, instance=None):
         super().__init__()
+        self.instance = instance
+
+        # Startup work begins right away and runs while the splash is drawn
+        self.warmup = StartupWarmup(StartupTimer())
+        self.warmup.start()
 
         # Hide window decorations
         self.overrideredirect(True)
@@ -538,14 +5590,9 @@ class SplashScreen(tk.Tk):
                              highlightthickness=0, bg=ModernStyle.PRIMARY)
         self.canvas.pack(fill="both", expand=True)
         
-        # Create gradient background
-        for i in range(height):
-            # Gradient from Krishna blue to peacock green
-            r = int(((40 - 17) * i / height) + 17)
-            g = int(((80 - 109) * i / height) + 109)
-            b = int(((160 - 75) * i / height) + 75)
-            color = f'#{r:02x}{g:02x}{b:02x}'
-            self.canvas.create_line(0, i, width, i, fill=color)
+        # Gradient from peacock green to Krishna blue
+        self.background = ImageTk.PhotoImage(gradient_image(width, height, (17, 109, 75), (40, 80, 160)))
+        self.canvas.create_image(0, 0, image=self.background, anchor="nw")
         
         # Add decorative lotus pattern
         lotus_img = Image.open('logo.png' if os.path.exists('logo.png') else 'static/logo.png')
@@ -584,84 +5631,53 @@ class SplashScreen(tk.Tk):
                                   fg=ModernStyle.GOLD)
         self.loading_text.pack()
 
-        # Start progress
-        self.progress_value = 0
-        self.update_progress()
+        # Follow the warm-up; the splash closes as soon as it is done
+        self.progress['maximum'] = len(StartupWarmup.PHASES)
+        self.after_idle(lambda: self.warmup.timer.mark('splash'))
+        self.after(30, self.update_progress)
 
     def update_progress(self):
-        if self.progress_value < 100:
-            self.progress_value += 1
-            self.progress['value'] = self.progress_value
-            self.after(20, self.update_progress)
+        self.progress['value'] = self.warmup.done()
+        self.loading_text.configure(text=self.warmup.pending_label())
+        if self.warmup.finished():
+            self.launch_main()
         else:
-            self.after(500, self.launch_main)
+            self.after(30, self.update_progress)
 
     def launch_main(self):
         self.destroy()
-        settings = AppSettings()
+        self.warmup.collect()
+        settings = self.warmup.settings or AppSettings()
         app = MainWindow(show_window=not (settings.get('startup_with_windows', False) and 
-                                         settings.get('start_minimized', False)))
+                                         settings.get('start_minimized', False)),
+                         warmup=self.warmup, instance=self.instance)
         app.mainloop()
 
 class UpdateManager:
     """Manages application updates and version checking"""
     def __init__(self, settings_file='settings.json'):
         self.settings_file = settings_file
+        self.store = SettingsStore.shared(settings_file)
         self.github_repo = "ranjanlive/localDrive"
         self.current_version = "1.0.0"  # Application's current version
         self.update_settings = self._load_update_settings()
         
     def _load_update_settings(self):
         """Load update-related settings or create defaults"""
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    settings = json.load(f)
-                    # Initialize update settings if not present
-                    if 'update_settings' not in settings:
-                        settings['update_settings'] = {
-                            'last_check': None,
-                            'skipped_versions': [],
-                            'check_frequency': 'daily',  # daily, weekly, never
-                            'remind_later_time': None
-                        }
-                    return settings.get('update_settings')
-            
+        update_settings = self.store.get('update_settings')
+        if not update_settings:
             # Default update settings
-            return {
-                'last_check': None,
-                'skipped_versions': [],
-                'check_frequency': 'daily',
-                'remind_later_time': None
-            }
-        except Exception as e:
-            print(f"Error loading update settings: {e}")
-            return {
+            update_settings = {
                 'last_check': None,
                 'skipped_versions': [],
-                'check_frequency': 'daily',
+                'check_frequency': 'daily',  # daily, weekly, never
                 'remind_later_time': None
             }
+        return update_settings
     
     def save_update_settings(self):
-        """Save update settings to the settings file"""
-        try:
-            # Load current settings
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    settings = json.load(f)
-            else:
-                settings = {}
-                
-            # Update the update_settings section
-            settings['update_settings'] = self.update_settings
-            
-            # Save back to file
-            with open(self.settings_file, 'w') as f:
-                json.dump(settings, f, indent=4)
-                
-        except Exception as e:
-            print(f"Error saving update settings: {e}")
+        """Save update settings through the shared settings store"""
+        self.store.set('update_settings', self.update_settings)
     
     def check_for_updates(self, silent=False):
         """Check GitHub for new releases
@@ -919,12 +5935,14 @@ class AboutWindow(tk.Toplevel):
         self.update_container.pack(fill="x")
         
         # Schedule update check to avoid UI freeze
-        self.after(100, self._do_update_check)
+        self._do_update_check()
     
     def _do_update_check(self):
-        """Perform the actual update check"""
-        update_info = self.update_manager.check_for_updates(silent=False)
-        self.update_ui(update_info)
+        """Perform the actual update check on a worker so the window stays responsive"""
+        def show_result(update_info):
+            if self.winfo_exists():
+                self.update_ui(update_info)
+        self.parent.tasks.submit(self.update_manager.check_for_updates, False, on_done=show_result)
     
     def update_ui(self, update_info):
         """Update the UI based on update check results"""
@@ -1225,11 +6243,83 @@ class SettingsWindow(tk.Toplevel):
         self.settings.load_settings()
         self.destroy()
 
+class SharedFoldersWindow(tk.Toplevel):
+    """Add or remove extra shared folders while the server keeps running"""
+    def __init__(self, parent, flask_server, settings):
+        super().__init__(parent)
+        
+        self.parent = parent
+        self.flask_server = flask_server
+        self.settings = settings
+        self.title("Shared Folders")
+        self.geometry("560x360")
+        self.resizable(False, False)
+        
+        container = tk.Frame(self, bg=ModernStyle.BG_LIGHT, padx=20, pady=20)
+        container.pack(fill="both", expand=True)
+        
+        tk.Label(container, text="Shared Folders", font=('Segoe UI', 16, 'bold'),
+               bg=ModernStyle.BG_LIGHT, fg=ModernStyle.PRIMARY).pack(anchor="w")
+        tk.Label(container, text="The main folder is served at /, every other folder at /r/<name>/",
+               font=('Segoe UI', 10), bg=ModernStyle.BG_LIGHT).pack(anchor="w", pady=(0, 10))
+        
+        self.tree = ttk.Treeview(container, columns=('path',), height=8)
+        self.tree.heading('#0', text='Address')
+        self.tree.heading('path', text='Folder')
+        self.tree.column('#0', width=140)
+        self.tree.column('path', width=360)
+        self.tree.pack(fill="both", expand=True)
+        
+        button_frame = tk.Frame(container, bg=ModernStyle.BG_LIGHT)
+        button_frame.pack(fill="x", pady=(10, 0))
+        
+        tk.Button(button_frame, text="Add Folder...", bg=ModernStyle.PRIMARY, fg="white",
+               font=('Segoe UI', 10, 'bold'), padx=15, pady=5, bd=0,
+               command=self.add_folder).pack(side="left")
+        
+        tk.Button(button_frame, text="Remove", bg="#B0B0B0", fg="white",
+               font=('Segoe UI', 10), padx=15, pady=5, bd=0,
+               command=self.remove_folder).pack(side="left", padx=10)
+        
+        tk.Button(button_frame, text="Close", bg="#B0B0B0", fg="white",
+               font=('Segoe UI', 10), padx=15, pady=5, bd=0,
+               command=self.destroy).pack(side="right")
+        
+        self.refresh()
+        self.transient(parent)
+    
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for root in self.flask_server.list_roots():
+            address = '/' if root is self.flask_server.default_root else f"/r/{root.name}/"
+            self.tree.insert('', 'end', iid=root.name, text=address, values=(root.path,))
+    
+    def save_roots(self):
+        extra = [root.path for root in self.flask_server.list_roots()
+                 if root is not self.flask_server.default_root]
+        self.settings.set('share_roots', extra)
+    
+    def add_folder(self):
+        folder = filedialog.askdirectory(parent=self, title="Choose a folder to share")
+        if folder:
+            self.flask_server.add_root(folder)
+            self.save_roots()
+            self.refresh()
+    
+    def remove_folder(self):
+        for name in self.tree.selection():
+            if not self.flask_server.remove_root(name):
+                messagebox.showinfo("Shared Folders", "The main folder can't be removed, only changed.", parent=self)
+        self.save_roots()
+        self.refresh()
+
 class SystemTrayIcon:
-    def __init__(self, app_instance):
+    def __init__(self, app_instance, icon_image=None):
         self.app = app_instance
+        self.icon_image = icon_image  # Loaded ahead of time by the splash screen, if it ran
         self.server_url = None
         self.is_server_running = False
+        self.throughput = ""  # "3 at 41.2 MB/s" while transfers are running
         
         # Create and start the tray icon
         self.setup_tray_icon()
@@ -1239,7 +6329,8 @@ class SystemTrayIcon:
         menu_items = self.create_menu_items()
         
         # Load icon
-        self.icon_image = self.load_icon()
+        if self.icon_image is None:
+            self.icon_image = self.load_icon()
         
         # Create tray icon - only create a new one if not already running
         try:
@@ -1269,6 +6360,9 @@ class SystemTrayIcon:
         # Add URL item if server is running
         if self.is_server_running and self.server_url:
             menu.append(item(f"Server URL: {self.server_url}", lambda: None, enabled=False))
+            # Text is read each time the menu is drawn, so it follows update_throughput
+            menu.append(item(lambda _: f"Transfers: {self.throughput}", lambda: None, enabled=False,
+                             visible=lambda _: bool(self.throughput)))
         
         # Add remaining items
         menu.extend([
@@ -1280,13 +6374,18 @@ class SystemTrayIcon:
         
         return menu
     
-    def load_icon(self):
+    @staticmethod
+    def load_icon():
         if os.path.exists('icon.ico'):
             from PIL import Image
-            return Image.open('icon.ico')
+            image = Image.open('icon.ico')
+            image.load()  # Decode now rather than on the tray thread
+            return image
         elif os.path.exists('logo.png'):
             from PIL import Image
-            return Image.open('logo.png')
+            image = Image.open('logo.png')
+            image.load()
+            return image
         else:
             # Create a default icon if needed
             from PIL import Image, ImageDraw
@@ -1296,19 +6395,25 @@ class SystemTrayIcon:
             return img
     
     def show_window(self):
+        self.app.tasks.run_on_ui(self._show_window)
+
+    def _show_window(self):
         self.app.deiconify()
         self.app.lift()
         self.app.focus_force()
     
     def toggle_server(self):
-        # Call the app's toggle_server method
-        self.app.toggle_server()
+        # Called from the tray thread; Tk has to be driven from its own thread
+        self.app.tasks.run_on_ui(self.app.toggle_server)
         
     def open_in_browser(self):
         if self.server_url:
             webbrowser.open(self.server_url)
     
     def quit_app(self):
+        self.app.tasks.run_on_ui(self._quit_app)
+
+    def _quit_app(self):
         # Stop server if running
         if self.app.is_server_running:
             self.app.stop_server()
@@ -1319,6 +6424,17 @@ class SystemTrayIcon:
         # Destroy the app
         self.app.destroy()
     
+    def update_throughput(self, summary):
+        """Show the combined transfer speed in the tooltip and menu"""
+        if summary == self.throughput:
+            return
+        self.throughput = summary
+        try:
+            self.tray_icon.title = f"LocalDrive - {summary}" if summary else "LocalDrive"
+            self.tray_icon.update_menu()
+        except Exception as e:
+            print(f"Error updating system tray: {e}")
+
     def update_server_status(self, is_running, url=None):
         # Update internal state
         self.is_server_running = is_running
@@ -1332,7 +6448,7 @@ class SystemTrayIcon:
             print(f"Error updating system tray: {e}")
 
 class MainWindow(tk.Tk):
-    def __init__(self, show_window=True, start_folder=None):
+    def __init__(self, show_window=True, start_folder=None, port=None, warmup=None, instance=None):
         super().__init__()
 
         self.title('LocalDrive')
@@ -1340,11 +6456,30 @@ class MainWindow(tk.Tk):
         self.is_server_running = False
         self.start_folder = start_folder
         
-        # Initialize Flask server
-        self.flask_server = FlaskServerThread(upload_folder=start_folder if start_folder else '.')
-        
         # Load settings
-        self.settings = AppSettings()
+        self.warmup = warmup
+        self.settings = warmup.settings if warmup and warmup.settings else AppSettings()
+        self.port = port or self.settings.get('port', 5000)
+        
+        # Initialize Flask server, unless the splash screen already built it
+        if warmup and warmup.flask_server:
+            self.flask_server = warmup.flask_server
+        else:
+            self.flask_server = create_flask_server(self.settings, start_folder)
+        
+        # Slow work (server start/stop, QR rendering, update checks) runs off the Tk thread
+        self.tasks = TkTaskRunner(self)
+        self.qr_cache = warmup.qr_cache if warmup else QRImageCache()
+        self.qr_photos = {}  # (url, size) -> PhotoImage, created on the Tk thread
+        self.qr_resize_job = None
+        self.server_busy = False
+        self.stall_monitor = MainLoopStallMonitor(self, threshold_ms=self.settings.get('ui_stall_threshold_ms', 200))
+        self.stall_monitor.start()
+        self.settings.subscribe(self.on_setting_changed)
+        # Later launches of LocalDrive come here instead of starting a second copy
+        self.instance = instance
+        if instance:
+            instance.serve(lambda argv, cwd: self.tasks.run_on_ui(self.open_forwarded_launch, argv, cwd))
 
         # Set window icon using .ico file
         try:
@@ -1403,14 +6538,9 @@ class MainWindow(tk.Tk):
         header = tk.Canvas(header_frame, height=120, highlightthickness=0)
         header.pack(fill="x", expand=True)
         
-        # Create gradient in header
-        for i in range(120):
-            # Gradient from Krishna blue to peacock green
-            r = int(((40 - 17) * i / 120) + 17)
-            g = int(((80 - 109) * i / 120) + 109)
-            b = int(((160 - 75) * i / 120) + 75)
-            color = f'#{r:02x}{g:02x}{b:02x}'
-            header.create_line(0, i, 3000, i, fill=color) # Extra wide for different resolutions
+        # Create gradient in header, extra wide for different resolutions
+        self.header_bg = ImageTk.PhotoImage(gradient_image(3000, 120, (17, 109, 75), (40, 80, 160)))
+        header.create_image(0, 0, image=self.header_bg, anchor="nw")
         
         # Load logo with high quality for header
         try:
@@ -1506,11 +6636,70 @@ class MainWindow(tk.Tk):
             padx=10, pady=5, bd=0, state="disabled"
         )
         self.open_browser_btn.pack(side="left")
+        
+        tk.Button(
+            quick_actions, text="Shared Folders", command=self.show_shared_folders,
+            font=('Segoe UI', 10), bg="#f0f0f0", fg=ModernStyle.PRIMARY,
+            padx=10, pady=5, bd=0
+        ).pack(side="left", padx=(10, 0))
+
+        # Background jobs card, only shown while something is running
+        self.jobs_card = tk.Frame(content, bg="white", padx=20, pady=10,
+                                bd=0, highlightthickness=1, highlightbackground="#DDD")
+        
+        jobs_header = tk.Frame(self.jobs_card, bg="white")
+        jobs_header.pack(fill="x")
+        
+        tk.Label(jobs_header, text="Background Jobs", font=('Segoe UI', 12, 'bold'),
+               bg="white", fg=ModernStyle.PRIMARY).pack(side="left")
+        
+        tk.Button(jobs_header, text="Cancel Selected", command=self.cancel_selected_job,
+                font=('Segoe UI', 9), bg="#f0f0f0", fg=ModernStyle.PRIMARY,
+                padx=10, pady=2, bd=0).pack(side="right")
+        
+        self.jobs_tree = ttk.Treeview(self.jobs_card, columns=('progress', 'eta'), height=3)
+        self.jobs_tree.heading('#0', text='Operation')
+        self.jobs_tree.heading('progress', text='Progress')
+        self.jobs_tree.heading('eta', text='Time Left')
+        self.jobs_tree.column('#0', width=300)
+        self.jobs_tree.column('progress', width=220)
+        self.jobs_tree.column('eta', width=100)
+        self.jobs_tree.pack(fill="x", pady=(5, 0))
+
+        # Active transfers card, only shown while someone is downloading or uploading
+        self.transfers_card = tk.Frame(content, bg="white", padx=20, pady=10,
+                                     bd=0, highlightthickness=1, highlightbackground="#DDD")
+
+        transfers_header = tk.Frame(self.transfers_card, bg="white")
+        transfers_header.pack(fill="x")
+
+        tk.Label(transfers_header, text="Active Transfers", font=('Segoe UI', 12, 'bold'),
+               bg="white", fg=ModernStyle.PRIMARY).pack(side="left")
+        self.transfers_total = tk.Label(transfers_header, text="", font=('Segoe UI', 9),
+                                      bg="white", fg="gray")
+        self.transfers_total.pack(side="right")
+
+        self.transfers_tree = ttk.Treeview(self.transfers_card, columns=('client', 'kind', 'progress', 'rate', 'eta'),
+                                           height=4)
+        self.transfers_tree.heading('#0', text='File')
+        self.transfers_tree.heading('client', text='Device')
+        self.transfers_tree.heading('kind', text='Type')
+        self.transfers_tree.heading('progress', text='Progress')
+        self.transfers_tree.heading('rate', text='Speed')
+        self.transfers_tree.heading('eta', text='Time Left')
+        self.transfers_tree.column('#0', width=220)
+        self.transfers_tree.column('client', width=110)
+        self.transfers_tree.column('kind', width=70)
+        self.transfers_tree.column('progress', width=150)
+        self.transfers_tree.column('rate', width=90)
+        self.transfers_tree.column('eta', width=90)
+        self.transfers_tree.pack(fill="x", pady=(5, 0))
 
         # QR Code section with card style and proper height
         qr_card = tk.Frame(content, bg="white", padx=20, pady=20, 
                          bd=0, highlightthickness=1, highlightbackground="#DDD")
         qr_card.pack(fill="both", expand=True, pady=(0, 10))
+        self.qr_card = qr_card
         
         # Set a minimum height for QR container
         qr_card.update()
@@ -1559,7 +6748,7 @@ class MainWindow(tk.Tk):
                font=('Segoe UI', 10)).pack()
 
         # Create system tray icon
-        self.tray_icon = SystemTrayIcon(self)
+        self.tray_icon = SystemTrayIcon(self, icon_image=warmup.tray_image if warmup else None)
         
         # Protocol for closing
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -1580,21 +6769,165 @@ class MainWindow(tk.Tk):
         # Add update manager instance without auto-checking
         self.update_manager = UpdateManager()
 
+        # Poll the job manager so the jobs card stays current
+        self.after(1000, self.refresh_jobs)
+        self.after(1000, self.refresh_transfers)
+
+        if warmup:
+            self.after_idle(self.record_startup)
+
+    def record_startup(self):
+        """Log how long this launch took once the window is up"""
+        self.warmup.timer.mark('window')
+        report = self.warmup.timer.save()
+        phases = ', '.join(f"{name} {phase['ms']:.0f} ms" for name, phase in report['phases'].items())
+        log_event(f"Started in {report['marks']['window']:.0f} ms ({phases})", startup=report)
+
+    def refresh_jobs(self):
+        """Show active background jobs; runs on a timer in the Tk thread"""
+        jobs = self.flask_server.jobs.list(active_only=True)
+        if jobs and not self.jobs_card.winfo_ismapped():
+            self.jobs_card.pack(fill="x", pady=(0, 20), before=self.qr_card)
+        elif not jobs and self.jobs_card.winfo_ismapped():
+            self.jobs_card.pack_forget()
+
+        current = {job.id for job in jobs}
+        for job_id in self.jobs_tree.get_children():
+            if job_id not in current:
+                self.jobs_tree.delete(job_id)
+        for job in jobs:
+            info = job.to_dict()
+            if info['bytes_total']:
+                progress = (f"{humanize.naturalsize(info['bytes_done'])} of "
+                            f"{humanize.naturalsize(info['bytes_total'])}")
+            elif info['items_total']:
+                progress = f"{info['items_done']} of {info['items_total']} items"
+            else:
+                progress = info['status'].capitalize()
+            eta = humanize.naturaldelta(timedelta(seconds=info['eta'])) if info['eta'] is not None else ''
+            if self.jobs_tree.exists(job.id):
+                self.jobs_tree.item(job.id, values=(progress, eta))
+            else:
+                self.jobs_tree.insert('', 'end', iid=job.id, text=job.description, values=(progress, eta))
+
+        self.after(1000, self.refresh_jobs)
+
+    def refresh_transfers(self):
+        """Show transfers in flight and their total speed; runs on a timer in the Tk thread"""
+        transfers = self.flask_server.transfers.snapshot()
+        if transfers and not self.transfers_card.winfo_ismapped():
+            self.transfers_card.pack(fill="x", pady=(0, 20), before=self.qr_card)
+        elif not transfers and self.transfers_card.winfo_ismapped():
+            self.transfers_card.pack_forget()
+
+        current = {transfer['id'] for transfer in transfers}
+        for transfer_id in self.transfers_tree.get_children():
+            if transfer_id not in current:
+                self.transfers_tree.delete(transfer_id)
+        for transfer in transfers:
+            if transfer['bytes_total']:
+                progress = (f"{humanize.naturalsize(transfer['bytes_done'])} of "
+                            f"{humanize.naturalsize(transfer['bytes_total'])}")
+            else:
+                progress = humanize.naturalsize(transfer['bytes_done'])
+            rate = f"{humanize.naturalsize(transfer['rate'])}/s"
+            eta = humanize.naturaldelta(timedelta(seconds=transfer['eta'])) if transfer['eta'] is not None else ''
+            values = (transfer['client'], transfer['kind'].capitalize(), progress, rate, eta)
+            if self.transfers_tree.exists(transfer['id']):
+                self.transfers_tree.item(transfer['id'], values=values)
+            else:
+                self.transfers_tree.insert('', 'end', iid=transfer['id'], text=transfer['path'], values=values)
+
+        total_rate = sum(transfer['rate'] for transfer in transfers)
+        summary = f"{len(transfers)} at {humanize.naturalsize(total_rate)}/s" if transfers else ""
+        self.transfers_total.config(text=summary)
+        self.tray_icon.update_throughput(summary)
+
+        self.after(1000, self.refresh_transfers)
+
+    def open_forwarded_launch(self, argv, cwd):
+        """Act on the arguments of a launch handed over by another process"""
+        parser = argparse.ArgumentParser(add_help=False)
+        parser.add_argument('--folder')
+        args, _ = parser.parse_known_args(argv)
+        if args.folder:
+            folder = os.path.abspath(os.path.join(cwd, args.folder))
+            if not os.path.isdir(folder):
+                messagebox.showerror("Error", f"Folder not found:\n{folder}")
+            elif self.is_server_running or self.server_busy:
+                # Switch the share in place; clients keep their connections and URL
+                self.flask_server.set_folder(folder)
+                if self.is_server_running:
+                    self.show_server_folder()
+                log_event(f"Now sharing {folder}", root=self.flask_server.default_root.name)
+            else:
+                self.toggle_server(folder_path=folder)
+        self.deiconify()
+        self.lift()
+        self.focus_force()
+
+    def cancel_selected_job(self):
+        for job_id in self.jobs_tree.selection():
+            self.flask_server.jobs.cancel(job_id)
+
+    def destroy(self):
+        # Don't leave file operations running behind a closed window
+        self.flask_server.jobs.shutdown()
+        self.flask_server.media.shutdown()
+        self.flask_server.peers.shutdown()
+        for mirror_id in list(self.flask_server.mirrors):
+            self.flask_server.remove_mirror(mirror_id)
+        if self.flask_server.access_log:
+            self.flask_server.access_log.close()
+        self.stall_monitor.stop()
+        self.tasks.shutdown()
+        if self.instance:
+            self.instance.close()
+        super().destroy()
+
     def apply_settings(self):
+        # The splash screen already started the server, or tried to
+        if self.warmup and self.warmup.server_ip:
+            self.after_idle(lambda: self._on_server_started(self.warmup.server_ip))
+        elif self.warmup and self.warmup.server_error:
+            self.after_idle(lambda: self._on_server_start_failed(self.warmup.server_error))
         # If folder was specified, start server pointing to that folder
-        if self.start_folder:
+        elif self.start_folder:
             self.after(500, lambda: self.toggle_server(folder_path=self.start_folder))
         # Otherwise check if autostart is enabled
         elif self.settings.get('autostart_server', False) and not self.is_server_running:
             self.after(1000, self.toggle_server)  # Start server after a delay
 
+    def on_setting_changed(self, key, value):
+        """Apply settings that can change while the server is running"""
+        if key == 'block_cache_mb':
+            self.flask_server.block_cache.set_budget(int(value * 1024 * 1024))
+        elif key == 'upload_concurrency':
+            self.flask_server.upload_concurrency = max(1, int(value))
+        elif key == 'ignore_patterns':
+            self.flask_server.set_ignore_patterns(DEFAULT_IGNORE_PATTERNS if value is None else value)
+        elif key == 'transfer_limits':
+            self.flask_server.admission.set_limits(dict(DEFAULT_TRANSFER_LIMITS, **(value or {})))
+        elif key in ('network_profile', 'network_overrides'):
+            try:
+                self.flask_server.network_profile = network_profile(self.settings.get('network_profile', 'lan'),
+                                                                    self.settings.get('network_overrides'))
+            except ValueError as e:
+                print(f"Ignoring network settings: {e}")
+
     def on_resize(self, event):
         # Adjust QR container height based on window size
         if hasattr(self, 'qr_container'):
             # Calculate proportional height
             window_height = self.winfo_height()
             new_height = max(250, int(window_height * 0.4))
-            self.qr_container.configure(height=new_height)
+            if int(self.qr_container.cget('height')) != new_height:
+                self.qr_container.configure(height=new_height)
+                # Refit the QR code once resizing settles
+                if self.server_url:
+                    if self.qr_resize_job:
+                        self.after_cancel(self.qr_resize_job)
+                    self.qr_resize_job = self.after(150, lambda: self.generate_qr(self.server_url))
 
     def show_about(self):
         about_window = AboutWindow(self)
@@ -1602,6 +6935,10 @@ class MainWindow(tk.Tk):
         about_window.grab_set()
         about_window.transient(self)
         
+    def show_shared_folders(self):
+        shared_window = SharedFoldersWindow(self, self.flask_server, self.settings)
+        shared_window.focus_force()
+
     def show_settings(self):
         settings_window = SettingsWindow(self, self.settings)
         settings_window.focus_force()
@@ -1617,107 +6954,119 @@ class MainWindow(tk.Tk):
             webbrowser.open(self.server_url)
 
     def get_local_ip(self):
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(('8.8.8.8', 80))
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
-        except:
-            return 'localhost'
+        return local_ip_address()
 
     def generate_qr(self, url):
-        # Create a QR code with Krishna blue fill
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,  # Increased error correction
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(url)
-        qr.make(fit=True)
-        
-        qr_image = qr.make_image(fill_color=ModernStyle.PRIMARY, back_color="white")
-        
         # Determine appropriate size based on container
-        self.qr_container.update()
-        container_height = self.qr_container.winfo_height()
-        qr_size = min(container_height - 40, 300)  # Leave space for instruction text
-        
-        # Resize for display with high quality
-        qr_image = qr_image.resize((qr_size, qr_size), Image.Resampling.LANCZOS)
-        
-        # Convert to PhotoImage
-        qr_photo = ImageTk.PhotoImage(qr_image)
+        qr_size = qr_display_size(int(self.qr_container.cget('height')))
+        key = (url, qr_size)
         
+        if key in self.qr_photos:
+            self.show_qr(key)
+        else:
+            # Render on a worker; only the PhotoImage has to be made on the Tk thread
+            def show_rendered(qr_image):
+                if len(self.qr_photos) >= 8:
+                    self.qr_photos.clear()
+                self.qr_photos[key] = ImageTk.PhotoImage(qr_image)
+                self.show_qr(key)
+            self.tasks.submit(self.qr_cache.render, url, qr_size, on_done=show_rendered)
+
+    def show_qr(self, key):
+        # Ignore renders that finished after the server stopped or moved
+        if key[0] != self.server_url:
+            return
+        qr_photo = self.qr_photos[key]
         # Update UI
         self.qr_placeholder.pack_forget()
         self.qr_frame.pack(expand=True)
         self.qr_label.configure(image=qr_photo)
         self.qr_label.image = qr_photo  # Keep a reference
 
+    def set_server_busy(self, message):
+        self.server_busy = True
+        self.server_btn.configure(state="disabled")
+        self.status_text.configure(text=message)
+
     def toggle_server(self, folder_path=None):
+        if self.server_busy:
+            return  # A start or stop is already in progress
         if not self.is_server_running:
-            # Start server
-            try:
-                # Update folder path if specified
-                if folder_path and os.path.exists(folder_path):
-                    self.flask_server.set_folder(folder_path)
-                    
-                # Start the Flask server
-                if self.flask_server.start(host='0.0.0.0', port=5000):
-                    self.is_server_running = True
-                    self.server_btn.configure(text='Stop Server', bg='#DC3545')
-                    self.status_indicator.itemconfig(1, fill="#4CAF50")  # Green
-                    
-                    # Update status text to show folder
-                    current_folder = self.flask_server.upload_folder
-                    path_text = current_folder if len(current_folder) < 30 else f"...{current_folder[-30:]}"
-                    self.status_text.configure(text=f"Server is online (Folder: {path_text})")
-                    
-                    # Update URL and QR code
-                    ip = self.get_local_ip()
-                    self.server_url = f'http://{ip}:5000'
-                    self.url_label.configure(text=f'Server address: {self.server_url}')
-                    self.generate_qr(self.server_url)
-                    
-                    # Update system tray with delayed call to avoid threading issues
-                    self.after(100, lambda: self.tray_icon.update_server_status(True, self.server_url))
-                    
-                    # Enable URL buttons
-                    self.copy_url_btn.configure(state="normal")
-                    self.open_browser_btn.configure(state="normal")
-                    
-                    messagebox.showinfo("Server Status", f"Server started successfully!\nAccess at: {self.server_url}")
-                else:
-                    messagebox.showerror("Server Error", "Could not start server")
-                
-            except Exception as e:
-                messagebox.showerror('Error', f'Failed to start server: {str(e)}')
+            # Update folder path if specified
+            if folder_path and os.path.exists(folder_path):
+                self.flask_server.set_folder(folder_path)
+            self.set_server_busy("Starting server...")
+            self.tasks.submit(self._start_server_task, on_done=self._on_server_started,
+                              on_error=self._on_server_start_failed)
         else:
-            # Stop server
-            try:
-                self.flask_server.stop()
-                # Reset UI
-                self.is_server_running = False
-                self.server_btn.configure(text='Start Server', bg=ModernStyle.PRIMARY)
-                self.status_indicator.itemconfig(1, fill="gray")
-                self.status_text.configure(text="Server is offline")
-                self.url_label.configure(text='')
-                
-                # Update system tray with delayed call to avoid threading issues
-                self.after(100, lambda: self.tray_icon.update_server_status(False))
-                
-                # Disable URL buttons
-                self.copy_url_btn.configure(state="disabled")
-                self.open_browser_btn.configure(state="disabled")
-                self.server_url = None
-                
-                # Reset QR code
-                self.qr_frame.pack_forget()
-                self.qr_placeholder.pack(expand=True)
-            except Exception as e:
-                messagebox.showerror("Server Error", f"Error stopping server: {str(e)}")
+            self.set_server_busy("Stopping server...")
+            self.tasks.submit(self.flask_server.stop, on_done=self._on_server_stopped,
+                              on_error=self._on_server_stop_failed)
+
+    def _start_server_task(self):
+        """Runs on a worker: bind the server and work out the LAN address"""
+        if not self.flask_server.start(host='0.0.0.0', port=self.port):
+            raise RuntimeError(self.flask_server.start_error or "Could not start server")
+        return self.get_local_ip()
+
+    def _on_server_started(self, ip):
+        self.server_busy = False
+        self.is_server_running = True
+        self.server_btn.configure(text='Stop Server', bg='#DC3545', state="normal")
+        self.status_indicator.itemconfig(1, fill="#4CAF50")  # Green
+        self.show_server_folder()
+        
+        # Update URL and QR code
+        self.server_url = f'http://{ip}:{self.port}'
+        self.url_label.configure(text=f'Server address: {self.server_url}')
+        self.generate_qr(self.server_url)
+        
+        # Update system tray with delayed call to avoid threading issues
+        self.after(100, lambda: self.tray_icon.update_server_status(True, self.server_url))
+        
+        # Enable URL buttons
+        self.copy_url_btn.configure(state="normal")
+        self.open_browser_btn.configure(state="normal")
+        
+        messagebox.showinfo("Server Status", f"Server started successfully!\nAccess at: {self.server_url}")
+
+    def show_server_folder(self):
+        # Update status text to show folder
+        current_folder = self.flask_server.upload_folder
+        path_text = current_folder if len(current_folder) < 30 else f"...{current_folder[-30:]}"
+        self.status_text.configure(text=f"Server is online (Folder: {path_text})")
+
+    def _on_server_start_failed(self, error):
+        self.server_busy = False
+        self.server_btn.configure(state="normal")
+        self.status_text.configure(text="Server is offline")
+        messagebox.showerror('Error', f'Failed to start server: {str(error)}')
+
+    def _on_server_stopped(self, _result=None):
+        # Reset UI
+        self.server_busy = False
+        self.is_server_running = False
+        self.server_btn.configure(text='Start Server', bg=ModernStyle.PRIMARY, state="normal")
+        self.status_indicator.itemconfig(1, fill="gray")
+        self.status_text.configure(text="Server is offline")
+        self.url_label.configure(text='')
+        
+        # Update system tray with delayed call to avoid threading issues
+        self.after(100, lambda: self.tray_icon.update_server_status(False))
+        
+        # Disable URL buttons
+        self.copy_url_btn.configure(state="disabled")
+        self.open_browser_btn.configure(state="disabled")
+        self.server_url = None
+        
+        # Reset QR code
+        self.qr_frame.pack_forget()
+        self.qr_placeholder.pack(expand=True)
+
+    def _on_server_stop_failed(self, error):
+        self.server_busy = False
+        self.server_btn.configure(state="normal")
+        messagebox.showerror("Server Error", f"Error stopping server: {str(error)}")
 
     def stop_server(self):
         """Stop the Flask server"""
@@ -1776,12 +7125,35 @@ class MainWindow(tk.Tk):
 
 if __name__ == '__main__':
     # Parse command line arguments
-    import argparse
     parser = argparse.ArgumentParser(description='LocalDrive Server')
     parser.add_argument('--folder', help='Start server with specified folder')
     parser.add_argument('--server-only', action='store_true', help='Run in server-only mode without GUI')
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind the server to (default: 0.0.0.0)')
-    parser.add_argument('--port', type=int, default=5000, help='Port to run the server on (default: 5000)')
+    parser.add_argument('--port', type=int, help='Port to run the server on (default: 5000)')
+    parser.add_argument('--share', action='append', default=[], metavar='FOLDER',
+                        help='Share an extra folder under /r/<name>/ (can be repeated)')
+    parser.add_argument('--peer', action='append', default=[], metavar='URL',
+                        help='Browse another LocalDrive node under /peer/<name>/ (can be repeated)')
+    parser.add_argument('--peer-redirect', action='store_true',
+                        help='Redirect peer downloads to the owning node instead of proxying them')
+    parser.add_argument('--mirror-from', action='append', default=[], metavar='URL',
+                        help='Keep the shared folder a one-way mirror of another node (can be repeated)')
+    parser.add_argument('--mirror-interval', type=int, default=300,
+                        help='Seconds between mirror runs (default: 300)')
+    parser.add_argument('--mirror-keep-deleted', action='store_true',
+                        help='Keep files in the mirror after they are deleted on the source')
+    parser.add_argument('--catalog-dir', default=os.path.join(APP_DIR, 'catalog'),
+                        help='Folder for the persistent share catalogs (default: catalog next to the program)')
+    parser.add_argument('--no-catalog', action='store_true', help='Do not keep an on-disk catalog of the shares')
+    parser.add_argument('--access-log', default=os.path.join(APP_DIR, 'logs', 'access.log'), metavar='PATH',
+                        help='Write requests as JSON lines to this file (default: logs/access.log next to the program)')
+    parser.add_argument('--no-access-log', action='store_true',
+                        help="Keep Werkzeug's plain request log instead of the JSON access log")
+    parser.add_argument('--transfer-limit', action='append', default=[], metavar='CLASS=N',
+                        help='Concurrent stream, download, upload, archive, text or details requests (can be repeated, 0 lifts it)')
+    parser.add_argument('--network-profile', choices=sorted(NETWORK_PROFILES), default='lan',
+                        help='Socket buffers, timeouts and backlog to serve with (default: lan)')
+    parser.add_argument('--cache-mb', type=int, default=64, help='Memory for the hot file block cache in MB (default: 64, 0 disables)')
     args = parser.parse_args()
     
     # Get upload folder
@@ -1793,8 +7165,25 @@ if __name__ == '__main__':
         # Run in standalone server mode (no GUI)
         print(f"Starting LocalDrive in server-only mode")
         print(f"Serving files from: {upload_folder}")
-        server = FlaskServerThread(upload_folder=upload_folder)
-        server.run_standalone(host=args.host, port=args.port)
+        server = FlaskServerThread(upload_folder=upload_folder, block_cache_mb=args.cache_mb,
+                                   catalog_dir=None if args.no_catalog else args.catalog_dir,
+                                   access_log_path=None if args.no_access_log else args.access_log)
+        for folder in args.share:
+            server.add_root(folder)
+        for url in args.peer:
+            server.peers.add(url)
+        server.peer_redirect = args.peer_redirect
+        limits = {}
+        for spec in args.transfer_limit:
+            name, _, limit = spec.partition('=')
+            if name not in DEFAULT_TRANSFER_LIMITS or not limit.isdigit():
+                parser.error(f"--transfer-limit expects one of {', '.join(DEFAULT_TRANSFER_LIMITS)}=N, got {spec}")
+            limits[name] = int(limit)
+        server.admission.set_limits(limits)
+        server.network_profile = network_profile(args.network_profile)
+        for url in args.mirror_from:
+            server.add_mirror(url, delete=not args.mirror_keep_deleted, interval=args.mirror_interval)
+        server.run_standalone(host=args.host, port=args.port or 5000)
     else:
         # Check if UPLOAD_FOLDER environment variable is set (compatibility with old app.py)
         env_folder = os.environ.get('UPLOAD_FOLDER')
@@ -1802,11 +7191,20 @@ if __name__ == '__main__':
             upload_folder = os.path.abspath(env_folder)
             print(f"Using folder from environment variable: {upload_folder}")
             
+        # Another launch may have become the running instance since the check at the top
+        instance = InstanceListener.claim()
+        if instance is None:
+            # It may still be writing its token file
+            for _ in range(20):
+                if forward_to_running_instance(sys.argv[1:]):
+                    sys.exit(0)
+                time.sleep(0.1)
+
         # Run in GUI mode
         if args.folder:
-            app = MainWindow(show_window=True, start_folder=upload_folder)
+            app = MainWindow(show_window=True, start_folder=upload_folder, port=args.port, instance=instance)
             app.mainloop()
         else:
             # Normal startup with splash screen
-            splash = SplashScreen()
+            splash = SplashScreen(instance=instance)
             splash.mainloop()
@@ -0,0 +1,69 @@
+import mimetypes
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+# launcher_win.py lives at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load the MIME types before any stand-in winreg exists; mimetypes reads the registry when it can import it
+mimetypes.init()
+
+# The registry and the tray icon are only used by the desktop app, so elsewhere stand-ins are enough to import it
+if 'winreg' not in sys.modules:
+    try:
+        import winreg  # noqa: F401
+    except ImportError:
+        winreg = types.ModuleType('winreg')
+        winreg.HKEY_CURRENT_USER = winreg.HKEY_CLASSES_ROOT = winreg.KEY_WRITE = winreg.REG_SZ = 0
+        sys.modules['winreg'] = winreg
+try:
+    import pystray  # noqa: F401
+except Exception:  # Not installed, or no display backend to load
+    pystray = types.ModuleType('pystray')
+    pystray.Icon = pystray.MenuItem = pystray.Menu = lambda *args, **kwargs: None
+    sys.modules['pystray'] = pystray
+
+import launcher_win  # noqa: E402
+
+
+@pytest.fixture
+def server(tmp_path):
+    """A FlaskServerThread sharing an empty folder, without the on-disk catalog"""
+    share = tmp_path / 'share'
+    share.mkdir()
+    flask_server = launcher_win.FlaskServerThread(str(share))
+    yield flask_server
+    for root in flask_server.list_roots():
+        root.close()
+
+
+@pytest.fixture
+def share(server):
+    """Path of the server's shared folder"""
+    return server.default_root.path
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """Another node: a FlaskServerThread listening on a local port, for peer and mirror tests"""
+    from werkzeug.serving import make_server
+    folder = tmp_path / 'remote'
+    folder.mkdir()
+    node = launcher_win.FlaskServerThread(str(folder))
+    httpd = make_server('127.0.0.1', 0, node.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    node.url = f"http://127.0.0.1:{httpd.server_port}"
+    yield node
+    httpd.shutdown()
+    for root in node.list_roots():
+        root.close()
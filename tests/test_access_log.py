@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+
+import launcher_win
+from launcher_win import AccessLog, log_event
+
+
+def records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_as_json_lines(tmp_path):
+    path = str(tmp_path / 'logs' / 'access.log')
+    log = AccessLog(path, flush_interval=0.05)
+    for i in range(600):
+        log.log({'type': 'access', 'n': i})
+    log.close()
+    assert [record['n'] for record in records(path)] == list(range(600))
+    assert log.stats()['written'] == 600 and log.stats()['dropped'] == 0
+
+
+def test_the_file_rotates_by_size(tmp_path):
+    path = str(tmp_path / 'access.log')
+    log = AccessLog(path, max_bytes=2000, backups=2, batch_size=10, flush_interval=0.05)
+    for i in range(500):
+        log.log({'type': 'access', 'n': i, 'padding': 'x' * 40})
+    log.close()
+    # Only the two newest backups are kept, each rotated just past the size limit
+    assert set(os.listdir(str(tmp_path))) - {'access.log'} == {'access.log.1', 'access.log.2'}
+    assert os.path.getsize(path + '.1') < 2000 + 10 * 100
+    assert records(path + '.2')[-1]['n'] + 1 == records(path + '.1')[0]['n']
+    newest = records(path) if os.path.exists(path) else records(path + '.1')
+    assert newest[-1]['n'] == 499
+
+
+def test_a_full_queue_drops_and_counts(tmp_path):
+    log = AccessLog(str(tmp_path / 'access.log'), queue_size=1)
+    log.stopped.set()
+    log.thread.join(timeout=5)  # Nothing drains the queue now
+    log.log({'n': 1})
+    log.log({'n': 2})
+    log.log({'n': 3})
+    assert log.stats()['dropped'] == 2
+
+
+def test_sampling_keeps_errors_and_counts_what_it_skips(tmp_path):
+    log = AccessLog(str(tmp_path / 'access.log'), sample_rates={'/stream': 0.0})
+    try:
+        assert log.sample_rate('/list', 200) == 1.0
+        assert log.sample_rate('/stream', 500) == 1.0
+
+        def sample():
+            for _ in range(1000):
+                log.sample_rate('/stream', 206)
+
+        threads = [threading.Thread(target=sample) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert log.stats()['sampled_out'] == 8000
+    finally:
+        log.close()
+
+
+def test_events_go_to_the_active_log(tmp_path, capsys):
+    path = str(tmp_path / 'access.log')
+    log = AccessLog(path, flush_interval=0.05)
+    AccessLog.active = log
+    log_event("Something happened", level='warning', root='share')
+    log.close()
+    assert AccessLog.active is None
+    [record] = records(path)
+    assert (record['type'], record['level'], record['root']) == ('event', 'warning', 'share')
+    assert 'Something happened' in capsys.readouterr().out
+    log_event("Printed directly")
+    assert capsys.readouterr().out == "Printed directly\n"
+
+
+def test_requests_are_logged_by_route(tmp_path):
+    share = tmp_path / 'share'
+    share.mkdir()
+    (share / 'a.txt').write_bytes(b'hello')
+    path = str(tmp_path / 'access.log')
+    server = launcher_win.FlaskServerThread(str(share), access_log_path=path)
+    try:
+        client = server.app.test_client()
+        with client.get('/download/a.txt') as response:
+            assert response.get_data() == b'hello'
+        with client.get('/r/share/api/list?path=') as response:
+            assert response.status_code == 200
+    finally:
+        server.access_log.close()
+        for root in server.list_roots():
+            root.close()
+    access = [record for record in records(path) if record['type'] == 'access']
+    assert [(record['route'], record['status']) for record in access] == \
+        [('/download/<path:filename>', 200), ('/api/list', 200)]
+    assert access[0]['bytes'] == 5 and access[1]['root'] == 'share'
+
+
+def test_the_default_log_sits_next_to_the_program():
+    assert AccessLog.__init__.__defaults__[0] == os.path.join(launcher_win.APP_DIR, 'logs', 'access.log')
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+import pytest
+
+from launcher_win import AdmissionController
+
+
+@pytest.fixture
+def data(share):
+    content = os.urandom(1000)
+    with open(os.path.join(share, 'data.bin'), 'wb') as f:
+        f.write(content)
+    return content
+
+
+def test_requests_over_the_limit_wait_for_a_slot():
+    admission = AdmissionController({'download': 1}, max_wait=2.0)
+    assert admission.acquire('download')
+    threading.Timer(0.1, admission.release, args=('download',)).start()
+    started = time.monotonic()
+    assert admission.acquire('download')
+    assert 0.05 < time.monotonic() - started < 1.5
+    admission.release('download')
+    assert admission.stats()['download'] == {'limit': 1, 'active': 0, 'waiting': 0, 'rejected': 0}
+
+
+def test_a_full_queue_turns_requests_away_at_once():
+    admission = AdmissionController({'upload': 1}, max_wait=5.0, queue_factor=0)
+    assert admission.acquire('upload')
+    started = time.monotonic()
+    assert not admission.acquire('upload')
+    assert time.monotonic() - started < 0.5
+    assert admission.stats()['upload']['rejected'] == 1
+    admission.release('upload')
+
+
+def test_zero_and_unknown_classes_are_not_limited():
+    admission = AdmissionController({'stream': 0}, max_wait=0.01)
+    assert all(admission.acquire('stream') for _ in range(50))
+    assert admission.acquire('something-else')
+    assert admission.retry_after('stream') == 1
+
+
+def test_busy_downloads_get_a_503_with_retry_after(server, client, data):
+    server.admission.set_limits({'download': 1})
+    server.admission.max_wait = 0.05
+    assert server.admission.acquire('download')
+    try:
+        response = client.get('/download/data.bin', headers={'Accept': 'application/json'})
+        assert response.status_code == 503 and response.headers['Retry-After']
+        assert response.get_json()['retry_after'] >= 1
+        page = client.get('/download/data.bin', headers={'Accept': 'text/html'})
+        assert page.status_code == 503 and page.mimetype == 'text/html'
+    finally:
+        server.admission.release('download')
+    with client.get('/download/data.bin') as response:
+        assert response.data == data
+
+
+def test_head_releases_the_transfer_slot(server, client, data):
+    for _ in range(20):
+        with client.head('/download/data.bin') as response:
+            assert response.status_code == 200
+            assert response.data == b''
+    assert server.admission.stats()['download']['active'] == 0
+    with client.get('/download/data.bin') as response:
+        assert response.data == data
+    assert server.admission.stats()['download']['active'] == 0
+
+
+def test_not_modified_releases_the_transfer_slot(server, client, data):
+    with client.get('/download/data.bin') as response:
+        etag = response.headers['ETag']
+    for _ in range(20):
+        with client.get('/download/data.bin', headers={'If-None-Match': etag}) as response:
+            assert response.status_code == 304
+    assert server.admission.stats()['download']['active'] == 0
@@ -0,0 +1,104 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from launcher_win import ArchiveIndex, ArchiveIndexCache
+
+DATA = bytes(range(256)) * 2000  # Half a megabyte, so reads cross READ_SIZE
+
+
+def make_zip(path):
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr(zipfile.ZipInfo('docs/'), b'')
+        archive.writestr('docs/stored.bin', DATA, compress_type=zipfile.ZIP_STORED)
+        archive.writestr('docs/deflated.bin', DATA, compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr('docs/sub/bzip.bin', DATA, compress_type=zipfile.ZIP_BZIP2)
+        archive.writestr('readme.txt', b'hello')
+
+
+def make_tar(path, mode='w'):
+    with tarfile.open(path, mode) as archive:
+        for name, data in (('pkg/data.bin', DATA), ('pkg/readme.txt', b'hello')):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 1700000000
+            archive.addfile(info, io.BytesIO(data))
+
+
+def read(index, name, start=0, length=None):
+    size = index.members[name]['size']
+    return b''.join(index.read(name, start, size - start if length is None else length))
+
+
+def test_zip_members_are_listed_per_folder(tmp_path):
+    path = str(tmp_path / 'a.zip')
+    make_zip(path)
+    index = ArchiveIndex(path)
+    assert index.kind == 'zip'
+    assert [(e['name'], e['type']) for e in index.list('')] == [('docs', 'folder'), ('readme.txt', 'file')]
+    entries = {e['name']: e for e in index.list('docs')}
+    assert entries['stored.bin']['size'] == len(DATA)
+    # Folders only implied by member names still show up
+    assert entries['sub']['type'] == 'folder' and entries['sub']['path'] == 'docs/sub'
+
+
+@pytest.mark.parametrize('name', ['docs/stored.bin', 'docs/deflated.bin', 'docs/sub/bzip.bin'])
+def test_zip_members_are_read_whole_and_in_ranges(tmp_path, name):
+    path = str(tmp_path / 'a.zip')
+    make_zip(path)
+    index = ArchiveIndex(path)
+    assert read(index, name) == DATA
+    assert read(index, name, 300000, 1000) == DATA[300000:301000]
+
+
+@pytest.mark.parametrize('mode', ['w', 'w:gz'])
+def test_tar_members_are_read_whole_and_in_ranges(tmp_path, mode):
+    path = str(tmp_path / 'a.tar')
+    make_tar(path, mode)
+    index = ArchiveIndex(path)
+    assert index.kind == 'tar'
+    assert [e['name'] for e in index.list('pkg')] == ['data.bin', 'readme.txt']
+    # Plain TARs are served from the byte range in place
+    assert (index.members['pkg/data.bin']['data_offset'] is not None) == (mode == 'w')
+    assert read(index, 'pkg/data.bin') == DATA
+    assert read(index, 'pkg/data.bin', 1000, 10) == DATA[1000:1010]
+
+
+def test_other_files_are_refused(tmp_path):
+    path = str(tmp_path / 'plain.txt')
+    with open(path, 'w') as f:
+        f.write('not an archive')
+    with pytest.raises(ValueError):
+        ArchiveIndex(path)
+
+
+def test_the_cache_reindexes_a_changed_archive(tmp_path):
+    path = str(tmp_path / 'a.zip')
+    make_zip(path)
+    cache = ArchiveIndexCache()
+    first = cache.get(path)
+    assert cache.get(path) is first
+    with zipfile.ZipFile(path, 'a') as archive:
+        archive.writestr('new.txt', b'new')
+    assert 'new.txt' in cache.get(path).members
+
+
+def test_archive_endpoints(client, share):
+    make_zip(os.path.join(share, 'a.zip'))
+    data = client.get('/api/archive/list?path=a.zip&prefix=docs').get_json()
+    assert data['type'] == 'zip' and data['members'] == 5
+    assert {e['name'] for e in data['entries']} == {'stored.bin', 'deflated.bin', 'sub'}
+
+    with client.get('/api/archive/get?path=a.zip&member=docs/deflated.bin',
+                    headers={'Range': 'bytes=100-199'}) as response:
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == f'bytes 100-199/{len(DATA)}'
+        assert response.get_data() == DATA[100:200]
+    with client.get('/api/archive/get?path=a.zip&member=readme.txt') as response:
+        assert response.status_code == 200 and response.get_data() == b'hello'
+    assert client.get('/api/archive/get?path=a.zip&member=missing').status_code == 404
+    assert client.get('/api/archive/get?path=a.zip&member=docs').status_code == 400
+    assert client.get('/api/archive/list?path=nothing.zip').status_code == 404
@@ -0,0 +1,82 @@
+import os
+import time
+
+
+def write(path, text='x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def test_mixed_operations_report_one_result_each(client, share):
+    write(os.path.join(share, 'a.txt'))
+    write(os.path.join(share, 'b.txt'))
+    write(os.path.join(share, 'old', 'inner.txt'))
+    os.mkdir(os.path.join(share, 'dest'))
+    response = client.post('/api/batch', json={'operations': [
+        {'op': 'delete', 'path': 'a.txt'},
+        {'op': 'move', 'path': 'b.txt', 'dest': 'dest'},
+        {'op': 'rename', 'path': 'old', 'new_name': 'new'},
+    ]})
+    body = response.get_json()
+    assert body['status'] == 'success' and body['succeeded'] == 3
+    assert [result['index'] for result in body['results']] == [0, 1, 2]
+    assert sorted(os.listdir(share)) == ['dest', 'new']
+    assert os.listdir(os.path.join(share, 'dest')) == ['b.txt']
+
+
+def test_failures_are_reported_per_operation(client, share):
+    write(os.path.join(share, 'a.txt'))
+    write(os.path.join(share, 'b.txt'))
+    body = client.post('/api/batch', json={'operations': [
+        {'op': 'delete', 'path': 'missing.txt'},
+        {'op': 'rename', 'path': 'a.txt', 'new_name': 'b.txt'},
+        {'op': 'rename', 'path': 'a.txt', 'new_name': '../escape.txt'},
+        {'op': 'delete', 'path': '../outside'},
+        {'op': 'explode', 'path': 'a.txt'},
+        {'op': 'delete', 'path': ''},
+    ]}).get_json()
+    assert body['status'] == 'error' and body['failed'] == 6
+    assert all(result['error'] for result in body['results'])
+    assert sorted(os.listdir(share)) == ['a.txt', 'b.txt']
+
+
+def test_partial_success(client, share):
+    write(os.path.join(share, 'a.txt'))
+    body = client.post('/api/batch', json={'operations': [
+        {'op': 'delete', 'path': 'a.txt'}, {'op': 'delete', 'path': 'a.txt'}]}).get_json()
+    assert body['status'] == 'partial' and body['succeeded'] == 1
+
+
+def test_moving_a_folder_into_itself_is_refused(client, share):
+    write(os.path.join(share, 'tree', 'sub', 'f.txt'))
+    body = client.post('/api/batch', json={'operations': [
+        {'op': 'move', 'path': 'tree', 'dest': 'tree/sub'}]}).get_json()
+    assert body['failed'] == 1
+    assert os.path.exists(os.path.join(share, 'tree', 'sub', 'f.txt'))
+
+
+def test_bad_payload(client):
+    assert client.post('/api/batch', json={'operations': 'delete'}).status_code == 400
+
+
+def test_listing_reflects_the_batch(client, share):
+    write(os.path.join(share, 'a.txt'))
+    assert [item['name'] for item in client.get('/api/list').get_json()['items']] == ['a.txt']
+    client.post('/api/batch', json={'operations': [{'op': 'rename', 'path': 'a.txt', 'new_name': 'b.txt'}]})
+    assert [item['name'] for item in client.get('/api/list').get_json()['items']] == ['b.txt']
+
+
+def test_background_batch_runs_as_a_job(server, client, share):
+    for i in range(5):
+        write(os.path.join(share, f'f{i}.txt'))
+    response = client.post('/api/batch', json={'background': True, 'operations': [
+        {'op': 'delete', 'path': f'f{i}.txt'} for i in range(5)]})
+    assert response.status_code == 202
+    job = server.jobs.get(response.get_json()['job_id'])
+    deadline = time.monotonic() + 5
+    while job.is_active() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.status == 'completed'
+    assert job.result['succeeded'] == 5 and job.items_done == 5
+    assert os.listdir(share) == []
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+import pytest
+
+from launcher_win import ShareRoot
+
+
+def write(path, data=b''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def open_root(folder, catalog_dir):
+    root = ShareRoot('share', str(folder), str(catalog_dir))
+    deadline = time.monotonic() + 10
+    while root.catalog.reconciled is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert root.catalog.reconciled is not None
+    return root
+
+
+def mtime_ns(root, rel_dir):
+    return os.stat(root.resolve_path(rel_dir)).st_mtime_ns
+
+
+def by_name(items):
+    return sorted(items, key=lambda item: item['name'])
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / 'share'
+    write(str(folder / 'a.txt'), b'aaaa')
+    write(str(folder / 'docs' / 'report.pdf'), b'x' * 100)
+    write(str(folder / 'docs' / 'deep' / 'notes.txt'), b'y' * 10)
+    return folder
+
+
+@pytest.fixture
+def root(folder, tmp_path):
+    root = open_root(folder, tmp_path / 'catalog')
+    yield root
+    root.close()
+
+
+def test_reconcile_stores_listings_and_sizes(root):
+    for rel_dir in ('', 'docs', 'docs/deep'):
+        assert by_name(root.catalog.get_listing(rel_dir, mtime_ns(root, rel_dir))) == \
+            by_name(root.list_directory(rel_dir))
+    assert root.catalog.get_size('') == 114
+    assert root.catalog.get_size('docs') == 110
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink'), reason='needs symlinks')
+def test_linked_folders_are_catalogued_like_the_browser_lists_them(folder, tmp_path):
+    outside = tmp_path / 'outside'
+    write(str(outside / 'big.bin'), b'z' * 1000)
+    try:
+        os.symlink(str(outside), str(folder / 'linked'), target_is_directory=True)
+        # A link back up the tree is listed but not walked forever
+        os.symlink(str(folder), str(folder / 'docs' / 'loop'), target_is_directory=True)
+    except OSError:
+        pytest.skip('symlinks are not permitted here')
+    root = open_root(folder, tmp_path / 'catalog')
+    try:
+        for rel_dir in ('', 'docs', 'linked'):
+            assert by_name(root.catalog.get_listing(rel_dir, mtime_ns(root, rel_dir))) == \
+                by_name(root.list_directory(rel_dir))
+        assert root.catalog.get_size('linked') == 1000
+        assert root.catalog.get_size('') == 1114
+    finally:
+        root.close()
+
+
+def test_a_changed_folder_misses_until_refreshed(root, folder):
+    write(str(folder / 'docs' / 'new.txt'), b'n')
+    assert root.catalog.get_listing('docs', mtime_ns(root, 'docs')) is None
+    root.catalog.refresh('docs')
+    assert root.catalog.flush(timeout=5)
+    names = [item['name'] for item in root.catalog.get_listing('docs', mtime_ns(root, 'docs'))]
+    assert sorted(names) == ['deep', 'new.txt', 'report.pdf']
+
+
+def test_invalidate_drops_the_listing_and_parent_sizes(root):
+    root.catalog.invalidate('docs/deep')
+    assert root.catalog.flush(timeout=5)
+    assert root.catalog.get_listing('docs/deep', mtime_ns(root, 'docs/deep')) is None
+    assert root.catalog.get_size('docs') is None and root.catalog.get_size('') is None
+    assert root.catalog.get_listing('docs', mtime_ns(root, 'docs')) is not None
+
+
+def test_search_matches_names_anywhere_in_the_share(root):
+    results = root.catalog.search('NOTES')
+    assert [item['path'] for item in results] == ['docs/deep/notes.txt']
+    assert root.catalog.search('100%') == []
+
+
+def test_the_catalog_survives_a_restart(folder, tmp_path):
+    root = open_root(folder, tmp_path / 'catalog')
+    root.catalog.set_media('a.txt', (4, 1.0), {'kind': 'text'})
+    assert root.catalog.flush(timeout=5)
+    root.close()
+    root = ShareRoot('share', str(folder), str(tmp_path / 'catalog'))
+    try:
+        # Answered from disk before the new reconciliation has looked at anything
+        assert root.catalog.get_media('', ['a.txt']) == {'a.txt': ((4, 1.0), {'kind': 'text'})}
+        assert root.catalog.get_listing('docs', mtime_ns(root, 'docs')) is not None
+    finally:
+        root.close()
+
+
+def test_writes_from_many_threads_all_land(root):
+    def store(worker):
+        for i in range(50):
+            root.catalog.set_media(f"docs/{worker}-{i}.jpg", (i, float(i)), {'width': i})
+
+    threads = [threading.Thread(target=store, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert root.catalog.flush(timeout=10)
+    assert root.catalog.stats()['media'] == 400
+    assert root.catalog.get_media('docs', ['3-7.jpg']) == {'3-7.jpg': ((7, 7.0), {'width': 7})}
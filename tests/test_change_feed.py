@@ -0,0 +1,65 @@
+import os
+import time
+
+from launcher_win import ChangeFeed, FeedSubscription, ShareRoot
+
+
+def event(kind, path, size=1):
+    return {'type': kind, 'path': path, 'item': {'type': 'file', 'size': size, 'mtime': 1.0}}
+
+
+def test_events_for_the_same_path_are_merged():
+    subscription = FeedSubscription([''])
+    subscription.push('', [event('created', 'a'), event('modified', 'a', 2)], limit=10)
+    subscription.push('', [event('created', 'b'), event('deleted', 'b')], limit=10)
+    subscription.push('', [event('deleted', 'c'), event('created', 'c')], limit=10)
+    [batch] = subscription.drain()
+    changes = {change['path']: change for change in batch['changes']}
+    assert changes['a']['type'] == 'created' and changes['a']['item']['size'] == 2
+    assert 'b' not in changes
+    assert changes['c']['type'] == 'modified'
+    assert subscription.drain() == []
+
+
+def test_a_burst_over_the_limit_becomes_a_resync():
+    subscription = FeedSubscription(['docs'])
+    subscription.push('docs', [event('created', f'docs/{i}') for i in range(5)], limit=3)
+    subscription.push('docs', [event('created', 'docs/late')], limit=3)
+    assert subscription.drain() == [{'path': 'docs', 'resync': True, 'changes': []}]
+
+
+def test_only_subscribers_of_the_folder_are_told():
+    feed = ChangeFeed()
+    docs = feed.subscribe(['docs'])
+    music = feed.subscribe(['music/'])
+    assert feed.watched_dirs() == {'docs', 'music'}
+    feed.publish('docs/', [event('created', 'docs/a')])
+    assert docs.wait(0) and not music.wait(0)
+    feed.unsubscribe(music)
+    assert feed.watched_dirs() == {'docs'}
+
+
+def test_watcher_publishes_changes_in_watched_folders(tmp_path):
+    root = ShareRoot('share', str(tmp_path))
+    root.watcher.interval = 0.05
+    subscription = root.feed.subscribe([''])
+    try:
+        root.watcher.watch(subscription.dirs)
+        time.sleep(0.2)  # Let the baseline be taken
+        (tmp_path / 'new.txt').write_text('x')
+        root.invalidate([''])
+        assert subscription.wait(5)
+        deadline = time.monotonic() + 5
+        changes = []
+        while not changes and time.monotonic() < deadline:
+            changes = [c for batch in subscription.drain() for c in batch['changes']]
+            time.sleep(0.02)
+        assert [(c['type'], c['path']) for c in changes] == [('created', 'new.txt')]
+    finally:
+        root.close()
+
+
+def test_events_endpoint_streams_server_sent_events(client):
+    with client.get('/api/events?path=') as response:
+        assert response.mimetype == 'text/event-stream'
+        assert next(response.response) == b'retry: 3000\n\n'
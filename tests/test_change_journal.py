@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from launcher_win import ChangeJournal
+
+
+def created(path, size=1):
+    return {'type': 'created', 'path': path, 'item': {'type': 'file', 'size': size, 'mtime': 1.0}}
+
+
+def modified(path, size):
+    return {'type': 'modified', 'path': path, 'item': {'type': 'file', 'size': size, 'mtime': 2.0}}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = ChangeJournal(str(tmp_path / 'journal' / 'changes.db'))
+    yield journal
+    journal.close()
+
+
+def test_changes_after_a_token(journal):
+    start = journal.current_token()
+    journal.record('', [created('a'), created('b')])
+    result = journal.changes_since(start)
+    assert [change['path'] for change in result['changes']] == ['a', 'b']
+    assert result['token'] == journal.current_token()
+    assert journal.changes_since(result['token'])['changes'] == []
+
+
+def test_repeated_state_is_recorded_once(journal):
+    journal.record('', [created('a')])
+    journal.record('', [created('a')])
+    assert len(journal.changes_since(journal.token(0))['changes']) == 1
+
+
+def test_delete_and_create_of_the_same_item_is_a_rename(journal):
+    journal.record('', [created('old')])
+    token = journal.current_token()
+    journal.record('', [{'type': 'deleted', 'path': 'old', 'item': created('old')['item']}, created('new')])
+    [change] = journal.changes_since(token)['changes']
+    assert (change['type'], change['old_path'], change['path']) == ('renamed', 'old', 'new')
+
+
+def test_prefix_and_paging(journal):
+    start = journal.current_token()
+    journal.record('', [created('docs/a'), created('music/b'), created('docs/c')])
+    assert [c['path'] for c in journal.changes_since(start, prefix='docs')['changes']] == ['docs/a', 'docs/c']
+    page = journal.changes_since(start, limit=2)
+    assert page['more'] and len(page['changes']) == 2
+    assert not journal.changes_since(page['token'], limit=2)['more']
+
+
+def test_foreign_and_malformed_tokens_need_a_resync(journal):
+    journal.record('', [created('a')])
+    assert journal.changes_since('otherepoch.0') is None
+    assert journal.changes_since('garbage') is None
+    assert journal.changes_since(journal.token(99)) is None
+
+
+def test_epoch_and_history_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'changes.db')
+    first = ChangeJournal(path)
+    first.record('', [created('a')])
+    token = first.current_token()
+    first.close()
+    second = ChangeJournal(path)
+    assert second.current_token() == token
+    assert second.changes_since(token)['changes'] == []
+    second.close()
+
+
+def test_compaction_merges_superseded_changes(tmp_path):
+    journal = ChangeJournal(str(tmp_path / 'changes.db'), merge_after=0, compact_every=10 ** 9)
+    start = journal.current_token()
+    journal.record('', [created('a')])
+    journal.record('', [modified('a', 2)])
+    journal.record('', [modified('a', 3)])
+    time.sleep(0.01)
+    journal.compact()
+    [change] = journal.changes_since(start)['changes']
+    assert change['item']['size'] == 3
+    journal.close()
+
+
+def test_retention_raises_the_floor(tmp_path):
+    journal = ChangeJournal(str(tmp_path / 'changes.db'), max_entries=2, compact_every=10 ** 9)
+    start = journal.current_token()
+    journal.record('', [created(f'f{i}') for i in range(5)])
+    journal.compact()
+    assert journal.changes_since(start) is None
+    assert [c['path'] for c in journal.changes_since(journal.token(3))['changes']] == ['f3', 'f4']
+    journal.close()
+
+
+def test_token_stays_valid_after_retention_empties_the_journal(tmp_path):
+    journal = ChangeJournal(str(tmp_path / 'changes.db'), max_age=0, compact_every=10 ** 9)
+    journal.record('', [created('a'), created('b')])
+    time.sleep(0.01)
+    journal.compact()
+    token = journal.current_token()
+    assert token == journal.token(2)
+    assert journal.changes_since(token) == {'changes': [], 'token': token, 'more': False}
+    journal.record('', [created('c')])
+    assert [c['path'] for c in journal.changes_since(token)['changes']] == ['c']
+    journal.close()
@@ -0,0 +1,119 @@
+import errno
+import os
+import time
+
+import pytest
+
+import launcher_win
+from launcher_win import Job, copy_items, fast_copy_file, move_items
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    write(str(tmp_path / 'src' / 'tree' / 'a.bin'), os.urandom(3000))
+    write(str(tmp_path / 'src' / 'tree' / 'sub' / 'b.bin'), os.urandom(5000))
+    (tmp_path / 'dest').mkdir()
+    return tmp_path
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_fast_copy_file_copies_data_timestamps_and_reports_progress(tmp_path):
+    data = os.urandom(200000)
+    write(str(tmp_path / 'in.bin'), data)
+    os.utime(tmp_path / 'in.bin', (1_000_000_000, 1_000_000_000))
+    progress = []
+    assert fast_copy_file(str(tmp_path / 'in.bin'), str(tmp_path / 'out.bin'), progress.append, chunk_size=65536) == len(data)
+    assert read(tmp_path / 'out.bin') == data
+    assert sum(progress) == len(data)
+    assert int(os.path.getmtime(tmp_path / 'out.bin')) == 1_000_000_000
+
+
+def test_copy_items_copies_trees_and_counts_bytes(tree):
+    job = Job('copy', 'test')
+    copy_items(job, [str(tree / 'src' / 'tree')], str(tree / 'dest'))
+    assert read(tree / 'dest' / 'tree' / 'sub' / 'b.bin') == read(tree / 'src' / 'tree' / 'sub' / 'b.bin')
+    assert (job.items_total, job.items_done) == (2, 2)
+    assert job.bytes_total == job.bytes_done == 8000
+
+
+def test_copying_next_to_the_original_picks_a_new_name(tree):
+    source = str(tree / 'src' / 'tree' / 'a.bin')
+    copy_items(Job('copy', 'test'), [source, source], str(tree / 'src' / 'tree'))
+    assert sorted(os.listdir(tree / 'src' / 'tree')) == ['a (copy 2).bin', 'a (copy).bin', 'a.bin', 'sub']
+
+
+def test_copying_a_folder_into_itself_is_refused(tree):
+    with pytest.raises(ValueError):
+        copy_items(Job('copy', 'test'), [str(tree / 'src' / 'tree')], str(tree / 'src' / 'tree' / 'sub'))
+
+
+def test_links_to_folders_are_copied_as_links(tree):
+    outside = tree / 'outside'
+    outside.mkdir()
+    try:
+        os.symlink(str(outside), str(tree / 'src' / 'tree' / 'link'), target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip('Creating symlinks is not allowed here')
+    copy_items(Job('copy', 'test'), [str(tree / 'src' / 'tree')], str(tree / 'dest'))
+    assert os.readlink(tree / 'dest' / 'tree' / 'link') == str(outside)
+
+
+def test_move_renames_within_a_filesystem(tree):
+    job = Job('move', 'test')
+    assert move_items(job, [str(tree / 'src' / 'tree')], str(tree / 'dest')) == 1
+    assert not (tree / 'src' / 'tree').exists()
+    assert (tree / 'dest' / 'tree' / 'sub' / 'b.bin').exists()
+    assert job.bytes_total == 0
+
+
+def test_move_refuses_to_overwrite(tree):
+    (tree / 'dest' / 'tree').mkdir()
+    with pytest.raises(FileExistsError):
+        move_items(Job('move', 'test'), [str(tree / 'src' / 'tree')], str(tree / 'dest'))
+
+
+def test_move_across_filesystems_copies_then_deletes(tree, monkeypatch):
+    def cross_device(source, target):
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+    monkeypatch.setattr(launcher_win.os, 'rename', cross_device)
+    job = Job('move', 'test')
+    move_items(job, [str(tree / 'src' / 'tree')], str(tree / 'dest'))
+    assert not (tree / 'src' / 'tree').exists()
+    assert len(read(tree / 'dest' / 'tree' / 'sub' / 'b.bin')) == 5000
+    # The copy adds its bytes without replacing the move's own item count
+    assert (job.items_total, job.items_done) == (1, 1)
+    assert job.bytes_total == job.bytes_done == 8000
+
+
+def test_other_rename_errors_are_not_turned_into_a_copy(tree, monkeypatch):
+    def denied(source, target):
+        raise PermissionError(errno.EACCES, 'Access is denied')
+    monkeypatch.setattr(launcher_win.os, 'rename', denied)
+    with pytest.raises(PermissionError):
+        move_items(Job('move', 'test'), [str(tree / 'src' / 'tree')], str(tree / 'dest'))
+    assert (tree / 'src' / 'tree' / 'a.bin').exists()
+    assert not (tree / 'dest' / 'tree').exists()
+
+
+def test_copy_endpoint_runs_a_job(server, client, share):
+    write(os.path.join(share, 'docs', 'a.txt'), b'hello')
+    os.mkdir(os.path.join(share, 'backup'))
+    response = client.post('/api/copy', json={'paths': ['docs'], 'dest': 'backup'})
+    assert response.status_code == 202
+    job = server.jobs.get(response.get_json()['job_id'])
+    deadline = time.monotonic() + 5
+    while job.is_active() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.status == 'completed'
+    assert read(os.path.join(share, 'backup', 'docs', 'a.txt')) == b'hello'
+    assert client.post('/api/move', json={'paths': ['missing'], 'dest': 'backup'}).status_code == 404
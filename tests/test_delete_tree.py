@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from launcher_win import Job, delete_tree
+
+
+def make_link(target, link):
+    try:
+        os.symlink(target, link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip('Creating symlinks is not allowed here')
+
+
+@pytest.fixture
+def outside(tmp_path):
+    folder = tmp_path / 'outside'
+    folder.mkdir()
+    (folder / 'keep.txt').write_text('keep')
+    return folder
+
+
+def test_removes_the_whole_tree(tmp_path):
+    tree = tmp_path / 'tree'
+    (tree / 'a' / 'b').mkdir(parents=True)
+    (tree / 'a' / 'b' / 'file.txt').write_text('x' * 10)
+    (tree / 'top.txt').write_text('y')
+    job = Job('delete', 'test')
+    delete_tree(job, str(tree))
+    assert not tree.exists()
+    assert job.items_done == job.items_total
+
+
+def test_links_inside_are_removed_without_following_them(tmp_path, outside):
+    tree = tmp_path / 'tree'
+    (tree / 'sub').mkdir(parents=True)
+    make_link(str(outside), str(tree / 'sub' / 'link'))
+    delete_tree(Job('delete', 'test'), str(tree))
+    assert not tree.exists()
+    assert (outside / 'keep.txt').read_text() == 'keep'
+
+
+def test_refuses_a_link_or_a_file(tmp_path, outside):
+    link = tmp_path / 'link'
+    make_link(str(outside), str(link))
+    with pytest.raises(ValueError):
+        delete_tree(Job('delete', 'test'), str(link))
+    with pytest.raises(ValueError):
+        delete_tree(Job('delete', 'test'), str(outside / 'keep.txt'))
+    assert (outside / 'keep.txt').exists()
+    assert os.path.islink(link)
+
+
+def test_delete_route_removes_a_link_and_keeps_its_target(client, share, outside):
+    make_link(str(outside), os.path.join(share, 'link'))
+    response = client.post('/delete', data={'path': 'link'})
+    assert response.status_code == 200
+    assert not os.path.lexists(os.path.join(share, 'link'))
+    assert (outside / 'keep.txt').exists()
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from launcher_win import BlockCache
+
+
+@pytest.fixture
+def data(share):
+    content = os.urandom(1000)
+    with open(os.path.join(share, 'data.bin'), 'wb') as f:
+        f.write(content)
+    return content
+
+
+def test_whole_file(client, data):
+    response = client.get('/download/data.bin')
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['ETag']
+    assert response.headers['Last-Modified']
+
+
+@pytest.mark.parametrize('header, start, end', [
+    ('bytes=0-99', 0, 99),
+    ('bytes=900-', 900, 999),
+    ('bytes=-10', 990, 999),
+    ('bytes=990-5000', 990, 999),
+])
+def test_ranges(client, data, header, start, end):
+    response = client.get('/download/data.bin', headers={'Range': header})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes {start}-{end}/1000'
+    assert response.data == data[start:end + 1]
+
+
+@pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=50-10'])
+def test_unsatisfiable_range(client, data, header):
+    response = client.get('/download/data.bin', headers={'Range': header})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == 'bytes */1000'
+
+
+def test_malformed_range_sends_the_whole_file(client, data):
+    response = client.get('/download/data.bin', headers={'Range': 'lines=1-2'})
+    assert response.status_code == 200
+    assert response.data == data
+
+
+def test_stream_is_always_partial(client, data):
+    response = client.get('/stream/data.bin')
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 0-999/1000'
+
+
+def test_conditional_requests(client, data):
+    first = client.get('/download/data.bin')
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+    assert client.get('/download/data.bin', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/download/data.bin', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+
+def test_if_range(client, data):
+    etag = client.get('/download/data.bin').headers['ETag']
+    matching = client.get('/download/data.bin', headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert matching.status_code == 206
+    assert matching.data == data[:10]
+    # A validator of another version gets the whole current file instead of a piece of it
+    stale = client.get('/download/data.bin', headers={'Range': 'bytes=0-9', 'If-Range': '"older"'})
+    assert stale.status_code == 200
+    assert stale.data == data
+
+
+def test_changed_file_gets_a_new_etag(client, share, data):
+    with client.get('/download/data.bin') as response:
+        etag = response.headers['ETag']
+    with open(os.path.join(share, 'data.bin'), 'ab') as f:
+        f.write(b'more')
+    response = client.get('/download/data.bin', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.data == data + b'more'
+
+
+def write_file(tmp_path, name, size):
+    path = str(tmp_path / name)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    return path
+
+
+def test_block_cache_reads_any_range(tmp_path):
+    path = write_file(tmp_path, 'f.bin', 10000)
+    with open(path, 'rb') as f:
+        data = f.read()
+    cache = BlockCache(budget_bytes=64 * 1024, block_size=1024)
+    for start, length in [(0, 10000), (500, 2000), (9990, 10), (1024, 1024)]:
+        assert b''.join(cache.read(path, start, length)) == data[start:start + length]
+    assert cache.stats()['hits'] > 0
+
+
+def test_block_cache_never_serves_a_changed_file(tmp_path):
+    path = write_file(tmp_path, 'f.bin', 4096)
+    cache = BlockCache(budget_bytes=64 * 1024, block_size=1024)
+    b''.join(cache.read(path, 0, 4096))
+    new = os.urandom(5000)
+    with open(path, 'wb') as f:
+        f.write(new)
+    assert b''.join(cache.read(path, 0, 5000)) == new
+
+
+def test_block_cache_stays_within_budget_and_forgets_evicted_files(tmp_path):
+    cache = BlockCache(budget_bytes=4 * 1024, block_size=1024)
+    for i in range(50):
+        path = write_file(tmp_path, f'f{i}.bin', 2048)
+        b''.join(cache.read(path, 0, 2048))
+    stats = cache.stats()
+    assert stats['used_bytes'] <= 4 * 1024
+    assert stats['files'] <= 2
+    cache.set_budget(0)
+    assert cache.stats()['files'] == 0 and not cache.block_counts
+
+
+def test_blocks_read_twice_survive_a_scan(tmp_path):
+    cache = BlockCache(budget_bytes=8 * 1024, block_size=1024)
+    hot = write_file(tmp_path, 'hot.bin', 2048)
+    b''.join(cache.read(hot, 0, 2048))
+    b''.join(cache.read(hot, 0, 2048))  # Promoted to the protected segment
+    scan = write_file(tmp_path, 'scan.bin', 64 * 1024)
+    b''.join(cache.read(scan, 0, 64 * 1024))
+    hits = cache.stats()['hits']
+    b''.join(cache.read(hot, 0, 2048))
+    assert cache.stats()['hits'] == hits + 2
@@ -0,0 +1,70 @@
+from launcher_win import IgnoreRules
+
+
+def test_plain_name_matches_at_any_depth():
+    rules = IgnoreRules(['node_modules'])
+    assert rules.is_ignored('node_modules', is_dir=True)
+    assert rules.is_ignored('web/app/node_modules', is_dir=True)
+    assert not rules.is_ignored('web/node_modules_backup', is_dir=True)
+
+
+def test_wildcards_stay_within_one_segment():
+    rules = IgnoreRules(['*.log', 'cache-?'])
+    assert rules.is_ignored('logs/server.log')
+    assert rules.is_ignored('cache-1')
+    assert not rules.is_ignored('cache-10')
+    assert not rules.is_ignored('server.log.txt')
+
+
+def test_trailing_slash_only_matches_folders():
+    rules = IgnoreRules(['build/'])
+    assert rules.is_ignored('build', is_dir=True)
+    assert not rules.is_ignored('build', is_dir=False)
+
+
+def test_slash_anchors_at_the_share_root():
+    rules = IgnoreRules(['/tmp', 'docs/*.pdf'])
+    assert rules.is_ignored('tmp', is_dir=True)
+    assert not rules.is_ignored('src/tmp', is_dir=True)
+    assert rules.is_ignored('docs/manual.pdf')
+    assert not rules.is_ignored('other/docs/manual.pdf')
+
+
+def test_double_star_spans_folders():
+    rules = IgnoreRules(['**/generated/**'])
+    assert rules.is_ignored('generated/a.txt')
+    assert rules.is_ignored('src/generated/deep/a.txt')
+    assert not rules.is_ignored('src/generation/a.txt')
+
+
+def test_character_classes():
+    rules = IgnoreRules(['file[0-9].txt', 'x[!a].bin'])
+    assert rules.is_ignored('file7.txt')
+    assert not rules.is_ignored('fileA.txt')
+    assert rules.is_ignored('xb.bin')
+    assert not rules.is_ignored('xa.bin')
+
+
+def test_negation_re_includes_and_last_match_wins():
+    rules = IgnoreRules(['*.log', '!keep.log'])
+    assert rules.is_ignored('debug.log')
+    assert not rules.is_ignored('keep.log')
+    assert IgnoreRules(['!keep.log', '*.log']).is_ignored('keep.log')
+
+
+def test_comments_blank_lines_and_escapes():
+    rules = IgnoreRules(['# a comment', '', '\\#hash', '\\!bang'])
+    assert rules.is_ignored('#hash')
+    assert rules.is_ignored('!bang')
+    assert not rules.is_ignored('a comment')
+
+
+def test_from_file_adds_the_share_rules_and_hides_part_files(tmp_path):
+    ignore_file = tmp_path / '.localdriveignore'
+    ignore_file.write_text('*.bak\n', encoding='utf-8')
+    rules = IgnoreRules.from_file(str(ignore_file), base_patterns=['*.tmp'])
+    assert rules.is_ignored('old.bak')
+    assert rules.is_ignored('x.tmp')
+    assert rules.is_ignored('.movie.mkv.ldpart')
+    assert not rules.is_ignored('movie.mkv')
+    assert IgnoreRules.from_file(str(tmp_path / 'missing')).is_ignored('.video.ldpart')
@@ -0,0 +1,115 @@
+import os
+import time
+
+from launcher_win import LineIndex, LineIndexCache
+
+
+def write_lines(path, count, start=0, mode='w'):
+    with open(path, mode, newline='\n') as f:
+        for i in range(start, start + count):
+            f.write(f"line {i}\n")
+
+
+def test_pages_come_from_the_nearest_checkpoint(tmp_path):
+    path = str(tmp_path / 'big.log')
+    write_lines(path, 2500)
+    index = LineIndex(path, step=100, scan_size=1000)
+    assert index.refresh() == os.path.getsize(path)
+    assert index.total_lines() == 2500 and len(index.checkpoints) == 26
+    assert [text for text, _ in index.read_lines(1234, 3)] == ['line 1234', 'line 1235', 'line 1236']
+    assert index.read_lines(2499, 5) == [('line 2499', False)]
+    assert index.read_lines(3000, 5) == []
+
+
+def test_appends_are_scanned_from_where_the_index_stopped(tmp_path):
+    path = str(tmp_path / 'app.log')
+    write_lines(path, 150)
+    index = LineIndex(path, step=100)
+    index.refresh()
+    checkpoints = list(index.checkpoints)
+    with open(path, 'a') as f:
+        f.write('line 150\nunfinished')
+    index.refresh()
+    assert index.checkpoints == checkpoints
+    assert index.total_lines() == 152
+    assert index.read_lines(150, 5) == [('line 150', False), ('unfinished', False)]
+    # Follow mode only hands over complete lines
+    lines, offset = index.read_from(index.checkpoints[1])
+    assert lines[-1] == ('line 150', False) and offset == index.last_line_start
+
+
+def test_a_rewritten_file_is_indexed_again(tmp_path):
+    path = str(tmp_path / 'app.log')
+    write_lines(path, 300)
+    index = LineIndex(path, step=100)
+    index.refresh()
+    write_lines(path, 5, start=1000)
+    assert index.pending() == os.path.getsize(path)
+    index.refresh()
+    assert index.total_lines() == 5
+    assert index.read_lines(0, 1) == [('line 1000', False)]
+
+
+def test_long_lines_are_cut(tmp_path):
+    path = str(tmp_path / 'wide.txt')
+    with open(path, 'w') as f:
+        f.write('x' * 10000 + '\nshort\n')
+    index = LineIndex(path)
+    index.refresh()
+    lines = index.read_lines(0, 2, max_length=100)
+    assert lines[0] == ('x' * 100, True) and lines[1] == ('short', False)
+
+
+def test_large_files_are_indexed_in_the_background(tmp_path):
+    path = str(tmp_path / 'big.log')
+    write_lines(path, 5000)
+    cache = LineIndexCache(inline_bytes=1000)
+    index, size = cache.get(path)
+    assert size is None or index.total_lines() == 5000
+    deadline = time.monotonic() + 5
+    while size is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+        index, size = cache.get(path)
+    assert size == os.path.getsize(path) and index.total_lines() == 5000
+    # Small appends are caught up on in the request itself
+    write_lines(path, 10, start=5000, mode='a')
+    assert cache.get(path)[0].total_lines() == 5010
+
+
+def test_text_endpoint_pages_tails_and_follows(client, share):
+    write_lines(os.path.join(share, 'app.log'), 500)
+    data = client.get('/api/text/app.log?start=10&count=2').get_json()
+    assert data['lines'] == ['line 10', 'line 11'] and data['total_lines'] == 500
+    tail = client.get('/api/text/app.log?tail=3').get_json()
+    assert tail['start'] == 497 and tail['lines'][-1] == 'line 499'
+    write_lines(os.path.join(share, 'app.log'), 2, start=500, mode='a')
+    follow = client.get(f"/api/text/app.log?follow={tail['next_offset']}").get_json()
+    assert follow['lines'] == ['line 500', 'line 501'] and follow['first_line'] == 500
+
+
+def test_text_endpoint_answers_202_while_indexing(server, client, share):
+    write_lines(os.path.join(share, 'big.log'), 5000)
+    server.line_indexes.inline_bytes = 1000
+    response = client.get('/api/text/big.log?tail=5')
+    deadline = time.monotonic() + 5
+    while response.status_code == 202 and time.monotonic() < deadline:
+        assert response.get_json()['status'] == 'indexing' and response.headers['Retry-After']
+        time.sleep(0.01)
+        response = client.get('/api/text/big.log?tail=5')
+    assert response.status_code == 200
+    assert response.get_json()['lines'][-1] == 'line 4999'
+
+
+def test_text_endpoint_holds_a_text_slot(server, client, share):
+    with open(os.path.join(share, 'bin.dat'), 'wb') as f:
+        f.write(b'\0\1\2')
+    assert client.get('/api/text/bin.dat').status_code == 415
+    server.admission.set_limits({'text': 1})
+    assert server.admission.acquire('text')
+    try:
+        server.admission.max_wait = 0.05
+        response = client.get('/api/text/bin.dat', headers={'Accept': 'application/json'})
+        assert response.status_code == 503
+    finally:
+        server.admission.release('text')
+    assert server.admission.stats()['text']['active'] == 0
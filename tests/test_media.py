@@ -0,0 +1,169 @@
+import os
+import struct
+import time
+
+import pytest
+from PIL import Image
+
+from launcher_win import (MediaIndex, ShareRoot, media_caption, query_media, read_flac_metadata,
+                          read_image_metadata, read_mkv_metadata, read_mp3_metadata, read_mp4_metadata,
+                          read_pdf_metadata)
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def box(kind, payload):
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def ebml(element_id, payload):
+    # IDs carry their own length marker; sizes are always written in 8 bytes here
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + b'\x01' + len(payload).to_bytes(7, 'big') + payload
+
+
+def test_image_size_camera_and_date(tmp_path):
+    path = str(tmp_path / 'photo.jpg')
+    exif = Image.Exif()
+    exif[0x010F] = 'Canon'
+    exif[0x0110] = 'Canon EOS 80D'
+    exif[0x0132] = '2024:05:01 10:20:30'
+    exif[0x0112] = 6  # Rotated, so shown upright the sides swap
+    Image.new('RGB', (40, 30)).save(path, exif=exif)
+    assert read_image_metadata(path) == {'kind': 'image', 'width': 30, 'height': 40,
+                                         'camera': 'Canon EOS 80D', 'taken': '2024-05-01T10:20:30'}
+    png = str(tmp_path / 'plain.png')
+    Image.new('RGB', (7, 5)).save(png)
+    assert read_image_metadata(png) == {'kind': 'image', 'width': 7, 'height': 5}
+
+
+def test_mp4_duration_and_video_size(tmp_path):
+    mvhd = box(b'mvhd', b'\0\0\0\0' + struct.pack('>IIII', 0, 0, 1000, 90500) + b'\0' * 80)
+    tkhd = box(b'tkhd', b'\0' * 76 + struct.pack('>II', 1920 << 16, 1080 << 16))
+    hdlr = box(b'hdlr', b'\0' * 8 + b'vide' + b'\0' * 12)
+    moov = box(b'moov', mvhd + box(b'trak', tkhd + box(b'mdia', hdlr)))
+    path = str(tmp_path / 'clip.mp4')
+    # The media data comes first, as in files that were never made "fast start"
+    write(path, box(b'ftyp', b'isom\0\0\0\0') + box(b'mdat', b'\0' * 5000) + moov)
+    assert read_mp4_metadata(path) == {'kind': 'video', 'duration': 90.5, 'width': 1920, 'height': 1080}
+
+
+def test_mkv_duration_title_and_size(tmp_path):
+    info = ebml(0x1549A966, ebml(0x2AD7B1, (1000000).to_bytes(3, 'big')) + ebml(0x4489, struct.pack('>d', 5000.0))
+                + ebml(0x7BA9, b'Holiday'))
+    video = ebml(0xE0, ebml(0xB0, (640).to_bytes(2, 'big')) + ebml(0xBA, (360).to_bytes(2, 'big')))
+    tracks = ebml(0x1654AE6B, ebml(0xAE, video))
+    path = str(tmp_path / 'clip.mkv')
+    write(path, ebml(0x1A45DFA3, b'') + ebml(0x18538067, info + tracks + ebml(0x1F43B675, b'\0' * 100)))
+    assert read_mkv_metadata(path) == {'kind': 'video', 'duration': 5.0, 'title': 'Holiday', 'width': 640, 'height': 360}
+
+
+def test_mp3_tags_and_constant_bitrate_duration(tmp_path):
+    frames = b''
+    for frame_id, text in ((b'TIT2', 'Song'), (b'TPE1', 'Band')):
+        data = b'\x03' + text.encode('utf-8')
+        frames += frame_id + struct.pack('>I', len(data)) + b'\0\0' + data
+    size = len(frames)
+    tag = b'ID3\x03\x00\x00' + bytes([size >> 21 & 0x7F, size >> 14 & 0x7F, size >> 7 & 0x7F, size & 0x7F]) + frames
+    audio = (b'\xFF\xFB\x90\x00' + b'\0' * 413) * 100  # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz
+    path = str(tmp_path / 'song.mp3')
+    write(path, tag + audio)
+    assert read_mp3_metadata(path) == {'kind': 'audio', 'title': 'Song', 'artist': 'Band',
+                                       'duration': round(len(audio) * 8 / 128000, 3), 'sample_rate': 44100}
+
+
+def test_flac_stream_info_and_comments(tmp_path):
+    bits = (44100 << 44) | (1 << 41) | (15 << 36) | 441000
+    streaminfo = b'\0' * 10 + bits.to_bytes(8, 'big') + b'\0' * 16
+    comments = [b'TITLE=Track', b'ARTIST=Band']
+    vorbis = struct.pack('<I', 3) + b'abc' + struct.pack('<I', len(comments))
+    vorbis += b''.join(struct.pack('<I', len(c)) + c for c in comments)
+    path = str(tmp_path / 'track.flac')
+    write(path, b'fLaC' + bytes([0]) + len(streaminfo).to_bytes(3, 'big') + streaminfo
+          + bytes([0x80 | 4]) + len(vorbis).to_bytes(3, 'big') + vorbis)
+    assert read_flac_metadata(path) == {'kind': 'audio', 'sample_rate': 44100, 'duration': 10.0,
+                                        'title': 'Track', 'artist': 'Band'}
+
+
+def test_pdf_pages_and_info(tmp_path):
+    path = str(tmp_path / 'report.pdf')
+    write(path, b'%PDF-1.4\n1 0 obj << /Type /Pages /Count 12 /Kids [] >> endobj\n'
+                b'2 0 obj << /Title (Report \\(draft\\)) /Author <FEFF0041006E006E> >> endobj\n%%EOF\n')
+    assert read_pdf_metadata(path) == {'kind': 'document', 'pages': 12, 'title': 'Report (draft)', 'author': 'Ann'}
+    write(path, b'not a pdf')
+    with pytest.raises(ValueError):
+        read_pdf_metadata(path)
+
+
+def test_captions_and_queries():
+    items = [{'name': 'a.mp4', 'size': 1, 'mtime': 1, 'meta': {'kind': 'video', 'duration': 3725, 'width': 1280, 'height': 720}},
+             {'name': 'b.mp3', 'size': 2, 'mtime': 2, 'meta': {'kind': 'audio', 'duration': 61, 'artist': 'Band'}},
+             {'name': 'c.txt', 'size': 3, 'mtime': 3}]
+    assert media_caption(items[0]['meta']) == '1:02:05 · 1280×720'
+    assert media_caption(items[1]['meta']) == '1:01 · Band'
+    assert [i['name'] for i in query_media(items, {'kind': 'audio,video', 'min_duration': '100'})] == ['a.mp4']
+    assert [i['name'] for i in query_media(items, {'sort': 'duration'})] == ['b.mp3', 'a.mp4', 'c.txt']
+    assert [i['name'] for i in query_media(items, {'artist': 'BAND'})] == ['b.mp3']
+    with pytest.raises(ValueError):
+        query_media(items, {'min_width': 'wide'})
+
+
+@pytest.fixture
+def media_root(tmp_path):
+    folder = tmp_path / 'share'
+    folder.mkdir()
+    for i in range(5):
+        Image.new('RGB', (10 + i, 10)).save(str(folder / f"{i}.png"))
+    write(str(folder / 'broken.jpg'), b'not an image')
+    write(str(folder / 'notes.txt'), b'text')
+    root = ShareRoot('share', str(folder), str(tmp_path / 'catalog'))
+    yield root
+    root.close()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_listings_are_annotated_once_files_are_read(media_root):
+    media = MediaIndex(workers=1)
+    try:
+        items = media_root.list_directory('')
+        first = list(media.annotate(media_root, '', items))
+        assert not any('meta' in item for item in first)
+        assert wait_until(lambda: media.stats()['pending'] == 0)
+        annotated = {item['name']: item.get('meta') for item in media.annotate(media_root, '', items)}
+        assert annotated['3.png'] == {'kind': 'image', 'width': 13, 'height': 10}
+        assert annotated['broken.jpg'] is None and annotated['notes.txt'] is None
+        assert media.stats() == {'cached': 6, 'pending': 0, 'indexed': 5, 'failed': 1}
+        assert 'meta' not in items[0]  # Shared listings are never changed in place
+    finally:
+        media.shutdown()
+
+
+def test_a_fresh_index_reads_the_catalog_in_batches(media_root, monkeypatch):
+    media = MediaIndex(workers=1)
+    items = media_root.list_directory('')
+    list(media.annotate(media_root, '', items))
+    assert wait_until(lambda: media.stats()['pending'] == 0)
+    assert media_root.catalog.flush(timeout=5)
+    media.shutdown()
+
+    # A restart: memory is empty but the catalog remembers
+    media = MediaIndex(workers=1)
+    calls = []
+    get_media = media_root.catalog.get_media
+    monkeypatch.setattr(media_root.catalog, 'get_media', lambda rel_dir, names: calls.append(names) or get_media(rel_dir, names))
+    try:
+        annotated = list(media.annotate(media_root, '', items, batch_size=2))
+        assert sum('meta' in item for item in annotated) == 5
+        assert all(len(names) <= 2 for names in calls) and len(calls) >= 3
+        assert media.stats()['pending'] == 0 and media.stats()['indexed'] == 0
+    finally:
+        media.shutdown()
@@ -0,0 +1,122 @@
+import json
+import os
+import time
+
+from launcher_win import MirrorTask
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def mirror_once(server, remote, **kwargs):
+    mirror = MirrorTask(remote.url, server.default_root, **kwargs)
+    server.mirrors[mirror.id] = mirror
+    return mirror, run(server, mirror)
+
+
+def run(server, mirror):
+    job = server.run_mirror(mirror)
+    deadline = time.monotonic() + 10
+    while job.is_active() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.status == 'completed', job.error
+    return job.result
+
+
+def test_only_new_and_changed_files_are_fetched(server, remote, share):
+    write(os.path.join(remote.default_root.path, 'docs', 'a.txt'), b'a' * 100)
+    write(os.path.join(remote.default_root.path, 'b.bin'), os.urandom(5000))
+    mirror, result = mirror_once(server, remote, chunk_size=1024)
+    assert result['fetched'] == 2 and result['failed'] == 0
+    assert read(os.path.join(share, 'b.bin')) == read(os.path.join(remote.default_root.path, 'b.bin'))
+    assert not [name for name in os.listdir(share) if name.endswith(MirrorTask.PART_SUFFIX)]
+
+    write(os.path.join(remote.default_root.path, 'docs', 'a.txt'), b'changed')
+    result = run(server, mirror)
+    assert (result['fetched'], result['unchanged']) == (1, 1)
+    assert read(os.path.join(share, 'docs', 'a.txt')) == b'changed'
+    assert mirror.status()['lag_seconds'] is not None
+    mirror.close()
+
+
+def test_a_part_file_of_an_older_version_starts_over(server, remote, share):
+    source = os.path.join(remote.default_root.path, 'big.bin')
+    write(source, os.urandom(4096))
+    mirror = MirrorTask(remote.url, server.default_root, chunk_size=1024)
+    stat = os.stat(source)
+    part, state = mirror.part_paths('big.bin')
+    # An interrupted earlier run left half of a version the source no longer has
+    write(part, b'x' * 4096)
+    with open(state, 'w') as f:
+        json.dump({'size': 4096, 'mtime_ns': stat.st_mtime_ns, 'chunk_size': 1024,
+                   'etag': '"stale"', 'done': [0, 1]}, f)
+    server.mirrors[mirror.id] = mirror
+
+    result = run(server, mirror)
+    assert result['failed'] == 1 and not os.path.exists(part)
+    result = run(server, mirror)
+    assert result['fetched'] == 1
+    assert read(os.path.join(share, 'big.bin')) == read(source)
+    mirror.close()
+
+
+def test_deletions_on_the_source_propagate(server, remote, share):
+    for name in ('keep.txt', 'gone.txt', 'old/inner.txt'):
+        write(os.path.join(remote.default_root.path, name), name.encode())
+    mirror, _ = mirror_once(server, remote)
+    os.remove(os.path.join(remote.default_root.path, 'gone.txt'))
+    os.remove(os.path.join(remote.default_root.path, 'old', 'inner.txt'))
+    os.rmdir(os.path.join(remote.default_root.path, 'old'))
+    result = run(server, mirror)
+    assert result['deleted'] == 3 and result['held_deletes'] == 0
+    assert sorted(os.listdir(share)) == ['keep.txt']
+    mirror.close()
+
+
+def test_keeping_deleted_files(server, remote, share):
+    write(os.path.join(remote.default_root.path, 'a.txt'), b'a')
+    write(os.path.join(remote.default_root.path, 'b.txt'), b'b')
+    mirror, _ = mirror_once(server, remote, delete=False)
+    os.remove(os.path.join(remote.default_root.path, 'a.txt'))
+    result = run(server, mirror)
+    assert result['deleted'] == 0
+    assert sorted(os.listdir(share)) == ['a.txt', 'b.txt']
+    mirror.close()
+
+
+def test_an_emptied_source_does_not_wipe_the_mirror(server, remote, share):
+    write(os.path.join(remote.default_root.path, 'a.txt'), b'a')
+    mirror, _ = mirror_once(server, remote)
+    os.remove(os.path.join(remote.default_root.path, 'a.txt'))
+    result = run(server, mirror)
+    assert (result['deleted'], result['held_deletes']) == (0, 1)
+    assert os.listdir(share) == ['a.txt']
+    mirror.close()
+
+
+def test_mass_deletions_are_held_back(server, remote, share):
+    names = [f"f{i:02}.txt" for i in range(30)]
+    for name in names:
+        write(os.path.join(remote.default_root.path, name), name.encode())
+    mirror, _ = mirror_once(server, remote)
+    for name in names[:20]:
+        os.remove(os.path.join(remote.default_root.path, name))
+    result = run(server, mirror)
+    assert (result['deleted'], result['held_deletes']) == (0, 20)
+    assert len(os.listdir(share)) == 30
+
+    # A handful of deletions out of many still goes through
+    os.remove(os.path.join(remote.default_root.path, names[20]))
+    for name in names[:20]:
+        write(os.path.join(remote.default_root.path, name), name.encode())
+    result = run(server, mirror)
+    assert (result['deleted'], result['held_deletes']) == (1, 0)
+    mirror.close()
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+
+import pytest
+
+from launcher_win import PeerNode, PeerRegistry, PeerUnavailable
+
+
+@pytest.fixture
+def registry():
+    registry = PeerRegistry(timeout=2.0, deadline=0.5)
+    yield registry
+    registry.shutdown()
+
+
+def test_listing_is_fetched_and_revalidated(remote):
+    with open(os.path.join(remote.default_root.path, 'a.txt'), 'w') as f:
+        f.write('a')
+    peer = PeerNode('remote', remote.url)
+    first = peer.fetch_listing('')
+    assert [item['name'] for item in first['items']] == ['a.txt']
+    etag = peer.listings[''][0]
+    assert etag
+    # An unchanged folder comes back as a 304 and the cached payload is reused
+    assert peer.fetch_listing('') == first
+    assert peer.latency is not None and peer.failures == 0
+    peer.close()
+
+
+def test_unreachable_peer_backs_off(registry):
+    peer = registry.add('127.0.0.1:9', name='gone')
+    result = registry.listing(peer, '')
+    assert result['status'] == 'unavailable' and result['items'] == []
+    assert peer.failures == 1 and not peer.available()
+    with pytest.raises(PeerUnavailable):
+        peer.fetch_listing('')
+
+
+def test_adding_the_same_url_twice_returns_the_same_peer(registry):
+    first = registry.add('http://10.0.0.5:5000')
+    assert registry.add('10.0.0.5:5000/') is first
+    assert registry.remove(first.name) and registry.get(first.name) is None
+
+
+def fake_fetch(peer, delay, calls):
+    def fetch(path):
+        calls.append(path)
+        time.sleep(delay)
+        payload = {'path': path, 'items': [{'name': peer.name}]}
+        with peer.lock:
+            peer.listings[path] = (None, payload)
+        peer.record(elapsed=delay)
+        return payload
+    return fetch
+
+
+def test_slow_peers_are_served_from_cache_without_waiting(registry):
+    fast, slow = registry.add('http://10.0.0.1:5000'), registry.add('http://10.0.0.2:5000')
+    fast_calls, slow_calls = [], []
+    fast.fetch_listing = fake_fetch(fast, 0.01, fast_calls)
+    slow.fetch_listing = fake_fetch(slow, 1.0, slow_calls)
+
+    started = time.monotonic()
+    results = registry.aggregate('docs')
+    assert time.monotonic() - started < 0.9  # Bounded by the deadline, not the slow node
+    assert results[fast.name]['status'] == 'ok'
+    assert results[slow.name]['status'] == 'unavailable'
+
+    # The fetch still running is shared, not repeated
+    registry.aggregate('docs')
+    assert slow_calls == ['docs']
+
+    deadline = time.monotonic() + 5
+    while slow.cached_listing('docs') is None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    started = time.monotonic()
+    results = registry.aggregate('docs')
+    # Known to be slower than the deadline, so its cached copy is served at once
+    assert time.monotonic() - started < 0.3
+    assert results[slow.name]['status'] == 'stale'
+    assert results[slow.name]['items'] == [{'name': slow.name}]
+
+
+def test_fetches_of_one_peer_run_one_at_a_time(registry):
+    peer = registry.add('http://10.0.0.3:5000')
+    running = []
+    overlap = []
+    lock = threading.Lock()
+
+    def fetch(path):
+        with lock:
+            running.append(path)
+            overlap.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(path)
+        return {'path': path, 'items': []}
+    peer.fetch_listing = fetch
+    futures = [peer.fetch_listing_async(path) for path in ('a', 'b', 'c', 'a')]
+    for future in futures:
+        future.result(timeout=5)
+    assert max(overlap) == 1 and len(overlap) <= 3
+
+
+def test_peer_routes(server, client, remote):
+    with open(os.path.join(remote.default_root.path, 'shared.txt'), 'w') as f:
+        f.write('from the peer')
+    peer = server.peers.add(remote.url, name='remote')
+    listing = client.get('/peer/remote/api/list?path=').get_json()
+    assert [item['name'] for item in listing['items']] == ['shared.txt']
+    assert client.get('/peer/remote/download/shared.txt').data == b'from the peer'
+    peer.close()
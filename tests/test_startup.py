@@ -0,0 +1,32 @@
+import json
+import os
+
+import pytest
+
+import launcher_win
+from launcher_win import StartupTimer
+
+
+def test_phases_and_marks_are_recorded():
+    timer = StartupTimer()
+    assert timer.run('settings', lambda value: value * 2, 21) == 42
+    with pytest.raises(OSError):
+        timer.run('tray', lambda: open('/nonexistent/icon.png'))
+    timer.mark('window')
+    report = timer.report()
+    assert set(report['phases']) == {'settings', 'tray'}
+    assert 'error' in report['phases']['tray'] and 'error' not in report['phases']['settings']
+    assert report['marks']['window'] <= report['total_ms']
+
+
+def test_save_keeps_the_latest_launches(tmp_path):
+    path = str(tmp_path / 'logs' / 'startup.log')
+    for _ in range(5):
+        StartupTimer().save(path, keep=3)
+    with open(path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 3 and all('total_ms' in line for line in lines)
+
+
+def test_the_default_log_sits_next_to_the_program():
+    assert StartupTimer.save.__defaults__[0] == os.path.join(launcher_win.APP_DIR, 'logs', 'startup.log')
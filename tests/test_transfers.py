@@ -0,0 +1,83 @@
+import io
+import os
+
+import pytest
+
+from launcher_win import CountingReader, Transfer, TransferRegistry
+
+
+@pytest.fixture
+def data(share):
+    content = os.urandom(2 * 1024 * 1024)
+    with open(os.path.join(share, 'data.bin'), 'wb') as f:
+        f.write(content)
+    return content
+
+
+def test_rates_are_smoothed_between_looks():
+    transfer = Transfer('download', '10.0.0.2', 'a.bin', bytes_total=10000)
+    start = transfer.started
+    transfer.bytes_done = 1000
+    assert transfer.sample(start + 0.1) == 0.0  # Too soon to say
+    assert transfer.sample(start + 1.0) == 1000.0
+    transfer.bytes_done = 4000
+    assert transfer.sample(start + 2.0) == 2000.0  # Halfway between 1000/s and 3000/s
+    info = transfer.to_dict(start + 2.0)
+    assert info['eta'] == 3.0 and info['elapsed'] == 2.0
+
+
+def test_the_registry_lists_transfers_oldest_first():
+    registry = TransferRegistry()
+    first = registry.start('upload', 'a', 'one.txt')
+    second = registry.start('download', 'b', 'two.txt', 10)
+    assert [t['id'] for t in registry.snapshot()] == [first.id, second.id]
+    registry.finish(first)
+    registry.finish(first)
+    assert [t['path'] for t in registry.snapshot()] == ['two.txt']
+
+
+def test_counting_reader_counts_what_passes():
+    transfer = Transfer('upload', 'a', 'x')
+    reader = CountingReader(io.BytesIO(b'line one\nline two\nrest'), transfer)
+    assert reader.readline() == b'line one\n'
+    assert reader.read(4) == b'line'
+    assert list(reader) == [b' two\n', b'rest']
+    assert transfer.bytes_done == 22
+
+
+def test_a_download_is_listed_while_it_runs(server, client, data):
+    response = client.get('/download/data.bin', buffered=False)
+    try:
+        [transfer] = client.get('/api/transfers').get_json()['transfers']
+        assert (transfer['kind'], transfer['path'], transfer['bytes_total']) == ('download', 'data.bin', len(data))
+        body = b''.join(response.response)
+        assert body == data
+        assert server.transfers.transfers[transfer['id']].bytes_done == len(data)
+    finally:
+        response.close()
+    assert server.transfers.snapshot() == []
+
+
+def test_head_leaves_no_transfer_behind(server, client, data):
+    for _ in range(20):
+        with client.head('/download/data.bin') as response:
+            assert response.status_code == 200
+    assert server.transfers.snapshot() == []
+
+
+def test_uploads_are_tracked_until_the_request_ends(server, client, share):
+    seen = []
+    original = server.transfers.finish
+
+    def finish(transfer):
+        seen.append((transfer.kind, transfer.path, transfer.bytes_done))
+        original(transfer)
+
+    server.transfers.finish = finish
+    payload = os.urandom(50000)
+    response = client.post('/upload?name=up.bin', data={'path': '', 'file': [(io.BytesIO(payload), 'up.bin')]},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    [(kind, path, done)] = seen
+    assert (kind, path) == ('upload', 'up.bin') and done > len(payload)
+    assert server.transfers.snapshot() == []
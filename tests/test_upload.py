@@ -0,0 +1,54 @@
+import io
+import os
+import time
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_prepare_creates_every_folder_once(server, client, share):
+    os.makedirs(os.path.join(share, 'dest', 'photos'))
+    response = client.post('/api/upload/prepare',
+                           json={'path': 'dest', 'dirs': ['photos', 'photos/2024', 'photos/2024/', 'music/live']})
+    assert response.get_json() == {'status': 'success', 'created': 2}
+    for rel_dir in ('photos/2024', 'music', 'music/live'):
+        assert os.path.isdir(os.path.join(share, 'dest', rel_dir))
+
+
+def test_prepare_stays_inside_the_share(client, share):
+    response = client.post('/api/upload/prepare', json={'path': '../..', 'dirs': ['outside']})
+    assert response.status_code == 403
+    assert not os.path.exists(os.path.join(os.path.dirname(os.path.dirname(share)), 'outside'))
+
+
+def test_folder_uploads_land_in_their_relative_folders(server, client, share):
+    client.post('/api/upload/prepare', json={'path': 'dest', 'dirs': ['album/disc1']})
+    response = client.post('/upload', data={
+        'path': 'dest',
+        'file': [(io.BytesIO(b'one'), 'a.mp3'), (io.BytesIO(b'two'), 'b.mp3'), (io.BytesIO(b'top'), 'c.txt')],
+        'relative_path': ['album/disc1', 'album', ''],
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert read(os.path.join(share, 'dest', 'album', 'disc1', 'a.mp3')) == b'one'
+    assert read(os.path.join(share, 'dest', 'album', 'b.mp3')) == b'two'
+    assert read(os.path.join(share, 'dest', 'c.txt')) == b'top'
+
+    # The listing catches up once the batched invalidation has run
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        names = [item['name'] for item in client.get('/api/list?path=dest/album').get_json()['items']]
+        if 'b.mp3' in names:
+            break
+        time.sleep(0.05)
+    assert sorted(names) == ['b.mp3', 'disc1']
+
+
+def test_uploads_cannot_escape_the_share(client, share):
+    response = client.post('/upload', data={'path': '', 'file': [(io.BytesIO(b'x'), 'x.txt')],
+                                            'relative_path': ['../../elsewhere']},
+                           content_type='multipart/form-data')
+    assert response.status_code == 403
+    assert client.post('/upload', data={'path': ''}, content_type='multipart/form-data').get_data() == \
+        b'No file selected'